@@ -7,28 +7,35 @@ from pathlib import Path
 
 # Import key and DB utility functions that need to run at startup
 from app.core.key_manager import load_keys
-from app.db.mongo_client import get_db, close_db_connection, ensure_db_indexes
+from app.core.signing_executor import shutdown_signing_executor
+from app.db.mongo_client import get_db, close_db_connection, ensure_db_indexes, connect_async_db, close_async_db_connection
+from app.db.revocation_filter import start_revocation_filter, stop_revocation_filter
+from app.core.key_rotation import install_reload_signal_handler, start_keyring_watcher, stop_keyring_watcher
+from app.utils.logging_config import configure_logging, parse_sample_rates, stop_logging
+from app.utils.metrics import MetricsMiddleware
+from app.utils.request_timing import RequestTimingMiddleware, REQUEST_PHASES_ENABLED
 
 # Import API routers - update paths to match your structure
 from app.ie_routes import router as ie_router         
 from app.reg_routes import router as reg_router       
 from app.ui_routes import router as ui_router         
 from app.auth.routes import router as auth_router     
+from app.metrics_routes import router as metrics_router, register_default_collectors
 
 # Import settings for session configuration
-from config.settings import SESSION_SECRET_KEY, BASE_URL
+from config.settings import SESSION_SECRET_KEY, BASE_URL, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES, METRICS_ENABLED
 
 # Determine base directory for static files and templates
 BASE_DIR = Path(__file__).resolve().parent
 
-# Configure basic logging for startup messages
-logging.basicConfig(level=logging.INFO, format='%(levelname)s:     %(message)s')
 logger = logging.getLogger(__name__)
 
 def create_app() -> FastAPI:
     """
     Factory function to create and configure the FastAPI application.
     """
+    # Non-blocking, optionally sampled logging for everything below (request handlers included)
+    configure_logging(LOG_LEVEL, LOG_QUEUE_SIZE, parse_sample_rates(LOG_SAMPLE_RATES))
     logger.info("🚀 Initializing AIF Core Service application...")
 
     # --- Critical Initializations ---
@@ -76,6 +83,17 @@ def create_app() -> FastAPI:
     )
     logger.info("🔒 Session middleware configured.")
 
+    # --- Per-request phase timing (Server-Timing header / slow-request log) ---
+    if REQUEST_PHASES_ENABLED:
+        app.add_middleware(RequestTimingMiddleware)
+        logger.info("⏱️ Request timing middleware configured.")
+
+    # --- Metrics (added last so it is outermost and times the whole request) ---
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        register_default_collectors()
+        logger.info("📈 Metrics middleware configured.")
+
     # --- Mount Static Files (For UI) ---
     static_dir_path = BASE_DIR / "static"
     static_dir_path.mkdir(parents=True, exist_ok=True)
@@ -100,6 +118,11 @@ def create_app() -> FastAPI:
     app.include_router(reg_router)
     logger.info("🧩 Registry (REG) API routes included (/.well-known/jwks.json, /reg/*).")
 
+    # Prometheus scrape endpoint
+    if METRICS_ENABLED:
+        app.include_router(metrics_router)
+        logger.info("📈 Metrics endpoint included (/metrics).")
+
     # --- Define Root Path Redirect ---
     @app.get("/", include_in_schema=False)
     async def root_redirect():
@@ -109,14 +132,24 @@ def create_app() -> FastAPI:
     # --- Event Handlers ---
     @app.on_event("startup")
     async def startup_event():
+        # The async client binds to the running event loop, so it is created here rather than above
+        await connect_async_db()
+        await start_revocation_filter()
+        install_reload_signal_handler()
+        start_keyring_watcher()
         logger.info("✅ AIF Core Service Application startup sequence complete.")
         logger.info(f"🌐 Application running at {BASE_URL}")
 
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("🚪 AIF Core Service Application shutting down...")
+        await stop_keyring_watcher()
+        await stop_revocation_filter()
+        shutdown_signing_executor()
+        await close_async_db_connection()
         close_db_connection()
         logger.info("✅ Shutdown complete.")
+        stop_logging()
 
     logger.info("👍 FastAPI application configured and ready.")
     return app
\ No newline at end of file
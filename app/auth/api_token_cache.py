@@ -0,0 +1,104 @@
+# app/auth/api_token_cache.py
+import hashlib
+import threading
+from typing import Optional, Dict, Set, Any
+import logging
+
+from app.models.user_models import User
+from app.utils.ttl_cache import TTLCache
+from config.settings import (
+    API_TOKEN_CACHE_ENABLED,
+    API_TOKEN_CACHE_MAX_ENTRIES,
+    API_TOKEN_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+def _token_key(token: str) -> bytes:
+    # Never keep raw API tokens as cache keys
+    return hashlib.sha256(token.encode()).digest()
+
+class APITokenCache:
+    """
+    Caches the resolved User for a presented API token (keyed by its SHA-256).
+
+    Entries live for at most the configured TTL and never beyond the API token's
+    own `exp`. `invalidate_user` drops every entry for a user and must be called
+    whenever their stored api_token changes. It also bumps the user's
+    generation: a lookup that read the user before the invalidation passes the
+    generation it saw to `put`, which then refuses to cache the stale principal.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, default_ttl_seconds=ttl_seconds)
+        self._keys_by_user: Dict[str, Set[bytes]] = {}
+        # Only users that were ever invalidated have an entry (one int each)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def get(self, token: str) -> Optional[User]:
+        return self._cache.get(_token_key(token))
+
+    def generation(self, user_id: str) -> int:
+        """Read before loading the user; pass to `put` so an invalidation in between is detected."""
+        with self._lock:
+            return self._generations.get(str(user_id), 0)
+
+    def put(self, token: str, user: User, token_exp: Optional[float] = None, generation: Optional[int] = None):
+        key = _token_key(token)
+        user_id = str(user.id)
+        with self._lock:
+            if generation is not None and self._generations.get(user_id, 0) != generation:
+                self.stale_puts += 1
+                return
+            self._cache.set(key, user, expires_at=token_exp)
+            # Drop keys that were evicted or expired so the index stays bounded
+            keys = {k for k in self._keys_by_user.get(user_id, ()) if k in self._cache}
+            keys.add(key)
+            self._keys_by_user[user_id] = keys
+            if len(self._keys_by_user) > 2 * self._cache.max_entries:
+                self._prune_index()
+
+    def _prune_index(self):
+        # Users whose entries all expired or were evicted would otherwise stay in the index forever
+        for user_id in list(self._keys_by_user):
+            keys = {k for k in self._keys_by_user[user_id] if k in self._cache}
+            if keys:
+                self._keys_by_user[user_id] = keys
+            else:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id: str):
+        user_id = str(user_id)
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._cache.pop(key)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys_by_user.clear()
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats["invalidations"] = self.invalidations
+        stats["stale_puts"] = self.stale_puts
+        return stats
+
+_api_token_cache: Optional[APITokenCache] = (
+    APITokenCache(API_TOKEN_CACHE_MAX_ENTRIES, API_TOKEN_CACHE_TTL_SECONDS) if API_TOKEN_CACHE_ENABLED else None
+)
+
+def get_api_token_cache() -> Optional[APITokenCache]:
+    """Returns the process-wide API token cache, or None when caching is disabled."""
+    return _api_token_cache
+
+def invalidate_api_token_cache(user_id: str):
+    """Evicts cached principals for a user. Call after their API token is (re)generated."""
+    if _api_token_cache is not None:
+        _api_token_cache.invalidate_user(user_id)
+        logger.debug(f"API token cache invalidated for user {user_id}.")
@@ -5,8 +5,10 @@ from typing import Optional
 import jwt # Using PyJWT for API token validation
 import logging
 
-from app.db.user_store import get_user_by_id # This returns a dict or None
+from app.db.user_store import get_user_by_id_async, USER_MODEL_PROJECTION # This returns a dict or None
 from app.models.user_models import User    # Import your Pydantic User model
+from app.auth.api_token_cache import get_api_token_cache
+from app.utils.request_timing import timed_phase
 from config.settings import JWT_SECRET_KEY, BASE_URL # BASE_URL for redirect construction
 
 logger = logging.getLogger(__name__)
@@ -30,7 +32,7 @@ async def get_current_user(request: Request) -> Optional[User]:
         return None
     
     try:
-        user_data_from_db = get_user_by_id(user_id_str) # Fetches dict from MongoDB
+        user_data_from_db = await get_user_by_id_async(user_id_str, USER_MODEL_PROJECTION) # Fetches dict from MongoDB
         if user_data_from_db:
             # Convert MongoDB dict (with _id) to Pydantic User model instance
             return User(**user_data_from_db)
@@ -87,6 +89,7 @@ async def require_service_provider(user: User = Depends(require_authenticated_us
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Service Provider role required.")
     return user
 
+@timed_phase("auth")
 async def validate_api_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[User]:
@@ -98,6 +101,13 @@ async def validate_api_token(
         return None # No token provided
     
     token = credentials.credentials
+    api_token_cache = get_api_token_cache()
+    if api_token_cache is not None:
+        # Entries never outlive the token's exp and are dropped when the user's token is regenerated
+        cached_user = api_token_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
         
@@ -110,7 +120,9 @@ async def validate_api_token(
             logger.warning("API token payload missing 'user_id'.")
             return None
         
-        user_data_from_db = get_user_by_id(user_id_from_token) # Returns dict
+        # Taken before the read: if the token is regenerated meanwhile, the stale user is not cached
+        cache_generation = api_token_cache.generation(user_id_from_token) if api_token_cache is not None else None
+        user_data_from_db = await get_user_by_id_async(user_id_from_token, USER_MODEL_PROJECTION) # Returns dict
         if not user_data_from_db:
             logger.warning(f"User {user_id_from_token} from API token not found in DB.")
             return None
@@ -120,7 +132,10 @@ async def validate_api_token(
             logger.warning(f"Presented API token does not match stored API token for user {user_id_from_token}.")
             return None # This invalidates old tokens if a new one was generated
         
-        return User(**user_data_from_db) # Convert dict to User Pydantic model
+        user = User(**user_data_from_db) # Convert dict to User Pydantic model
+        if api_token_cache is not None:
+            api_token_cache.put(token, user, token_exp=payload.get("exp"), generation=cache_generation)
+        return user
         
     except jwt.ExpiredSignatureError:
         logger.info(f"Attempt to use an expired API token (user_id from potential payload: {payload.get('user_id', 'N/A') if 'payload' in locals() else 'N/A'}).")
@@ -149,4 +164,13 @@ async def require_api_auth(user: Optional[User] = Depends(validate_api_token)) -
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account registration is incomplete. API access denied."
         )
-    return user
\ No newline at end of file
+    return user
+
+async def require_api_admin(user: User = Depends(require_api_auth)) -> User:
+    """
+    Dependency that requires API token authentication by a user with the 'admin' role.
+    """
+    if user.role != "admin": # Direct attribute access
+        logger.warning(f"User '{user.id}' (Role: '{user.role}') attempted admin API action. Access denied.")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required.")
+    return user
@@ -1,4 +1,5 @@
 # app/auth/token_utils.py
+import secrets
 import jwt
 from datetime import datetime, timedelta, timezone
 from config.settings import JWT_SECRET_KEY
@@ -9,6 +10,8 @@ def generate_api_token(user_id: str) -> tuple[str, datetime]:
     payload = {
         "user_id": user_id,
         "type": "api_token",
+        # Makes every regeneration yield a new token, even within the same second
+        "jti": secrets.token_urlsafe(16),
         "iat": datetime.now(timezone.utc),
         "exp": expiry
     }
@@ -0,0 +1,84 @@
+# app/auth/verified_token_cache.py
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Tuple
+import logging
+
+from app.utils.ttl_cache import TTLCache
+from config.settings import (
+    VERIFIED_TOKEN_CACHE_ENABLED,
+    VERIFIED_TOKEN_CACHE_MAX_ENTRIES,
+    VERIFIED_TOKEN_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+def _token_key(token: str) -> bytes:
+    # Never keep raw ATKs as cache keys
+    return hashlib.sha256(token.encode()).digest()
+
+class VerifiedTokenCache:
+    """
+    Caches the (kid, claims) of ATKs whose signature has been verified, keyed by
+    SHA-256(token).
+
+    Entries live until the token's `exp`, capped at the configured TTL.
+    `invalidate_jti` drops the entry for a JTI and is called whenever this
+    process revokes it. Revocations made by other workers are not evicted here;
+    callers still check the revocation list for cached tokens.
+    Cached claims are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, default_ttl_seconds=ttl_seconds)
+        self._keys_by_jti: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self._cache.get(_token_key(token))
+
+    def put(self, token: str, kid: str, claims: Dict[str, Any]):
+        exp = claims.get("exp")
+        if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+            return
+        key = _token_key(token)
+        self._cache.set(key, (kid, claims), expires_at=exp)
+        jti = claims.get("jti")
+        if not isinstance(jti, str):
+            return
+        with self._lock:
+            self._keys_by_jti[jti] = key
+            # Drop JTIs whose entries were evicted or expired so the index stays bounded
+            if len(self._keys_by_jti) > 2 * self._cache.max_entries:
+                self._keys_by_jti = {j: k for j, k in self._keys_by_jti.items() if k in self._cache}
+
+    def invalidate_jti(self, jti: str):
+        with self._lock:
+            key = self._keys_by_jti.pop(jti, None)
+        if key is not None and self._cache.pop(key) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys_by_jti.clear()
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+_verified_token_cache: Optional[VerifiedTokenCache] = (
+    VerifiedTokenCache(VERIFIED_TOKEN_CACHE_MAX_ENTRIES, VERIFIED_TOKEN_CACHE_TTL_SECONDS)
+    if VERIFIED_TOKEN_CACHE_ENABLED else None
+)
+
+def get_verified_token_cache() -> Optional[VerifiedTokenCache]:
+    """Returns the process-wide verified-ATK cache, or None when caching is disabled."""
+    return _verified_token_cache
+
+def invalidate_verified_token(jti: str):
+    """Evicts the cached verification of an ATK. Call when its JTI is revoked."""
+    if _verified_token_cache is not None:
+        _verified_token_cache.invalidate_jti(jti)
@@ -1,5 +1,9 @@
-from .key_manager import get_signing_key, get_jwks, load_keys as core_load_keys
-from .token_issuer import create_atk, generate_aid
+from .key_manager import get_signing_key, get_jwks, get_jwks_document, get_keyring, get_public_key, KeyRing, load_keys as core_load_keys
+from .token_issuer import create_atk, generate_aid, ATKIssuanceResult
+from .signer import ATKSigner, get_atk_signer
+from .signing_executor import SigningExecutor, get_signing_executor, create_atk_async
+from .key_rotation import reload_signing_keys
+from .token_validator import ATKVerifier, ATKVerificationResult, get_atk_verifier
 
 # Example of re-exporting for easier access:
 # from app.core import key_manager
@@ -10,7 +14,21 @@ from .token_issuer import create_atk, generate_aid
 __all__ = [
     "get_signing_key",
     "get_jwks",
+    "get_jwks_document",
+    "get_keyring",
+    "get_public_key",
+    "KeyRing",
+    "reload_signing_keys",
+    "ATKVerifier",
+    "ATKVerificationResult",
+    "get_atk_verifier",
     "create_atk",
     "generate_aid",
+    "ATKIssuanceResult",
+    "ATKSigner",
+    "get_atk_signer",
+    "SigningExecutor",
+    "get_signing_executor",
+    "create_atk_async",
     "core_load_keys" # Renamed to avoid conflict if app-level load_keys is different
 ]
\ No newline at end of file
@@ -1,24 +1,73 @@
 # app/core/key_manager.py
 import base64
+import hashlib
+import json
 from pathlib import Path
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ed25519
 from cryptography.hazmat.backends import default_backend
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, List
+from dataclasses import dataclass
 import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 from config.settings import KEYS_DIR, KEY_ID, ALGORITHM
 
-_private_key_pem: Optional[str] = None
-_public_key_pem: Optional[str] = None
-_private_key_obj: Optional[ed25519.Ed25519PrivateKey] = None
-_jwks: Optional[Dict[str, Any]] = None
+# Key states in keyring.json. Every state except "retired" is published in the JWKS;
+# only the single "active" key signs new ATKs.
+KEY_STATUS_ACTIVE = "active"
+KEY_STATUS_NEXT = "next"          # published ahead of activation so verifiers already cache it
+KEY_STATUS_RETIRING = "retiring"  # no longer signs; kept until ATKs signed with it have expired
+KEY_STATUS_RETIRED = "retired"    # ignored
+KEY_STATUSES = (KEY_STATUS_ACTIVE, KEY_STATUS_NEXT, KEY_STATUS_RETIRING, KEY_STATUS_RETIRED)
+
+@dataclass(frozen=True)
+class KeyRingKey:
+    kid: str
+    status: str
+    public_key: ed25519.Ed25519PublicKey
+    public_key_pem: str
+    private_key: Optional[ed25519.Ed25519PrivateKey] = None
+    private_key_pem: Optional[str] = None
+
+@dataclass(frozen=True)
+class KeyRing:
+    """
+    Immutable snapshot of the signing keys. A reload builds a new snapshot and
+    swaps the module-level reference in one assignment, so readers (the signing
+    hot path included) never lock and always see a consistent set.
+    """
+    keys: Dict[str, KeyRingKey]
+    active_kid: str
+    jwks: Dict[str, Any]
+    jwks_document: Tuple[bytes, str]
+    source: str
+
+    @property
+    def active(self) -> KeyRingKey:
+        return self.keys[self.active_kid]
+
+    @property
+    def version(self) -> str:
+        """Changes whenever the published key set changes (the JWKS ETag)."""
+        return self.jwks_document[1]
+
+    def public_key(self, kid: str) -> Optional[ed25519.Ed25519PublicKey]:
+        key = self.keys.get(kid)
+        return key.public_key if key else None
+
+_keyring: Optional[KeyRing] = None
+_reload_lock = threading.Lock()
+# Fingerprint of the files the current keyring was loaded from (see keyring_files_changed)
+_loaded_fingerprint: Optional[Tuple] = None
 
 PRIVATE_KEY_PATH = KEYS_DIR / "aif_private_key.pem"
 PUBLIC_KEY_PATH = KEYS_DIR / "aif_public_key.pem"
+# Optional multi-key manifest; without it the single key above is used with kid KEY_ID
+KEYRING_MANIFEST_PATH = KEYS_DIR / "keyring.json"
 
 # --- Helper functions remain the same: _generate_ed25519_keys_pem, _ensure_keys_exist_on_disk, _extract_jwk_x_coordinate ---
 def _generate_ed25519_keys_pem() -> tuple[bytes, bytes]:
@@ -64,73 +113,202 @@ def _extract_jwk_x_coordinate(public_key_pem_str: str) -> str:
     return base64.urlsafe_b64encode(raw_public_key_bytes).decode().rstrip('=')
 # --- End helper functions ---
 
+def _serialize_jwks(jwks: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Serializes a JWKS to canonical JSON bytes and derives a strong ETag from them."""
+    body = json.dumps(jwks, separators=(",", ":"), sort_keys=True).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return body, etag
+
+def _load_public_key(public_key_pem: str) -> ed25519.Ed25519PublicKey:
+    public_key_obj = serialization.load_pem_public_key(public_key_pem.encode(), backend=default_backend())
+    if not isinstance(public_key_obj, ed25519.Ed25519PublicKey):
+        raise ValueError("Public key is not an Ed25519 public key.")
+    return public_key_obj
+
+def _load_private_key(private_key_pem: str) -> ed25519.Ed25519PrivateKey:
+    private_key_obj = serialization.load_pem_private_key(
+        private_key_pem.encode(),
+        password=None,
+        backend=default_backend()
+    )
+    if not isinstance(private_key_obj, ed25519.Ed25519PrivateKey):
+        raise ValueError("Loaded private key is not an Ed25519 private key.")
+    return private_key_obj
+
+def _read_manifest() -> List[Dict[str, Any]]:
+    manifest = json.loads(KEYRING_MANIFEST_PATH.read_text())
+    entries = manifest.get("keys")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{KEYRING_MANIFEST_PATH} must contain a non-empty 'keys' list.")
+    return entries
+
+def _load_keyring_key(kid: str, status: str, private_key_file: Optional[str], public_key_file: Optional[str]) -> KeyRingKey:
+    private_key_pem = (KEYS_DIR / private_key_file).read_text() if private_key_file else None
+    private_key_obj = _load_private_key(private_key_pem) if private_key_pem else None
+
+    if public_key_file:
+        public_key_pem = (KEYS_DIR / public_key_file).read_text()
+        public_key_obj = _load_public_key(public_key_pem)
+    elif private_key_obj is not None:
+        public_key_obj = private_key_obj.public_key()
+        public_key_pem = public_key_obj.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+    else:
+        raise ValueError(f"Key '{kid}' needs a public_key or private_key file.")
+
+    return KeyRingKey(
+        kid=kid,
+        status=status,
+        public_key=public_key_obj,
+        public_key_pem=public_key_pem,
+        private_key=private_key_obj,
+        private_key_pem=private_key_pem
+    )
+
+def _build_keyring() -> KeyRing:
+    """Reads KEYS_DIR and builds a new KeyRing snapshot (does not install it)."""
+    keys: Dict[str, KeyRingKey] = {}
+    if KEYRING_MANIFEST_PATH.exists():
+        logger.info(f"   Reading keyring manifest from: {KEYRING_MANIFEST_PATH}")
+        for entry in _read_manifest():
+            kid, status = entry.get("kid"), entry.get("status", KEY_STATUS_NEXT)
+            if not kid:
+                raise ValueError("Every keyring entry needs a 'kid'.")
+            if status not in KEY_STATUSES:
+                raise ValueError(f"Key '{kid}' has unknown status '{status}'. Expected one of {KEY_STATUSES}.")
+            if kid in keys:
+                raise ValueError(f"Duplicate kid '{kid}' in keyring manifest.")
+            if status == KEY_STATUS_RETIRED:
+                continue
+            keys[kid] = _load_keyring_key(kid, status, entry.get("private_key"), entry.get("public_key"))
+        source = str(KEYRING_MANIFEST_PATH)
+    else:
+        _ensure_keys_exist_on_disk()
+        logger.info(f"   Reading private key from: {PRIVATE_KEY_PATH}")
+        logger.info(f"   Reading public key from: {PUBLIC_KEY_PATH}")
+        keys[KEY_ID] = _load_keyring_key(KEY_ID, KEY_STATUS_ACTIVE, PRIVATE_KEY_PATH.name, PUBLIC_KEY_PATH.name)
+        source = str(KEYS_DIR)
+
+    active_kids = [kid for kid, key in keys.items() if key.status == KEY_STATUS_ACTIVE]
+    if len(active_kids) != 1:
+        raise ValueError(f"Keyring must have exactly one active key, found {len(active_kids)}.")
+    if keys[active_kids[0]].private_key is None:
+        raise ValueError(f"Active key '{active_kids[0]}' has no private key.")
+
+    # Active key first, so clients that only look at keys[0] keep working
+    ordered_kids = active_kids + [kid for kid in keys if kid != active_kids[0]]
+    jwks = {"keys": [
+        {"kty": "OKP", "crv": "Ed25519", "kid": kid, "alg": ALGORITHM, "use": "sig",
+         "x": _extract_jwk_x_coordinate(keys[kid].public_key_pem)}
+        for kid in ordered_kids
+    ]}
+    return KeyRing(
+        keys=keys,
+        active_kid=active_kids[0],
+        jwks=jwks,
+        jwks_document=_serialize_jwks(jwks),
+        source=source
+    )
+
+def _manifest_key_paths() -> List[Path]:
+    """Key files referenced by keyring.json; empty if it is missing or unreadable (its own stat covers that)."""
+    try:
+        entries = _read_manifest()
+    except (OSError, ValueError):
+        return []
+    paths = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        for field in ("private_key", "public_key"):
+            if entry.get(field):
+                paths.append(KEYS_DIR / entry[field])
+    return paths
+
+def _keyring_fingerprint() -> Tuple:
+    # Per-kid key files count too: replacing one in place must trigger a reload like a manifest edit
+    paths = [KEYRING_MANIFEST_PATH, PRIVATE_KEY_PATH, PUBLIC_KEY_PATH] + _manifest_key_paths()
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append((str(path), None, None))
+    return tuple(fingerprint)
+
+def keyring_files_changed() -> bool:
+    """True if the manifest, a key file it references, or the legacy key files changed since the last load."""
+    return _loaded_fingerprint is not None and _keyring_fingerprint() != _loaded_fingerprint
+
 def load_keys(force_reload: bool = False):
     """
-    Loads EdDSA private and public keys from files and prepares JWKS.
-    If keys don't exist, they are generated.
+    Loads the signing keyring from KEYS_DIR and prepares the JWKS.
+    With a keyring.json manifest every non-retired key is loaded; otherwise the
+    single legacy key pair is used (and generated if missing) under KEY_ID.
+    A reload builds a complete new snapshot first and only then swaps it in, so
+    a broken manifest leaves the previous keys in service.
     This function aims to be idempotent for the current process.
     """
-    global _private_key_pem, _public_key_pem, _private_key_obj, _jwks
+    global _keyring, _loaded_fingerprint
 
-    # Check if all essential globals are already populated in *this process's context*
-    if not force_reload and all([_private_key_pem, _public_key_pem, _private_key_obj, _jwks]):
+    # Check if the keyring is already populated in *this process's context*
+    if not force_reload and _keyring is not None:
         logger.info("🔑 Keys already loaded and prepared in this process.")
         return
 
-    logger.info(f"🔄 Loading AIF signing keys (force_reload={force_reload})...")
-    temp_private_pem: Optional[str] = None
-    temp_public_pem: Optional[str] = None
-    temp_private_obj: Optional[ed25519.Ed25519PrivateKey] = None
-    temp_jwks: Optional[Dict[str, Any]] = None
-
-    try:
-        _ensure_keys_exist_on_disk()
+    with _reload_lock:
+        if not force_reload and _keyring is not None:
+            return
+        logger.info(f"🔄 Loading AIF signing keys (force_reload={force_reload})...")
+        try:
+            fingerprint = _keyring_fingerprint()
+            new_keyring = _build_keyring()
+            previous = _keyring
+            # Only swap the snapshot in if all steps were successful
+            _keyring = new_keyring
+            # Taken before reading, so an edit racing the load triggers another reload rather than being missed
+            _loaded_fingerprint = fingerprint
+            if previous is not None and previous.version != new_keyring.version:
+                logger.info(f"🔁 Keyring changed: active kid '{previous.active_kid}' -> '{new_keyring.active_kid}', "
+                            f"published kids {list(new_keyring.keys)}.")
+            logger.info(f"✅ AIF Keys loaded and JWKS prepared successfully (active kid '{new_keyring.active_kid}').")
+        except Exception as e:
+            logger.error(f"❌ CRITICAL ERROR loading keys: {e}", exc_info=True)
+            # Leave the previous snapshot in place (likely None on first load)
+            raise # Re-raise the exception to halt startup if keys are critical
 
-        logger.info(f"   Reading private key from: {PRIVATE_KEY_PATH}")
-        temp_private_pem = Path(PRIVATE_KEY_PATH).read_text()
-        logger.info(f"   Reading public key from: {PUBLIC_KEY_PATH}")
-        temp_public_pem = Path(PUBLIC_KEY_PATH).read_text()
-
-        temp_private_obj = serialization.load_pem_private_key(
-            temp_private_pem.encode(),
-            password=None,
-            backend=default_backend()
-        )
-        if not isinstance(temp_private_obj, ed25519.Ed25519PrivateKey):
-            raise ValueError("Loaded private key is not an Ed25519 private key.")
-        logger.info("   Private key object loaded.")
-
-        x_coordinate = _extract_jwk_x_coordinate(temp_public_pem)
-        temp_jwks = {
-            "keys": [{"kty": "OKP", "crv": "Ed25519", "kid": KEY_ID, "alg": ALGORITHM, "use": "sig", "x": x_coordinate}]
-        }
-        
-        # Only assign to globals if all steps were successful
-        _private_key_pem = temp_private_pem
-        _public_key_pem = temp_public_pem
-        _private_key_obj = temp_private_obj
-        _jwks = temp_jwks
-        logger.info("✅ AIF Keys loaded and JWKS prepared successfully.")
-
-    except Exception as e:
-        logger.error(f"❌ CRITICAL ERROR loading keys: {e}", exc_info=True)
-        # Do not assign globals if there was an error, leave them as they were (likely None)
-        raise # Re-raise the exception to halt startup if keys are critical
+def get_keyring() -> Optional[KeyRing]:
+    """Returns the current keyring snapshot, loading it on first use."""
+    if _keyring is None:
+        logger.debug("🔑 Keyring not found, attempting to load keys via get_keyring...")
+        load_keys()
+    return _keyring
 
 def get_signing_key() -> Optional[ed25519.Ed25519PrivateKey]:
-    if _private_key_obj is None:
-        logger.debug("🔑 Signing key object not found, attempting to load keys via get_signing_key...")
-        load_keys()
-    return _private_key_obj
+    keyring = get_keyring()
+    return keyring.active.private_key if keyring else None
 
 def get_private_key_pem_str() -> Optional[str]:
-    if _private_key_pem is None:
-        logger.debug("🔑 Private key PEM string not found, attempting to load keys via get_private_key_pem_str...")
-        load_keys()
-    return _private_key_pem
+    keyring = get_keyring()
+    return keyring.active.private_key_pem if keyring else None
+
+def get_public_key(kid: str) -> Optional[ed25519.Ed25519PublicKey]:
+    """Public key for `kid` if it is currently published (active, next or retiring)."""
+    keyring = get_keyring()
+    return keyring.public_key(kid) if keyring else None
 
 def get_jwks() -> Optional[Dict[str, Any]]:
-    if _jwks is None:
-        logger.debug("🔑 JWKS not found, attempting to load keys via get_jwks...")
-        load_keys()
-    return _jwks
\ No newline at end of file
+    keyring = get_keyring()
+    return keyring.jwks if keyring else None
+
+def get_jwks_document() -> Optional[Tuple[bytes, str]]:
+    """
+    Returns the JWKS as pre-serialized JSON bytes plus its ETag. Both are
+    computed once per keyring snapshot and replaced only when load_keys()
+    loads a new one.
+    """
+    keyring = get_keyring()
+    return keyring.jwks_document if keyring else None
@@ -0,0 +1,207 @@
+# app/core/key_rotation.py
+"""
+Signing-key rotation without restarts.
+
+A running worker reloads its keyring (app.core.key_manager) from KEYS_DIR on
+SIGHUP, on POST /reg/admin/keys/reload, or when the keyring files change on
+disk (polled every AIF_KEYRING_WATCH_INTERVAL_SECONDS).
+
+Zero-downtime rotation, run from the project root:
+    python -m app.core.key_rotation init              # manifest for the current single key
+    python -m app.core.key_rotation add-next --kid k2 # publish k2 in JWKS; SPs start caching it
+    # ...wait at least the JWKS max-age...
+    python -m app.core.key_rotation promote --kid k2  # k2 signs; the old key is kept as retiring
+    # ...wait at least the ATK lifetime...
+    python -m app.core.key_rotation retire --kid k1   # drop k1 from JWKS
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+from typing import Optional, List, Dict, Any
+import logging
+
+from config.settings import KEY_ID, KEYRING_WATCH_INTERVAL_SECONDS
+from .key_manager import (
+    load_keys,
+    keyring_files_changed,
+    KeyRing,
+    KEYS_DIR,
+    KEYRING_MANIFEST_PATH,
+    PRIVATE_KEY_PATH,
+    PUBLIC_KEY_PATH,
+    KEY_STATUS_ACTIVE,
+    KEY_STATUS_NEXT,
+    KEY_STATUS_RETIRING,
+    KEY_STATUS_RETIRED,
+    _generate_ed25519_keys_pem,
+    _read_manifest,
+    get_keyring,
+)
+from .signing_executor import reload_signing_workers
+
+logger = logging.getLogger(__name__)
+
+_watch_task: Optional[asyncio.Task] = None
+
+def reload_signing_keys() -> KeyRing:
+    """
+    Reloads the keyring from KEYS_DIR and hands it to the signing workers.
+    Raises if the files on disk are invalid; the previous keyring then stays active.
+    """
+    load_keys(force_reload=True)
+    reload_signing_workers()
+    return get_keyring()
+
+async def reload_signing_keys_async() -> KeyRing:
+    """reload_signing_keys off the event loop (it reads files and may start worker processes)."""
+    return await asyncio.to_thread(reload_signing_keys)
+
+async def _reload_logging_errors(reason: str):
+    try:
+        keyring = await reload_signing_keys_async()
+        logger.info(f"🔑 Keyring reloaded ({reason}); active kid '{keyring.active_kid}'.")
+    except Exception as e:
+        logger.error(f"❌ Keyring reload ({reason}) failed, previous keys remain active: {e}")
+
+def install_reload_signal_handler():
+    """Reloads the keyring on SIGHUP. Must be called from the running event loop (app startup)."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(_reload_logging_errors("SIGHUP")))
+        logger.info("🔑 Keyring reload on SIGHUP enabled.")
+    except (NotImplementedError, RuntimeError, ValueError) as e:
+        # Not available off the main thread (e.g. some test clients) or on Windows event loops
+        logger.warning(f"⚠️ Could not install SIGHUP keyring reload handler: {e}")
+
+async def _watch_keyring_files(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if keyring_files_changed():
+            await _reload_logging_errors("keyring files changed")
+
+def start_keyring_watcher():
+    """Starts polling the keyring files, so every worker follows a rotation. Call from the app startup hook."""
+    global _watch_task
+    if KEYRING_WATCH_INTERVAL_SECONDS > 0 and _watch_task is None:
+        _watch_task = asyncio.create_task(_watch_keyring_files(KEYRING_WATCH_INTERVAL_SECONDS))
+
+async def stop_keyring_watcher():
+    """Cancels the keyring watcher. Call from the app shutdown hook."""
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+
+# --- Manifest editing (used by the CLI below) ---
+
+def _write_manifest(entries: List[Dict[str, Any]]):
+    """Writes keyring.json atomically, so a reloading worker never reads a partial file."""
+    KEYS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = KEYRING_MANIFEST_PATH.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps({"keys": entries}, indent=2) + "\n")
+    os.replace(tmp_path, KEYRING_MANIFEST_PATH)
+
+def _find_entry(entries: List[Dict[str, Any]], kid: str) -> Dict[str, Any]:
+    for entry in entries:
+        if entry.get("kid") == kid:
+            return entry
+    raise ValueError(f"Key '{kid}' is not in {KEYRING_MANIFEST_PATH}.")
+
+def _write_new_key_file(file_name: str, data: bytes, mode: int):
+    """
+    Creates a key file with its final permissions, so a private key is never
+    readable by others, not even briefly. Refuses to overwrite an existing file.
+    """
+    fd = os.open(KEYS_DIR / file_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+
+def init_manifest() -> List[Dict[str, Any]]:
+    """Creates keyring.json with the existing single key pair as the active key (kid KEY_ID)."""
+    if KEYRING_MANIFEST_PATH.exists():
+        raise ValueError(f"{KEYRING_MANIFEST_PATH} already exists.")
+    if not PRIVATE_KEY_PATH.exists():
+        raise ValueError(f"No key pair at {PRIVATE_KEY_PATH} to start the keyring from.")
+    entries = [{
+        "kid": KEY_ID,
+        "status": KEY_STATUS_ACTIVE,
+        "private_key": PRIVATE_KEY_PATH.name,
+        "public_key": PUBLIC_KEY_PATH.name,
+    }]
+    _write_manifest(entries)
+    return entries
+
+def add_next_key(kid: str) -> List[Dict[str, Any]]:
+    """Generates a key pair for `kid` and adds it as "next" (published, not yet signing)."""
+    entries = _read_manifest()
+    if any(entry.get("kid") == kid for entry in entries):
+        raise ValueError(f"Key '{kid}' already exists.")
+    private_pem_bytes, public_pem_bytes = _generate_ed25519_keys_pem()
+    private_key_file, public_key_file = f"{kid}.private.pem", f"{kid}.public.pem"
+    _write_new_key_file(private_key_file, private_pem_bytes, 0o600)
+    _write_new_key_file(public_key_file, public_pem_bytes, 0o644)
+    entries.append({"kid": kid, "status": KEY_STATUS_NEXT, "private_key": private_key_file, "public_key": public_key_file})
+    _write_manifest(entries)
+    return entries
+
+def promote_key(kid: str) -> List[Dict[str, Any]]:
+    """Makes `kid` the signing key; the previously active key becomes "retiring"."""
+    entries = _read_manifest()
+    target = _find_entry(entries, kid)
+    if target.get("status") == KEY_STATUS_RETIRED:
+        raise ValueError(f"Key '{kid}' is retired and cannot be promoted.")
+    if not target.get("private_key"):
+        raise ValueError(f"Key '{kid}' has no private key and cannot sign.")
+    for entry in entries:
+        if entry.get("status") == KEY_STATUS_ACTIVE and entry is not target:
+            entry["status"] = KEY_STATUS_RETIRING
+    target["status"] = KEY_STATUS_ACTIVE
+    _write_manifest(entries)
+    return entries
+
+def retire_key(kid: str) -> List[Dict[str, Any]]:
+    """Stops publishing `kid`. Only do this once every ATK signed with it has expired."""
+    entries = _read_manifest()
+    target = _find_entry(entries, kid)
+    if target.get("status") == KEY_STATUS_ACTIVE:
+        raise ValueError(f"Key '{kid}' is active; promote another key first.")
+    target["status"] = KEY_STATUS_RETIRED
+    _write_manifest(entries)
+    return entries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AIF Core Service signing-key rotation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("init", help="Create keyring.json from the existing single key pair.")
+    for command, help_text in (
+        ("add-next", "Generate a new key and publish it as 'next'."),
+        ("promote", "Make a key the active signing key."),
+        ("retire", "Stop publishing a key."),
+    ):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument("--kid", required=True, help="Key ID.")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.command == "init":
+        entries = init_manifest()
+    elif args.command == "add-next":
+        entries = add_next_key(args.kid)
+    elif args.command == "promote":
+        entries = promote_key(args.kid)
+    else:
+        entries = retire_key(args.kid)
+    print(json.dumps({"keys": entries}, indent=2))
+    print("Running workers pick this up on SIGHUP, POST /reg/admin/keys/reload, or the keyring watcher.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# app/core/signer.py
+import base64
+import json
+from calendar import timegm
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+from .key_manager import get_keyring, KeyRing, ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+class ATKSigner:
+    """
+    Compact JWS (EdDSA) signer bound to a single, already-parsed Ed25519 key.
+
+    The protected header is constant for a given key, so it is serialized and
+    base64url-encoded once at construction. Output is byte-identical to
+    `jwt.encode(claims, key, algorithm="EdDSA", headers={"alg", "kid", "typ"})`
+    (sorted header keys, compact separators, datetimes converted to NumericDate).
+    """
+
+    def __init__(self, private_key: ed25519.Ed25519PrivateKey, kid: str, algorithm: str = ALGORITHM):
+        if not isinstance(private_key, ed25519.Ed25519PrivateKey):
+            raise ValueError("ATKSigner requires an Ed25519 private key.")
+        self.private_key = private_key
+        self.kid = kid
+        self.algorithm = algorithm
+        header = {"alg": algorithm, "kid": kid, "typ": "JWT"}
+        self._header_segment = _b64url(json.dumps(header, separators=(",", ":"), sort_keys=True).encode())
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        """Serializes and signs the claims, returning the compact JWS string."""
+        payload = dict(claims)
+        for time_claim in ("exp", "iat", "nbf"):
+            if isinstance(payload.get(time_claim), datetime):
+                payload[time_claim] = timegm(payload[time_claim].utctimetuple())
+
+        payload_segment = _b64url(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        signing_input = self._header_segment + b"." + payload_segment
+        signature = self.private_key.sign(signing_input)
+        return (signing_input + b"." + _b64url(signature)).decode("ascii")
+
+# (keyring snapshot, signer for its active key); replaced with a single assignment
+_signer_entry: Optional[Tuple[KeyRing, ATKSigner]] = None
+
+def get_atk_signer() -> Optional[ATKSigner]:
+    """
+    Returns the process-wide signer for the active key of the current keyring.
+    The signer is rebuilt only when key_manager swaps in a new keyring snapshot
+    (e.g. after `load_keys(force_reload=True)`); in-flight signs keep the signer
+    they already hold, so rotation needs no lock on this path.
+    """
+    global _signer_entry
+    keyring = get_keyring()
+    if keyring is None:
+        return None
+    entry = _signer_entry
+    if entry is None or entry[0] is not keyring:
+        active = keyring.active
+        logger.info(f"✍️ Preparing ATK signer for kid '{active.kid}'.")
+        entry = (keyring, ATKSigner(active.private_key, active.kid))
+        _signer_entry = entry
+    return entry[1]
@@ -0,0 +1,176 @@
+# app/core/signing_executor.py
+import asyncio
+import time
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Dict, Any, Tuple
+import logging
+
+from config.settings import ATK_SIGNING_EXECUTOR, ATK_SIGNING_WORKERS
+from app.utils.metrics import ATK_SIGN_SECONDS, ATK_SIGN_QUEUE_WAIT_SECONDS
+from app.utils.request_timing import record_phase
+from .token_issuer import create_atk, ATKIssuanceResult
+
+logger = logging.getLogger(__name__)
+
+SIGNING_EXECUTOR_MODES = ("thread", "process", "inline")
+
+def _init_process_worker():
+    """Loads the signing keys once per worker process instead of on the first request."""
+    from .key_manager import load_keys
+    load_keys()
+
+def _timed_create_atk(kwargs: Dict[str, Any]) -> Tuple[Optional[ATKIssuanceResult], float]:
+    """Runs create_atk and reports how long it took inside the worker (excludes queue wait)."""
+    started = time.perf_counter()
+    result = create_atk(**kwargs)
+    return result, time.perf_counter() - started
+
+class SigningExecutor:
+    """
+    Runs create_atk off the event loop so CPU-bound signing does not stall
+    concurrent registry requests on the same worker.
+
+    Modes:
+      - "thread":  ThreadPoolExecutor (default)
+      - "process": ProcessPoolExecutor; each worker loads the keys from KEYS_DIR itself
+      - "inline":  signs on the event loop (previous behaviour)
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: int = 2):
+        if mode not in SIGNING_EXECUTOR_MODES:
+            raise ValueError(f"Unknown signing executor mode '{mode}'. Expected one of {SIGNING_EXECUTOR_MODES}.")
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[Executor] = None
+        if mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="atk-signer")
+        elif mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_process_worker)
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_pending = 0
+        self._sign_seconds_total = 0.0
+        self._wait_seconds_total = 0.0
+        self._latency_seconds_total = 0.0
+        self._latency_seconds_max = 0.0
+
+    async def create_atk(self, **kwargs) -> Optional[ATKIssuanceResult]:
+        """Awaitable create_atk; accepts the same keyword arguments."""
+        started = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+
+        result: Optional[ATKIssuanceResult] = None
+        sign_seconds = 0.0
+        try:
+            if self._executor is None:
+                result, sign_seconds = _timed_create_atk(kwargs)
+            else:
+                result, sign_seconds = await asyncio.wrap_future(self._submit(kwargs))
+            return result
+        finally:
+            latency = time.perf_counter() - started
+            queue_wait = max(0.0, latency - sign_seconds)
+            record_phase("atk.sign", sign_seconds)
+            record_phase("atk.queue_wait", queue_wait)
+            if result is not None:
+                ATK_SIGN_SECONDS.observe(sign_seconds)
+                ATK_SIGN_QUEUE_WAIT_SECONDS.observe(queue_wait)
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                if result is None:
+                    self._failed += 1
+                self._sign_seconds_total += sign_seconds
+                self._wait_seconds_total += max(0.0, latency - sign_seconds)
+                self._latency_seconds_total += latency
+                self._latency_seconds_max = max(self._latency_seconds_max, latency)
+
+    def _submit(self, kwargs: Dict[str, Any]) -> Future:
+        """
+        Submits a sign to the current pool. If reload_workers shut that pool down
+        between reading it and submitting, retries once against its replacement.
+        """
+        executor = self._executor
+        try:
+            return executor.submit(_timed_create_atk, kwargs)
+        except RuntimeError:
+            with self._lock:
+                current = self._executor
+            if current is None or current is executor:
+                raise
+            return current.submit(_timed_create_atk, kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and latency counters."""
+        with self._lock:
+            completed = self._completed
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "pending": self._pending,
+                "queue_depth": max(0, self._pending - self.max_workers) if self._executor else 0,
+                "max_pending": self._max_pending,
+                "completed": completed,
+                "failed": self._failed,
+                "avg_sign_ms": (self._sign_seconds_total / completed * 1000) if completed else 0.0,
+                "avg_queue_wait_ms": (self._wait_seconds_total / completed * 1000) if completed else 0.0,
+                "avg_latency_ms": (self._latency_seconds_total / completed * 1000) if completed else 0.0,
+                "max_latency_ms": self._latency_seconds_max * 1000,
+            }
+
+    def reload_workers(self):
+        """
+        Makes the workers pick up a reloaded keyring. Thread and inline modes
+        share this process's keyring already; process workers hold their own copy,
+        so the pool is replaced and signs already queued finish on the old one.
+        """
+        if self.mode != "process" or self._executor is None:
+            return
+        replacement = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_process_worker)
+        with self._lock:
+            previous, self._executor = self._executor, replacement
+        # Submits that still read the old pool retry on the replacement (see _submit)
+        previous.shutdown(wait=False)
+        logger.info("✍️ ATK signing worker processes replaced to pick up reloaded keys.")
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+_signing_executor: Optional[SigningExecutor] = None
+
+def get_signing_executor() -> SigningExecutor:
+    """Returns the process-wide signing executor, creating it from settings on first use."""
+    global _signing_executor
+    if _signing_executor is None:
+        _signing_executor = SigningExecutor(mode=ATK_SIGNING_EXECUTOR, max_workers=ATK_SIGNING_WORKERS)
+        logger.info(f"✍️ ATK signing executor started (mode={_signing_executor.mode}, workers={_signing_executor.max_workers}).")
+    return _signing_executor
+
+async def create_atk_async(**kwargs) -> Optional[ATKIssuanceResult]:
+    """Convenience wrapper: create_atk on the configured signing executor."""
+    return await get_signing_executor().create_atk(**kwargs)
+
+def get_signing_executor_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the signing executor, or None if it has not been started (does not start it)."""
+    return _signing_executor.stats() if _signing_executor is not None else None
+
+def reload_signing_workers():
+    """Propagates a keyring reload to the signing executor's workers, if it is running."""
+    if _signing_executor is not None:
+        _signing_executor.reload_workers()
+
+def shutdown_signing_executor():
+    """Stops the signing executor's workers. Call on application shutdown."""
+    global _signing_executor
+    if _signing_executor is not None:
+        logger.info("🚪 Shutting down ATK signing executor...")
+        _signing_executor.shutdown()
+        _signing_executor = None
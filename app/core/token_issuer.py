@@ -1,12 +1,10 @@
 # app/core/token_issuer.py
 import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 import logging # Use logging
 
-import jwt
-from jwt.exceptions import InvalidTokenError as JOSEError
-
 from config.settings import (
     DEFAULT_TOKEN_EXPIRY_MINUTES,
     CORE_AIF_SERVICE_ISSUER_ID,
@@ -15,10 +13,40 @@ from config.settings import (
     DEFAULT_AIF_TRUST_TAGS, # New: For default trust tags
     ALLOWED_TRUST_TAG_KEYS   # New: For validating provided override trust tags
 )
-from .key_manager import get_signing_key, get_private_key_pem_str, KEY_ID, ALGORITHM
+from .signer import get_atk_signer
 
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True)
+class ATKIssuanceResult:
+    """A signed ATK together with the claims it was signed with."""
+    atk: str
+    aid: str
+    jti: str
+    user_id: str
+    audience: str
+    purpose: str
+    model_id: str
+    issued_at: datetime
+    expires_at: datetime
+    permissions: List[str]
+    trust_tags: Dict[str, str] = field(default_factory=dict)
+
+    def to_token_record(self) -> Dict[str, Any]:
+        """Builds the `issued_tokens` record for this ATK (agent_builder_id is added by the store)."""
+        return {
+            "aid": self.aid,
+            "jti": self.jti,
+            "user_id": self.user_id,
+            "issued_at": self.issued_at,
+            "expires_at": self.expires_at,
+            "audience": self.audience,
+            "purpose": self.purpose,
+            "status": "active",
+            "permissions": list(self.permissions),
+            "model_id": self.model_id,
+        }
+
 def generate_aid(issuer_id: str, model_id: str, user_id: str) -> str:
     agent_instance_id = str(uuid.uuid4())
     return f"{issuer_id}/{model_id}/{user_id}/{agent_instance_id}"
@@ -30,29 +58,24 @@ def create_atk(
     purpose: str,
     model_id: str,
     override_trust_tags: Optional[Dict[str, str]] = None # For actual trust metadata
-) -> Optional[str]:
+) -> Optional[ATKIssuanceResult]:
     issuer_id_to_use = CORE_AIF_SERVICE_ISSUER_ID
     expiry_minutes_to_use = DEFAULT_TOKEN_EXPIRY_MINUTES
 
-    # OPTION A: Try with the PEM string first
-    private_key_pem_str = get_private_key_pem_str() # Get the PEM string from key_manager
-    if not private_key_pem_str:
-        logger.error("❌ CRITICAL Error: Private key PEM string not available for creating ATK.")
+    # Pre-parsed key + pre-encoded header; avoids re-parsing the PEM on every ATK
+    signer = get_atk_signer()
+    if not signer:
+        logger.error("❌ CRITICAL Error: Signing key object not available for creating ATK.")
         return None
 
-    # OPTION B: Keep using the key object if A doesn't work
-    # signing_key_obj = get_signing_key()
-    # if not signing_key_obj:
-    #     logger.error("❌ CRITICAL Error: Signing key object not available for creating ATK.")
-    #     return None
-
     if model_id not in SUPPORTED_AI_MODELS:
-        logger.warning(f"⚠️ Invalid model_id: {model_id}. Not in supported list: {SUPPORTED_AI_MODELS}. Allowing for PoC.")
+        logger.warning("⚠️ Invalid model_id: %s. Not in supported list: %s. Allowing for PoC.", model_id, SUPPORTED_AI_MODELS)
         # Consider raising an error or returning None for stricter validation if desired.
 
     aid_subject = generate_aid(issuer_id=issuer_id_to_use, model_id=model_id, user_id=user_id)
 
-    issued_at = datetime.now(timezone.utc)
+    # NumericDate claims have second precision; truncate so the result matches the signed iat/exp
+    issued_at = datetime.now(timezone.utc).replace(microsecond=0)
     expires_at = issued_at + timedelta(minutes=expiry_minutes_to_use)
 
     # Validate requested permissions against the standard list (or allow custom for PoC)
@@ -64,7 +87,7 @@ def create_atk(
         if perm_stripped in STANDARD_PERMISSIONS_LIST:
             final_permissions.append(perm_stripped)
         else:
-            logger.warning(f"⚠️ Custom permission requested: '{perm_stripped}'. Including for PoC flexibility.")
+            logger.warning("⚠️ Custom permission requested: '%s'. Including for PoC flexibility.", perm_stripped)
             final_permissions.append(perm_stripped) # Allow custom for PoC
 
     if not final_permissions:
@@ -92,24 +115,30 @@ def create_atk(
             if key in ALLOWED_TRUST_TAG_KEYS:
                 current_trust_tags[key] = str(value).strip() # Ensure value is string and stripped
             else:
-                logger.warning(f"⚠️ Unsupported override trust tag key: '{key}'. Skipping.")
+                logger.warning("⚠️ Unsupported override trust tag key: '%s'. Skipping.", key)
     
     if current_trust_tags: # Only add the claim if there are tags
         claims["aif_trust_tags"] = current_trust_tags
 
-    headers = {
-        "alg": ALGORITHM,
-        "kid": KEY_ID,
-        "typ": "JWT"
-    }
-
     try:
-        signed_atk = jwt.encode(claims, private_key_pem_str, algorithm=ALGORITHM, headers=headers)
-        logger.info(f"🔑 ATK issued for sub: {aid_subject}, aud: {audience_sp_id}, perms: {final_permissions}")
-        return signed_atk
-    except JOSEError as e:
-        logger.error(f"❌ Error signing ATK with JOSE: {e}", exc_info=True)
+        signed_atk = signer.sign(claims)
+        logger.info("🔑 ATK issued for sub: %s, aud: %s, perms: %s", aid_subject, audience_sp_id, final_permissions)
+        return ATKIssuanceResult(
+            atk=signed_atk,
+            aid=aid_subject,
+            jti=claims["jti"],
+            user_id=user_id,
+            audience=audience_sp_id,
+            purpose=purpose,
+            model_id=model_id,
+            issued_at=issued_at,
+            expires_at=expires_at,
+            permissions=final_permissions,
+            trust_tags=current_trust_tags,
+        )
+    except (TypeError, ValueError) as e:
+        logger.error("❌ Error serializing or signing ATK: %s", e, exc_info=True)
         return None
     except Exception as e:
-        logger.error(f"❌ An unexpected error occurred during ATK signing: {e}", exc_info=True)
+        logger.error("❌ An unexpected error occurred during ATK signing: %s", e, exc_info=True)
         return None
\ No newline at end of file
@@ -1 +1,227 @@
-"""Module docstring"""
+# app/core/token_validator.py
+import asyncio
+import base64
+import binascii
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Iterable, Union, Tuple
+import logging
+
+from cryptography.exceptions import InvalidSignature
+
+from config.settings import (
+    CORE_AIF_SERVICE_ISSUER_ID,
+    ATK_VERIFY_LEEWAY_SECONDS,
+)
+from app.auth.verified_token_cache import VerifiedTokenCache, get_verified_token_cache
+from app.db.revocation_store import get_revoked_jtis_async
+from app.utils.request_timing import request_phase
+from .key_manager import get_keyring, ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+# Error codes reported in ATKVerificationResult.error
+ERROR_MALFORMED = "malformed"
+ERROR_UNSUPPORTED_ALGORITHM = "unsupported_algorithm"
+ERROR_UNKNOWN_KID = "unknown_kid"
+ERROR_INVALID_SIGNATURE = "invalid_signature"
+ERROR_MISSING_CLAIM = "missing_claim"
+ERROR_EXPIRED = "expired"
+ERROR_NOT_YET_VALID = "not_yet_valid"
+ERROR_INVALID_AUDIENCE = "invalid_audience"
+ERROR_INVALID_ISSUER = "invalid_issuer"
+ERROR_REVOKED = "revoked"
+ERROR_REVOCATION_CHECK_FAILED = "revocation_check_failed"
+
+# Batches up to this size are verified on the event loop; larger ones in a worker thread
+_INLINE_VERIFY_BATCH_SIZE = 8
+
+@dataclass(frozen=True)
+class ATKVerificationResult:
+    valid: bool
+    claims: Optional[Dict[str, Any]] = None
+    kid: Optional[str] = None
+    error: Optional[str] = None
+    error_detail: Optional[str] = None
+
+    @property
+    def jti(self) -> Optional[str]:
+        return self.claims.get("jti") if self.claims else None
+
+def _invalid(error: str, detail: str, kid: Optional[str] = None, claims: Optional[Dict[str, Any]] = None) -> ATKVerificationResult:
+    return ATKVerificationResult(valid=False, claims=claims, kid=kid, error=error, error_detail=detail)
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+class ATKVerifier:
+    """
+    Verifies ATKs issued by this service: EdDSA signature, then exp/nbf/iat,
+    aud and iss with a leeway for clock skew.
+
+    Public keys come from the current keyring snapshot, which already holds
+    parsed Ed25519PublicKey objects indexed by kid (active, next and retiring
+    keys), so ATKs signed before a rotation keep verifying until their key is
+    retired. Revocation is consulted by the async variants only.
+
+    With a `cache`, tokens whose signature checked out are remembered until
+    their exp, so a repeated presentation costs one hash and one dict lookup
+    instead of parsing and signature verification; the time-dependent claim
+    checks still run on every call. Claims in results may come from the cache
+    and are read-only.
+    """
+
+    def __init__(
+        self,
+        issuer: str = CORE_AIF_SERVICE_ISSUER_ID,
+        leeway_seconds: float = ATK_VERIFY_LEEWAY_SECONDS,
+        algorithms: Iterable[str] = (ALGORITHM,),
+        cache: Optional[VerifiedTokenCache] = None
+    ):
+        self.issuer = issuer
+        self.leeway_seconds = leeway_seconds
+        self.algorithms = tuple(algorithms)
+        self.cache = cache
+
+    def verify(self, token: str, audience: Optional[Union[str, Iterable[str]]] = None, now: Optional[float] = None) -> ATKVerificationResult:
+        """
+        Verifies signature and claims (not revocation).
+        `audience`, if given, must match the token's aud (one of them, for a list).
+        """
+        if now is None:
+            now = time.time()
+
+        use_cache = self.cache is not None and isinstance(token, str)
+        if use_cache:
+            cached = self.cache.get(token)
+            # A key retired since the entry was cached must not keep validating its tokens
+            if cached is not None and self._is_published(cached[0]):
+                kid, claims = cached
+                return self._check_claims(claims, kid, audience, now)
+
+        verified = self._verify_signature(token)
+        if isinstance(verified, ATKVerificationResult):
+            return verified
+        kid, claims = verified
+        if use_cache:
+            self.cache.put(token, kid, claims)
+        return self._check_claims(claims, kid, audience, now)
+
+    @staticmethod
+    def _is_published(kid: str) -> bool:
+        keyring = get_keyring()
+        return keyring is not None and keyring.public_key(kid) is not None
+
+    def _verify_signature(self, token: str) -> Union[ATKVerificationResult, Tuple[str, Dict[str, Any]]]:
+        """Returns (kid, claims) once the signature checks out, or an invalid result."""
+        if not isinstance(token, str) or token.count(".") != 2:
+            return _invalid(ERROR_MALFORMED, "Token is not a compact JWS.")
+        header_segment, payload_segment, signature_segment = token.split(".")
+
+        try:
+            header = json.loads(_b64url_decode(header_segment))
+            signature = _b64url_decode(signature_segment)
+        except (ValueError, binascii.Error):
+            return _invalid(ERROR_MALFORMED, "Header or signature is not valid base64url JSON.")
+        if not isinstance(header, dict):
+            return _invalid(ERROR_MALFORMED, "Header is not a JSON object.")
+
+        kid = header.get("kid")
+        if header.get("alg") not in self.algorithms:
+            return _invalid(ERROR_UNSUPPORTED_ALGORITHM, f"Algorithm '{header.get('alg')}' is not accepted.", kid)
+
+        keyring = get_keyring()
+        public_key = keyring.public_key(kid) if keyring and isinstance(kid, str) else None
+        if public_key is None:
+            return _invalid(ERROR_UNKNOWN_KID, f"No published key with kid '{kid}'.", kid)
+
+        try:
+            public_key.verify(signature, f"{header_segment}.{payload_segment}".encode("ascii"))
+        except (InvalidSignature, UnicodeEncodeError):
+            return _invalid(ERROR_INVALID_SIGNATURE, "Signature verification failed.", kid)
+
+        try:
+            claims = json.loads(_b64url_decode(payload_segment))
+        except (ValueError, binascii.Error):
+            return _invalid(ERROR_MALFORMED, "Payload is not valid base64url JSON.", kid)
+        if not isinstance(claims, dict):
+            return _invalid(ERROR_MALFORMED, "Payload is not a JSON object.", kid)
+        return kid, claims
+
+    def _check_claims(self, claims: Dict[str, Any], kid: str, audience, now: float) -> ATKVerificationResult:
+        for claim in ("exp", "iat", "jti", "iss", "aud"):
+            if claim not in claims:
+                return _invalid(ERROR_MISSING_CLAIM, f"Claim '{claim}' is required.", kid, claims)
+        for claim in ("exp", "iat", "nbf"):
+            if claim in claims and (isinstance(claims[claim], bool) or not isinstance(claims[claim], (int, float))):
+                return _invalid(ERROR_MALFORMED, f"Claim '{claim}' must be a NumericDate.", kid, claims)
+
+        leeway = self.leeway_seconds
+        if claims["exp"] <= now - leeway:
+            return _invalid(ERROR_EXPIRED, "Token has expired.", kid, claims)
+        if claims["iat"] > now + leeway:
+            return _invalid(ERROR_NOT_YET_VALID, "Token was issued in the future.", kid, claims)
+        if "nbf" in claims and claims["nbf"] > now + leeway:
+            return _invalid(ERROR_NOT_YET_VALID, "Token is not valid yet (nbf).", kid, claims)
+
+        if claims["iss"] != self.issuer:
+            return _invalid(ERROR_INVALID_ISSUER, f"Unexpected issuer '{claims['iss']}'.", kid, claims)
+
+        if audience is not None:
+            expected = {audience} if isinstance(audience, str) else set(audience)
+            token_audience = claims["aud"]
+            token_audiences = {token_audience} if isinstance(token_audience, str) else set(token_audience or ())
+            if not expected & token_audiences:
+                return _invalid(ERROR_INVALID_AUDIENCE, "Token audience does not match.", kid, claims)
+
+        return ATKVerificationResult(valid=True, claims=claims, kid=kid)
+
+    async def verify_async(self, token: str, audience=None, check_revocation: bool = True) -> ATKVerificationResult:
+        """verify() plus an optional revocation lookup for tokens that are otherwise valid."""
+        results = await self.verify_many_async([token], audience=audience, check_revocation=check_revocation)
+        return results[0]
+
+    def verify_many(self, tokens: List[str], audience=None) -> List[ATKVerificationResult]:
+        """Verifies each token (not revocation); results are in input order."""
+        now = time.time()
+        return [self.verify(token, audience=audience, now=now) for token in tokens]
+
+    async def verify_many_async(self, tokens: List[str], audience=None, check_revocation: bool = True) -> List[ATKVerificationResult]:
+        """
+        verify_many() plus revocation, resolved for all valid tokens with a single
+        batched lookup. Large batches are verified off the event loop.
+        """
+        with request_phase("atk.verify"):
+            if len(tokens) > _INLINE_VERIFY_BATCH_SIZE:
+                results = await asyncio.to_thread(self.verify_many, tokens, audience)
+            else:
+                results = self.verify_many(tokens, audience)
+        if not check_revocation:
+            return results
+
+        jtis = [result.jti for result in results if result.valid]
+        if not jtis:
+            return results
+
+        revoked_jtis = await get_revoked_jtis_async(jtis)
+        checked = []
+        for result in results:
+            if not result.valid:
+                checked.append(result)
+            elif revoked_jtis is None:
+                checked.append(_invalid(ERROR_REVOCATION_CHECK_FAILED, "Could not check revocation status.", result.kid, result.claims))
+            elif result.jti in revoked_jtis:
+                checked.append(_invalid(ERROR_REVOKED, "Token has been revoked.", result.kid, result.claims))
+            else:
+                checked.append(result)
+        return checked
+
+_verifier: Optional[ATKVerifier] = None
+
+def get_atk_verifier() -> ATKVerifier:
+    """Returns the process-wide verifier configured from settings, with the verified-token cache if enabled."""
+    global _verifier
+    if _verifier is None:
+        _verifier = ATKVerifier(cache=get_verified_token_cache())
+    return _verifier
@@ -1,12 +1,23 @@
 # app/db/__init__.py
-from .mongo_client import get_db, close_db_connection, ensure_db_indexes
-from .revocation_store import add_jti_to_revocation_list, is_jti_revoked
+from .mongo_client import get_db, close_db_connection, ensure_db_indexes, get_async_db, close_async_db_connection
+from .revocation_store import (
+    add_jti_to_revocation_list,
+    is_jti_revoked,
+    add_jti_to_revocation_list_async,
+    is_jti_revoked_async,
+    get_revoked_jtis_async,
+)
 
 # Expose functions for easy import from 'app.db'
 __all__ = [
     "get_db",
     "close_db_connection",
     "ensure_db_indexes",
+    "get_async_db",
+    "close_async_db_connection",
     "add_jti_to_revocation_list",
-    "is_jti_revoked"
+    "is_jti_revoked",
+    "add_jti_to_revocation_list_async",
+    "is_jti_revoked_async",
+    "get_revoked_jtis_async"
 ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+# app/db/migrations.py
+"""
+One-off data migrations for the AIF Core Service database.
+
+Run from the project root, e.g.:
+    python -m app.db.migrations trim-tokens-issued --dry-run
+    python -m app.db.migrations trim-tokens-issued --keep 50
+    python -m app.db.migrations backfill-revocation-expiry --dry-run
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from .mongo_client import get_db, close_db_connection
+from .user_store import USERS_COLLECTION
+from .revocation_store import token_expiry_timestamp
+from config.settings import REVOKED_TOKENS_COLLECTION_NAME, ISSUED_TOKENS_COLLECTION_NAME
+
+logger = logging.getLogger(__name__)
+
+def trim_user_token_history(db: Database, keep: int = 0, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Trims the legacy `tokens_issued` array embedded in user documents.
+    The full history is kept in the issued_tokens collection, so the array is
+    either removed (keep=0) or capped to its `keep` most recent entries.
+
+    Returns a summary with the number of matched and modified user documents.
+    """
+    collection = db[USERS_COLLECTION]
+    query = {"tokens_issued": {"$exists": True}}
+    if keep > 0:
+        # Only documents whose array is longer than `keep` need rewriting
+        query = {f"tokens_issued.{keep}": {"$exists": True}}
+
+    matched = collection.count_documents(query)
+    if dry_run or matched == 0:
+        logger.info(f"🧹 {matched} user documents would be trimmed (keep={keep}, dry_run={dry_run}).")
+        return {"matched": matched, "modified": 0, "dry_run": dry_run}
+
+    if keep > 0:
+        result = collection.update_many(
+            query,
+            [{"$set": {"tokens_issued": {"$slice": ["$tokens_issued", -keep]}}}]
+        )
+    else:
+        result = collection.update_many(query, {"$unset": {"tokens_issued": ""}})
+    logger.info(f"🧹 Trimmed tokens_issued on {result.modified_count} user documents (keep={keep}).")
+    return {"matched": matched, "modified": result.modified_count, "dry_run": False}
+
+def backfill_revocation_expiry(db: Database, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Sets `original_exp_at` on revoked_atks entries recorded without it, so the
+    TTL index can compact them. The expiry comes from the entry's own
+    `original_exp_ts` or, failing that, from the matching issued_tokens record.
+    Entries whose token is unknown are left as they are (never expired).
+
+    Returns a summary with the number of scanned, updated and unresolved entries.
+    """
+    revoked_collection = db[REVOKED_TOKENS_COLLECTION_NAME]
+    issued_collection = db[ISSUED_TOKENS_COLLECTION_NAME]
+    summary = {"scanned": 0, "updated": 0, "unresolved": 0, "dry_run": dry_run}
+
+    def flush(batch):
+        jtis_to_look_up = [doc["jti"] for doc in batch if doc.get("original_exp_ts") is None]
+        issued_exp = {}
+        if jtis_to_look_up:
+            for record in issued_collection.find({"jti": {"$in": jtis_to_look_up}}, {"_id": 0, "jti": 1, "expires_at": 1}):
+                issued_exp[record["jti"]] = token_expiry_timestamp(record)
+
+        operations = []
+        for doc in batch:
+            exp_ts = doc.get("original_exp_ts")
+            if exp_ts is None:
+                exp_ts = issued_exp.get(doc["jti"])
+            if exp_ts is None:
+                summary["unresolved"] += 1
+                continue
+            operations.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"original_exp_ts": exp_ts, "original_exp_at": datetime.fromtimestamp(exp_ts, tz=timezone.utc)}}
+            ))
+        if operations and not dry_run:
+            summary["updated"] += revoked_collection.bulk_write(operations, ordered=False).modified_count
+        elif dry_run:
+            summary["updated"] += len(operations)
+
+    batch = []
+    for doc in revoked_collection.find({"original_exp_at": {"$exists": False}}, {"jti": 1, "original_exp_ts": 1}):
+        summary["scanned"] += 1
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    logger.info(f"🧹 Revocation expiry backfill: {summary}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AIF Core Service data migrations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    trim_parser = subparsers.add_parser(
+        "trim-tokens-issued",
+        help="Remove or cap the tokens_issued array embedded in user documents."
+    )
+    trim_parser.add_argument("--keep", type=int, default=0, help="Keep the N most recent entries instead of removing the array.")
+    trim_parser.add_argument("--dry-run", action="store_true", help="Only count the documents that would change.")
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-revocation-expiry",
+        help="Record the token expiry on revoked_atks entries so the TTL index can remove them."
+    )
+    backfill_parser.add_argument("--batch-size", type=int, default=1000, help="Entries resolved per issued_tokens lookup.")
+    backfill_parser.add_argument("--dry-run", action="store_true", help="Only count the entries that would change.")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    try:
+        db = get_db()
+        if args.command == "trim-tokens-issued":
+            summary = trim_user_token_history(db, keep=max(0, args.keep), dry_run=args.dry_run)
+            print(summary)
+        elif args.command == "backfill-revocation-expiry":
+            summary = backfill_revocation_expiry(db, batch_size=max(1, args.batch_size), dry_run=args.dry_run)
+            print(summary)
+    finally:
+        close_db_connection()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import os
 import logging
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 from pymongo.database import Database
-from pymongo.errors import ConnectionFailure
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import ConnectionFailure, PyMongoError
 from typing import Optional
 
 
@@ -13,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 _db_client: Optional[MongoClient] = None
 _db: Optional[Database] = None
+_async_db_client: Optional[AsyncMongoClient] = None
+_async_db: Optional[AsyncDatabase] = None
 
 def get_db() -> Database:
     """
@@ -21,31 +24,64 @@ def get_db() -> Database:
     """
     global _db_client, _db
     if _db is None:
-        print(f"🔄 Initializing MongoDB connection to {MONGO_DATABASE_URL} / DB: {MONGO_DATABASE_NAME}...")
+        logger.info(f"🔄 Initializing MongoDB connection to {MONGO_DATABASE_URL} / DB: {MONGO_DATABASE_NAME}...")
         try:
             _db_client = MongoClient(MONGO_DATABASE_URL, serverSelectionTimeoutMS=5000) # Added timeout
             # The ismaster command is cheap and does not require auth.
             _db_client.admin.command('ismaster') # Verifies connection
             _db = _db_client[MONGO_DATABASE_NAME]
-            print(f"✅ Successfully connected to MongoDB: {MONGO_DATABASE_NAME}")
+            logger.info(f"✅ Successfully connected to MongoDB: {MONGO_DATABASE_NAME}")
         except ConnectionFailure as e:
-            print(f"❌ CRITICAL ERROR: Could not connect to MongoDB at {MONGO_DATABASE_URL}.")
-            print(f"   Error details: {e}")
+            logger.critical(f"❌ CRITICAL ERROR: Could not connect to MongoDB at {MONGO_DATABASE_URL}: {e}")
             raise
         except Exception as e:
-            print(f"❌ CRITICAL ERROR: An unexpected error occurred during MongoDB connection: {e}")
+            logger.critical(f"❌ CRITICAL ERROR: An unexpected error occurred during MongoDB connection: {e}")
             raise
     return _db
 
 def close_db_connection():
     """Closes the MongoDB connection if it's open."""
     global _db_client, _db
+    # Drain queued issued-token records while the client is still open
+    from .token_write_behind import stop_write_behind
+    stop_write_behind()
     if _db_client:
-        print("🚪 Closing MongoDB connection...")
+        logger.info("🚪 Closing MongoDB connection...")
         _db_client.close()
         _db_client = None
         _db = None
-        print("✅ MongoDB connection closed.")
+        logger.info("✅ MongoDB connection closed.")
+
+def get_async_db() -> AsyncDatabase:
+    """
+    Provides the asyncio-native MongoDB database instance used by the request paths.
+    The client connects lazily on first use and must be created inside the running event loop.
+    """
+    global _async_db_client, _async_db
+    if _async_db is None:
+        _async_db_client = AsyncMongoClient(MONGO_DATABASE_URL, serverSelectionTimeoutMS=5000)
+        _async_db = _async_db_client[MONGO_DATABASE_NAME]
+    return _async_db
+
+async def connect_async_db() -> AsyncDatabase:
+    """Creates the async client and verifies the connection. Call from the app startup hook."""
+    db = get_async_db()
+    try:
+        await _async_db_client.admin.command('ping')
+        logger.info(f"✅ Async MongoDB client connected: {MONGO_DATABASE_NAME}")
+    except ConnectionFailure as e:
+        logger.critical(f"❌ CRITICAL ERROR: Async MongoDB client could not connect to {MONGO_DATABASE_URL}: {e}")
+        raise
+    return db
+
+async def close_async_db_connection():
+    """Closes the async MongoDB client if it's open."""
+    global _async_db_client, _async_db
+    if _async_db_client:
+        logger.info("🚪 Closing async MongoDB connection...")
+        await _async_db_client.close()
+        _async_db_client = None
+        _async_db = None
 
 # Ensure collections and indexes are created on startup if they don't exist
 def ensure_db_indexes(db_instance: Database):
@@ -53,7 +89,7 @@ def ensure_db_indexes(db_instance: Database):
     Ensures necessary indexes are created in MongoDB collections.
     Call this once at application startup after getting the DB instance.
     """
-    print("🔧 Ensuring database indexes...")
+    logger.info("🔧 Ensuring database indexes...")
     try:
         # For revoked_atks collection
         revoked_tokens_collection_name = os.getenv("REVOKED_TOKENS_COLLECTION_NAME", "revoked_atks") # Get from settings if used elsewhere
@@ -62,24 +98,43 @@ def ensure_db_indexes(db_instance: Database):
         # Index on 'jti' for fast lookups, ensure uniqueness
         if "jti_1" not in revoked_collection.index_information():
             revoked_collection.create_index("jti", unique=True, name="jti_1")
-            print(f"   ✅ Index 'jti_1' created for collection '{revoked_tokens_collection_name}'.")
+            logger.info(f"✅ Index 'jti_1' created for collection '{revoked_tokens_collection_name}'.")
         else:
-            print(f"   👍 Index 'jti_1' already exists for collection '{revoked_tokens_collection_name}'.")
+            logger.info(f"👍 Index 'jti_1' already exists for collection '{revoked_tokens_collection_name}'.")
 
-        # Optional: TTL index on 'revoked_at' or 'original_exp' for automatic cleanup of old revoked tokens
-        # This is more advanced and depends on your cleanup strategy. Example:
-        # if "revoked_at_ttl_1" not in revoked_collection.index_information():
-        #     # Expire documents 30 days after they were revoked (adjust as needed)
-        #     revoked_collection.create_index("revoked_at", expireAfterSeconds=30*24*60*60, name="revoked_at_ttl_1")
-        #     print(f"   ✅ TTL Index 'revoked_at_ttl_1' created for collection '{revoked_tokens_collection_name}'.")
+        # TTL index on 'original_exp_at': a revoked ATK is useless once it has expired, so its
+        # entry is removed after the expiry plus a grace window. Entries without a known expiry are kept.
+        ensure_revocation_ttl_index(revoked_collection)
 
         # Add index creation for other collections as they are introduced in Phase 2
-        print("✅ Database index check complete.")
+        logger.info("✅ Database index check complete.")
 
     except PyMongoError as e:
-        print(f"❌ MongoDB Error during index creation: {e}")
+        logger.error(f"❌ MongoDB Error during index creation: {e}")
     except Exception as e:
-        print(f"❌ Unexpected error during index creation: {e}")
+        logger.error(f"❌ Unexpected error during index creation: {e}")
+
+def ensure_revocation_ttl_index(revoked_collection):
+    """Creates the revoked_atks TTL index, or updates its expireAfterSeconds if the grace window changed."""
+    from config.settings import REVOKED_TOKEN_RETENTION_GRACE_SECONDS
+
+    index_name = "original_exp_at_ttl_1"
+    existing = revoked_collection.index_information().get(index_name)
+    if existing is None:
+        revoked_collection.create_index(
+            "original_exp_at",
+            expireAfterSeconds=REVOKED_TOKEN_RETENTION_GRACE_SECONDS,
+            name=index_name
+        )
+        logger.info(f"✅ TTL Index '{index_name}' created (grace {REVOKED_TOKEN_RETENTION_GRACE_SECONDS}s).")
+    elif existing.get("expireAfterSeconds") != REVOKED_TOKEN_RETENTION_GRACE_SECONDS:
+        revoked_collection.database.command(
+            "collMod", revoked_collection.name,
+            index={"name": index_name, "expireAfterSeconds": REVOKED_TOKEN_RETENTION_GRACE_SECONDS}
+        )
+        logger.warning(f"🔄 TTL Index '{index_name}' grace updated to {REVOKED_TOKEN_RETENTION_GRACE_SECONDS}s.")
+    else:
+        logger.info(f"👍 TTL Index '{index_name}' already exists.")
 
 # Example of how to call ensure_db_indexes in app startup (e.g., in app/__init__.py or run.py)
 # db = get_db()
@@ -94,13 +149,21 @@ def ensure_revocation_indexes(db):
         revoked_collection = db[REVOKED_TOKENS_COLLECTION_NAME]
         revoked_collection.create_index("jti", unique=True)
         revoked_collection.create_index("revoked_by")
+        # Serves a builder's revoked-token list, newest first (get_revoked_tokens)
+        revoked_collection.create_index([("revoked_by", 1), ("revoked_at", -1)])
         revoked_collection.create_index("revoked_at")
+        # Serves the revocation delta feed, which pages on (revoked_at, _id)
+        revoked_collection.create_index([("revoked_at", 1), ("_id", 1)])
         
         # Index for issued tokens  
         issued_collection = db[ISSUED_TOKENS_COLLECTION_NAME]
         issued_collection.create_index("jti", unique=True)
         issued_collection.create_index("agent_builder_id")
         issued_collection.create_index("status")
+        # Serves the per-user issuance history (get_user_issued_tokens), newest first
+        issued_collection.create_index([("agent_builder_id", 1), ("issued_at", -1)])
+        # Serves selector-based bulk revocation by AID prefix (anchored regex), scoped to a builder
+        issued_collection.create_index([("agent_builder_id", 1), ("aid", 1)])
         
         logger.info("✅ Revocation indexes ensured")
     except Exception as e:
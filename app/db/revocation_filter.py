@@ -0,0 +1,222 @@
+# app/db/revocation_filter.py
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+import logging
+
+from app.utils.bloom_filter import BloomFilter
+from config.settings import (
+    REVOKED_TOKENS_COLLECTION_NAME,
+    REVOCATION_FILTER_ENABLED,
+    REVOCATION_FILTER_FALSE_POSITIVE_RATE,
+    REVOCATION_FILTER_MIN_CAPACITY,
+    REVOCATION_FILTER_REFRESH_SECONDS,
+    REVOCATION_FILTER_REBUILD_SECONDS,
+    REVOCATION_FILTER_MAX_STALENESS_SECONDS,
+)
+from .mongo_client import get_async_db
+
+logger = logging.getLogger(__name__)
+
+# Revocations from other workers are picked up by querying revoked_at >= the last
+# refresh minus this margin, to tolerate small clock differences between writers.
+_REFRESH_OVERLAP = timedelta(seconds=5)
+
+class RevocationFilter:
+    """
+    In-memory Bloom filter over the revoked JTI set, used as a negative cache.
+
+    A JTI the filter has never seen is definitely not revoked, so the lookup
+    can be answered without touching MongoDB. Possible members still go to the
+    database. The filter is:
+      - built from revoked_atks at startup and rebuilt periodically or on demand
+        (which also drops JTIs removed by TTL compaction and resizes it),
+      - updated immediately for revocations made by this process,
+      - refreshed incrementally every few seconds with revocations written by
+        other workers (revoked_at >= last refresh).
+    If no rebuild or refresh has succeeded within `max_staleness_seconds`, the
+    filter stops answering (not ready), so lookups fail closed to the database
+    instead of missing revocations made elsewhere.
+    """
+
+    def __init__(self, false_positive_rate: float, min_capacity: int, max_staleness_seconds: Optional[float] = None):
+        self.false_positive_rate = false_positive_rate
+        self.min_capacity = max(1, min_capacity)
+        self.max_staleness_seconds = max_staleness_seconds
+        self._bloom: Optional[BloomFilter] = None
+        self._refreshed_through: Optional[datetime] = None
+        # Monotonic start time of the last successful rebuild or refresh
+        self._synced_at: Optional[float] = None
+        self._rebuild_lock = asyncio.Lock()
+        self._adds_during_rebuild: Optional[List[str]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.lookups = 0
+        self.definite_negatives = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.stale_lookups = 0
+        self.last_rebuild_seconds = 0.0
+        self.last_rebuild_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None and not self.is_stale()
+
+    def is_stale(self) -> bool:
+        """True when the last successful sync is older than max_staleness_seconds."""
+        if self.max_staleness_seconds is None or self._synced_at is None:
+            return False
+        return time.monotonic() - self._synced_at > self.max_staleness_seconds
+
+    def add(self, jti: str):
+        """Records a revocation made by this process."""
+        if self._bloom is not None:
+            self._bloom.add(jti)
+        if self._adds_during_rebuild is not None:
+            self._adds_during_rebuild.append(jti)
+
+    def definitely_not_revoked(self, jti: str) -> bool:
+        """True only when the JTI is certainly absent from the revocation list."""
+        bloom = self._bloom
+        if bloom is None:
+            return False
+        if self.is_stale():
+            # Revocations from other workers may be missing; let the database answer
+            self.stale_lookups += 1
+            return False
+        self.lookups += 1
+        if jti in bloom:
+            return False
+        self.definite_negatives += 1
+        return True
+
+    def record_false_positive(self):
+        """Called when the filter said "maybe" but the database said "not revoked"."""
+        self.false_positives += 1
+
+    async def rebuild(self):
+        """Rebuilds the filter from the full revoked_atks collection and swaps it in."""
+        async with self._rebuild_lock:
+            started = time.perf_counter()
+            synced_at = time.monotonic()
+            rebuild_started_at = datetime.now(timezone.utc)
+            self._adds_during_rebuild = []
+            try:
+                collection = get_async_db()[REVOKED_TOKENS_COLLECTION_NAME]
+                revoked_count = await collection.estimated_document_count()
+                # Headroom so local and incremental adds do not saturate it before the next rebuild
+                bloom = BloomFilter(max(self.min_capacity, revoked_count * 2), self.false_positive_rate)
+                async for doc in collection.find({}, {"jti": 1, "_id": 0}, batch_size=10000):
+                    jti = doc.get("jti")
+                    if jti:
+                        bloom.add(jti)
+                bloom.update(self._adds_during_rebuild)
+                self._bloom = bloom
+                self._refreshed_through = rebuild_started_at
+                self._synced_at = synced_at
+            finally:
+                self._adds_during_rebuild = None
+
+            self.rebuilds += 1
+            self.last_rebuild_seconds = time.perf_counter() - started
+            self.last_rebuild_at = time.time()
+            logger.info(f"🧮 Revocation filter rebuilt: {bloom.count} JTIs, {bloom.size_bytes} bytes, "
+                        f"{bloom.num_hashes} hashes in {self.last_rebuild_seconds * 1000:.1f}ms.")
+
+    async def refresh(self):
+        """Adds revocations written since the last refresh (e.g. by other workers)."""
+        if self._bloom is None or self._refreshed_through is None:
+            await self.rebuild()
+            return
+        synced_at = time.monotonic()
+        refresh_started_at = datetime.now(timezone.utc)
+        collection = get_async_db()[REVOKED_TOKENS_COLLECTION_NAME]
+        since = self._refreshed_through - _REFRESH_OVERLAP
+        async for doc in collection.find({"revoked_at": {"$gte": since}}, {"jti": 1, "_id": 0}):
+            jti = doc.get("jti")
+            if jti:
+                self._bloom.add(jti)
+        self._refreshed_through = refresh_started_at
+        self._synced_at = synced_at
+        self.refreshes += 1
+        if self._bloom.is_saturated():
+            await self.rebuild()
+
+    async def run(self, refresh_seconds: float, rebuild_seconds: float):
+        """Background loop: incremental refresh every `refresh_seconds`, full rebuild every `rebuild_seconds`."""
+        last_rebuild = time.monotonic()
+        while True:
+            await asyncio.sleep(refresh_seconds)
+            try:
+                if time.monotonic() - last_rebuild >= rebuild_seconds:
+                    await self.rebuild()
+                    last_rebuild = time.monotonic()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stale_note = " Lookups now go to MongoDB until a refresh succeeds." if self.is_stale() else ""
+                logger.error(f"❌ Revocation filter refresh failed: {e}.{stale_note}")
+
+    def stats(self) -> Dict[str, Any]:
+        bloom = self._bloom
+        checked_db = self.lookups - self.definite_negatives
+        return {
+            "ready": self.ready,
+            "stale": self.is_stale(),
+            "jtis": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "size_bytes": bloom.size_bytes if bloom else 0,
+            "num_hashes": bloom.num_hashes if bloom else 0,
+            "target_false_positive_rate": self.false_positive_rate,
+            "lookups": self.lookups,
+            "definite_negatives": self.definite_negatives,
+            "false_positives": self.false_positives,
+            "observed_false_positive_rate": (self.false_positives / checked_db) if checked_db else 0.0,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "stale_lookups": self.stale_lookups,
+            "seconds_since_sync": (time.monotonic() - self._synced_at) if self._synced_at is not None else None,
+            "last_rebuild_ms": self.last_rebuild_seconds * 1000,
+            "last_rebuild_at": self.last_rebuild_at,
+        }
+
+_revocation_filter: Optional[RevocationFilter] = (
+    RevocationFilter(REVOCATION_FILTER_FALSE_POSITIVE_RATE, REVOCATION_FILTER_MIN_CAPACITY,
+                     REVOCATION_FILTER_MAX_STALENESS_SECONDS)
+    if REVOCATION_FILTER_ENABLED else None
+)
+
+def get_revocation_filter() -> Optional[RevocationFilter]:
+    """Returns the process-wide revocation filter, or None when it is disabled."""
+    return _revocation_filter
+
+async def start_revocation_filter():
+    """Builds the filter and starts its refresh loop. Call from the app startup hook."""
+    if _revocation_filter is None:
+        return
+    await _revocation_filter.rebuild()
+    _revocation_filter._task = asyncio.create_task(
+        _revocation_filter.run(REVOCATION_FILTER_REFRESH_SECONDS, REVOCATION_FILTER_REBUILD_SECONDS)
+    )
+
+async def rebuild_revocation_filter() -> Optional[Dict[str, Any]]:
+    """Forces a full rebuild, e.g. after bulk maintenance on revoked_atks. Returns the new stats, or None when disabled."""
+    if _revocation_filter is None:
+        return None
+    await _revocation_filter.rebuild()
+    return _revocation_filter.stats()
+
+async def stop_revocation_filter():
+    """Cancels the refresh loop. Call from the app shutdown hook."""
+    if _revocation_filter is not None and _revocation_filter._task is not None:
+        _revocation_filter._task.cancel()
+        try:
+            await _revocation_filter._task
+        except asyncio.CancelledError:
+            pass
+        _revocation_filter._task = None
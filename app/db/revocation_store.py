@@ -1,20 +1,108 @@
-from datetime import datetime, timezone
-from typing import Optional, List, Dict
+import base64
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Set, Tuple
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import logging
 
-from .mongo_client import get_db
-from .token_store import update_token_status, get_token_by_jti
-from config.settings import REVOKED_TOKENS_COLLECTION_NAME
+from .mongo_client import get_db, get_async_db
+from .token_store import (
+    update_token_status,
+    get_token_by_jti,
+    update_token_status_async,
+    get_token_by_jti_async,
+    get_issued_tokens_collection_async,
+    get_tokens_by_jtis,
+    get_tokens_by_jtis_async,
+    flush_pending_token_records_async,
+)
+from .revocation_filter import get_revocation_filter
+from app.auth.verified_token_cache import invalidate_verified_token
+from app.utils.metrics import timed_db_operation
+from config.settings import REVOKED_TOKENS_COLLECTION_NAME, BULK_REVOCATION_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True)
+class BulkRevocationResult:
+    revoked_jtis: List[str]
+    # False when an error stopped the revocation part-way; the revoked_jtis stay revoked
+    complete: bool = True
+
 def get_revoked_tokens_collection():
     """Returns the MongoDB collection for revoked ATKs."""
     db = get_db()
     return db[REVOKED_TOKENS_COLLECTION_NAME]
 
+def get_revoked_tokens_collection_async():
+    """Returns the revoked ATKs collection from the async client."""
+    db = get_async_db()
+    return db[REVOKED_TOKENS_COLLECTION_NAME]
+
+def _build_revocation_doc(
+    jti: str,
+    original_exp_timestamp: Optional[int],
+    agent_builder_id: Optional[str]
+) -> Dict:
+    doc_to_insert = {
+        "jti": jti,
+        "revoked_at": datetime.now(timezone.utc)
+    }
+
+    if original_exp_timestamp is not None:
+        doc_to_insert["original_exp_ts"] = original_exp_timestamp
+        # Date copy of the expiry for the TTL index that compacts revoked_atks
+        doc_to_insert["original_exp_at"] = datetime.fromtimestamp(original_exp_timestamp, tz=timezone.utc)
+
+    if agent_builder_id:
+        doc_to_insert["revoked_by"] = ObjectId(agent_builder_id)
+    return doc_to_insert
+
+def token_expiry_timestamp(token_info: Optional[dict]) -> Optional[int]:
+    """Returns the `expires_at` of an issued_tokens record as a Unix timestamp, if present."""
+    expires_at = (token_info or {}).get("expires_at")
+    if not isinstance(expires_at, datetime):
+        return None
+    if expires_at.tzinfo is None:
+        # MongoDB returns naive datetimes; they are stored as UTC
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return int(expires_at.timestamp())
+
+def _record_local_revocation(jti: str):
+    # Added to the filter before the write so a concurrent check can never get a definite negative for it
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None:
+        revocation_filter.add(jti)
+    invalidate_verified_token(jti)
+
+def _is_token_owned_by(token_info: Optional[dict], user_id: str, jti: str) -> bool:
+    """Ownership rule shared by can_user_revoke_token and its async variant."""
+    if not token_info:
+        logger.info("🔍 Token with JTI '%s' not found in issued tokens", jti)
+        return False
+
+    # Check if the token was issued by this user
+    token_issuer_id = token_info.get("agent_builder_id")
+
+    if not token_issuer_id:
+        logger.warning("⚠️ Token '%s' has no agent_builder_id recorded", jti)
+        return False
+
+    # Convert to string for comparison (handle ObjectId)
+    if isinstance(token_issuer_id, ObjectId):
+        token_issuer_id = str(token_issuer_id)
+
+    user_can_revoke = str(token_issuer_id) == str(user_id)
 
+    logger.info("🔍 Ownership check for JTI '%s': Issuer=%s, Requester=%s, CanRevoke=%s",
+                jti, token_issuer_id, user_id, user_can_revoke)
+
+    return user_can_revoke
+
+@timed_db_operation
 def add_jti_to_revocation_list(
     jti: str, 
     original_exp_timestamp: Optional[int] = None,
@@ -22,11 +110,13 @@ def add_jti_to_revocation_list(
 ) -> bool:
     """
     Adds a JTI to the revocation list.
-    Stores the original expiry time (as Unix timestamp) for potential future cleanup.
+    Stores the original expiry time so the entry is compacted by the TTL index
+    once the token could no longer be used anyway.
 
     Args:
         jti: The JWT ID to revoke.
         original_exp_timestamp: The original 'exp' claim (Unix timestamp) of the token.
+            Looked up from issued_tokens when not given.
         agent_builder_id: The ID of the agent builder revoking the token (if authenticated)
 
     Returns:
@@ -37,18 +127,11 @@ def add_jti_to_revocation_list(
         return False
 
     try:
+        if original_exp_timestamp is None:
+            original_exp_timestamp = token_expiry_timestamp(get_token_by_jti(jti))
         collection = get_revoked_tokens_collection()
-        
-        doc_to_insert = {
-            "jti": jti,
-            "revoked_at": datetime.now(timezone.utc)
-        }
-        
-        if original_exp_timestamp is not None:
-            doc_to_insert["original_exp_ts"] = original_exp_timestamp
-            
-        if agent_builder_id:
-            doc_to_insert["revoked_by"] = ObjectId(agent_builder_id)
+        doc_to_insert = _build_revocation_doc(jti, original_exp_timestamp, agent_builder_id)
+        _record_local_revocation(jti)
 
         # Using update_one with upsert ensures that if the JTI already exists
         # (e.g., revoked again), we just update the 'revoked_at' time.
@@ -62,15 +145,49 @@ def add_jti_to_revocation_list(
         update_token_status(jti, "revoked")
         
         if result.upserted_id or result.modified_count > 0 or result.matched_count > 0:
-            logger.info(f"🛡️ JTI '{jti}' processed for revocation list by user {agent_builder_id}")
+            logger.info("🛡️ JTI '%s' processed for revocation list by user %s", jti, agent_builder_id)
             return True
         else:
-            logger.warning(f"🤔 JTI '{jti}' revocation processing had no effect (already exists identically?).")
+            logger.warning("🤔 JTI '%s' revocation processing had no effect (already exists identically?).", jti)
             return True  # Still consider it successful
     except Exception as e:
-        logger.error(f"❌ Error processing JTI '{jti}' for revocation: {e}")
+        logger.error("❌ Error processing JTI '%s' for revocation: %s", jti, e)
+        return False
+
+@timed_db_operation
+async def add_jti_to_revocation_list_async(
+    jti: str,
+    original_exp_timestamp: Optional[int] = None,
+    agent_builder_id: Optional[str] = None
+) -> bool:
+    """Async variant of add_jti_to_revocation_list."""
+    if not jti:
+        logger.warning("⚠️ Attempted to revoke an empty JTI.")
+        return False
+
+    try:
+        if original_exp_timestamp is None:
+            original_exp_timestamp = token_expiry_timestamp(await get_token_by_jti_async(jti))
+        collection = get_revoked_tokens_collection_async()
+        doc_to_insert = _build_revocation_doc(jti, original_exp_timestamp, agent_builder_id)
+        _record_local_revocation(jti)
+
+        await collection.update_one(
+            {"jti": jti},
+            {"$set": doc_to_insert},
+            upsert=True
+        )
+
+        # If this token is in our issued_tokens collection, update its status
+        await update_token_status_async(jti, "revoked")
+
+        logger.info("🛡️ JTI '%s' processed for revocation list by user %s", jti, agent_builder_id)
+        return True
+    except Exception as e:
+        logger.error("❌ Error processing JTI '%s' for revocation: %s", jti, e)
         return False
 
+@timed_db_operation
 def is_jti_revoked(jti: str) -> Optional[bool]:
     """
     Checks if a JTI is in the revocation list.
@@ -91,18 +208,234 @@ def is_jti_revoked(jti: str) -> Optional[bool]:
         document = collection.find_one({"jti": jti})
         
         if document:
-            logger.info(f"🛡️ JTI '{jti}' IS REVOKED (found in revocation list).")
+            logger.info("🛡️ JTI '%s' IS REVOKED (found in revocation list).", jti)
+            return True
+        else:
+            logger.info("🛡️ JTI '%s' is NOT revoked (not found in revocation list).", jti)
+            return False
+    except Exception as e:
+        logger.error("❌ Error checking JTI '%s': %s", jti, e)
+        return None
+
+@timed_db_operation
+async def is_jti_revoked_async(jti: str) -> Optional[bool]:
+    """Async variant of is_jti_revoked."""
+    if not jti:
+        logger.warning("⚠️ Attempted to check revocation for an empty JTI.")
+        return None
+
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None and revocation_filter.definitely_not_revoked(jti):
+        return False
+
+    try:
+        collection = get_revoked_tokens_collection_async()
+        document = await collection.find_one({"jti": jti}, {"_id": 1})
+
+        if document:
+            logger.info("🛡️ JTI '%s' IS REVOKED (found in revocation list).", jti)
             return True
         else:
-            logger.info(f"🛡️ JTI '{jti}' is NOT revoked (not found in revocation list).")
+            if revocation_filter is not None and revocation_filter.ready:
+                revocation_filter.record_false_positive()
+            logger.info("🛡️ JTI '%s' is NOT revoked (not found in revocation list).", jti)
             return False
     except Exception as e:
-        logger.error(f"❌ Error checking JTI '{jti}': {e}")
+        logger.error("❌ Error checking JTI '%s': %s", jti, e)
         return None
 
+def build_bulk_revocation_query(
+    agent_builder_id: str,
+    jtis: Optional[List[str]] = None,
+    aid_prefix: Optional[str] = None,
+    audience: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Dict:
+    """
+    Builds the issued_tokens query for a bulk revocation, always scoped to the
+    tokens of `agent_builder_id`. With `jtis` the listed tokens are matched
+    whatever their status; otherwise only active tokens matching every given
+    selector field are.
+    """
+    query: Dict = {"agent_builder_id": ObjectId(agent_builder_id)}
+    if jtis is not None:
+        query["jti"] = {"$in": list(dict.fromkeys(jtis))}
+        return query
+
+    query["status"] = "active"
+    # Tokens issued after the request are left alone, so the status update matches exactly what was revoked
+    query["issued_at"] = {"$lte": datetime.now(timezone.utc)}
+    if aid_prefix:
+        # Anchored, escaped prefix so the (agent_builder_id, aid) index bounds the scan
+        query["aid"] = {"$regex": f"^{re.escape(aid_prefix)}"}
+    if audience:
+        query["audience"] = audience
+    if user_id:
+        # Records written before user_id was stored only carry it in the AID: <issuer>/<model>/<user_id>/<instance>
+        query["$or"] = [
+            {"user_id": user_id},
+            {"user_id": {"$exists": False}, "aid": {"$regex": f"/{re.escape(user_id)}/[^/]+$"}},
+        ]
+    return query
+
+@timed_db_operation
+async def revoke_tokens_bulk_async(
+    agent_builder_id: str,
+    query: Dict,
+    chunk_size: int = BULK_REVOCATION_CHUNK_SIZE
+) -> BulkRevocationResult:
+    """
+    Revokes every issued token matching `query` (see build_bulk_revocation_query).
+    Matches are streamed from issued_tokens and upserted into revoked_atks with
+    one unordered bulk write per chunk; once all are revoked, one update_many on
+    the same query marks them revoked in issued_tokens.
+
+    On error, returns the JTIs revoked so far with complete=False. Those stay
+    revoked, so the request can simply be retried.
+    """
+    revoked_jtis: List[str] = []
+    try:
+        # Tokens still queued by the write-behind buffer must be visible to the query
+        await flush_pending_token_records_async()
+
+        issued_collection = get_issued_tokens_collection_async()
+        cursor = issued_collection.find(query, {"_id": 0, "jti": 1, "expires_at": 1}, batch_size=chunk_size)
+        chunk: List[dict] = []
+        async for token_info in cursor:
+            chunk.append(token_info)
+            if len(chunk) >= chunk_size:
+                await _revoke_chunk_async(chunk, agent_builder_id)
+                revoked_jtis.extend(doc["jti"] for doc in chunk)
+                chunk = []
+        if chunk:
+            await _revoke_chunk_async(chunk, agent_builder_id)
+            revoked_jtis.extend(doc["jti"] for doc in chunk)
+
+        if revoked_jtis:
+            await issued_collection.update_many(query, {"$set": {"status": "revoked"}})
+
+        logger.info("🛡️ Bulk revocation by user %s: %s tokens revoked.", agent_builder_id, len(revoked_jtis))
+        return BulkRevocationResult(revoked_jtis=revoked_jtis)
+    except Exception as e:
+        logger.error("❌ Error during bulk revocation by user %s after %s tokens: %s", agent_builder_id, len(revoked_jtis), e)
+        return BulkRevocationResult(revoked_jtis=revoked_jtis, complete=False)
+
+async def _revoke_chunk_async(token_infos: List[dict], agent_builder_id: str):
+    operations = []
+    for token_info in token_infos:
+        jti = token_info["jti"]
+        _record_local_revocation(jti)
+        doc_to_insert = _build_revocation_doc(jti, token_expiry_timestamp(token_info), agent_builder_id)
+        operations.append(UpdateOne({"jti": jti}, {"$set": doc_to_insert}, upsert=True))
+    try:
+        await get_revoked_tokens_collection_async().bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # A concurrent single revocation of the same JTI can race the upsert; that entry exists either way
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+@timed_db_operation
+async def get_revoked_jtis_async(jtis: List[str]) -> Optional[Set[str]]:
+    """
+    Returns the subset of `jtis` that is in the revocation list, using a single
+    $in query. JTIs the revocation filter rules out are not sent to the database.
+
+    Returns None if there was an error during the check.
+    """
+    candidates = list(dict.fromkeys(jti for jti in jtis if jti))
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None:
+        candidates = [jti for jti in candidates if not revocation_filter.definitely_not_revoked(jti)]
+    if not candidates:
+        return set()
+
+    try:
+        collection = get_revoked_tokens_collection_async()
+        cursor = collection.find({"jti": {"$in": candidates}}, {"_id": 0, "jti": 1})
+        revoked = {doc["jti"] for doc in await cursor.to_list(length=None)}
+        if revocation_filter is not None and revocation_filter.ready:
+            for _ in range(len(candidates) - len(revoked)):
+                revocation_filter.record_false_positive()
+        logger.info("🛡️ Batch revocation check: %s of %s looked-up JTIs are revoked.", len(revoked), len(candidates))
+        return revoked
+    except Exception as e:
+        logger.error("❌ Error checking revocation status for %s JTIs: %s", len(candidates), e)
+        return None
+
+def encode_revocation_cursor(revoked_at: datetime, doc_id: ObjectId) -> str:
+    """Encodes a feed position as an opaque cursor: (revoked_at in ms, _id)."""
+    if revoked_at.tzinfo is None:
+        revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+    millis = int(revoked_at.timestamp() * 1000)
+    return base64.urlsafe_b64encode(f"{millis}:{doc_id}".encode()).decode().rstrip("=")
+
+def decode_revocation_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of encode_revocation_cursor. Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        millis, doc_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        revoked_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+        return revoked_at, ObjectId(doc_id)
+    except Exception as e:
+        raise ValueError(f"Invalid revocation cursor: {cursor}") from e
+
+@timed_db_operation
+async def get_revocations_since_async(
+    cursor: Optional[Tuple[datetime, ObjectId]],
+    limit: int,
+    settle_seconds: float = 0
+) -> Optional[List[Dict]]:
+    """
+    Returns up to `limit` revocations strictly after `cursor` in (revoked_at, _id)
+    order, excluding those revoked in the last `settle_seconds`.
+    A None cursor starts from the beginning of the revocation list.
+
+    Returns None if there was an error during the lookup.
+    """
+    query: Dict = {"revoked_at": {"$lt": datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)}}
+    if cursor is not None:
+        after_at, after_id = cursor
+        query["$or"] = [
+            {"revoked_at": {"$gt": after_at}},
+            {"revoked_at": after_at, "_id": {"$gt": after_id}},
+        ]
+
+    try:
+        collection = get_revoked_tokens_collection_async()
+        documents = await collection.find(
+            query,
+            {"jti": 1, "revoked_at": 1, "original_exp_ts": 1}
+        ).sort([("revoked_at", 1), ("_id", 1)]).limit(limit).to_list(length=limit)
+        return documents
+    except Exception as e:
+        logger.error(f"❌ Error reading revocation feed: {e}")
+        return None
+
+# Fields shown for each revoked token (e.g. on /ui/revoke-token)
+_REVOKED_TOKEN_LIST_PROJECTION = {"_id": 0, "jti": 1, "revoked_at": 1, "original_exp_ts": 1, "revoked_by": 1}
+_ISSUED_TOKEN_DETAIL_FIELDS = ("aid", "audience", "purpose")
+
+def _revoked_tokens_query(agent_builder_id: Optional[str]) -> Dict:
+    query = {}
+    if agent_builder_id:
+        query["revoked_by"] = ObjectId(agent_builder_id)
+    return query
+
+def _attach_issued_token_details(tokens: List[Dict], issued_by_jti: Dict[str, dict]) -> List[Dict]:
+    for token in tokens:
+        token_info = issued_by_jti.get(token.get("jti"))
+        if token_info:
+            for field in _ISSUED_TOKEN_DETAIL_FIELDS:
+                token[field] = token_info.get(field)
+    return tokens
+
+@timed_db_operation
 def get_revoked_tokens(agent_builder_id: Optional[str] = None, limit: int = 20) -> List[Dict]:
     """
-    Get list of revoked tokens, optionally filtered by agent builder.
+    Get the most recent revoked tokens, newest first, optionally filtered by agent builder.
+    Details from issued_tokens are attached with one batched $in query.
+    There is no offset paging: skipping costs O(offset). Page through revocations with
+    the feed (get_revocations_since_async), which seeks on (revoked_at, _id).
     
     Args:
         agent_builder_id: If provided, only return tokens revoked by this agent builder
@@ -113,34 +446,42 @@ def get_revoked_tokens(agent_builder_id: Optional[str] = None, limit: int = 20)
     """
     try:
         collection = get_revoked_tokens_collection()
-        query = {}
-        
-        if agent_builder_id:
-            query["revoked_by"] = ObjectId(agent_builder_id)
-        
         tokens = list(
             collection.find(
-                query, 
-                {"_id": 0, "jti": 1, "revoked_at": 1, "original_exp_ts": 1, "revoked_by": 1}
+                _revoked_tokens_query(agent_builder_id),
+                _REVOKED_TOKEN_LIST_PROJECTION
             ).sort("revoked_at", -1).limit(limit)
         )
         
-        # For each token, try to get more info from issued_tokens collection
-        for token in tokens:
-            jti = token.get("jti")
-            if jti:
-                token_info = get_token_by_jti(jti)
-                if token_info:
-                    token["aid"] = token_info.get("aid")
-                    token["audience"] = token_info.get("audience")
-                    token["purpose"] = token_info.get("purpose")
-        
-        return tokens
+        issued_by_jti = get_tokens_by_jtis(
+            [token.get("jti") for token in tokens],
+            {field: 1 for field in _ISSUED_TOKEN_DETAIL_FIELDS}
+        )
+        return _attach_issued_token_details(tokens, issued_by_jti)
     except Exception as e:
         logger.error(f"❌ Error retrieving revoked tokens: {e}")
         return []
 
+@timed_db_operation
+async def get_revoked_tokens_async(agent_builder_id: Optional[str] = None, limit: int = 20) -> List[Dict]:
+    """Async variant of get_revoked_tokens."""
+    try:
+        collection = get_revoked_tokens_collection_async()
+        tokens = await collection.find(
+            _revoked_tokens_query(agent_builder_id),
+            _REVOKED_TOKEN_LIST_PROJECTION
+        ).sort("revoked_at", -1).limit(limit).to_list(length=limit)
 
+        issued_by_jti = await get_tokens_by_jtis_async(
+            [token.get("jti") for token in tokens],
+            {field: 1 for field in _ISSUED_TOKEN_DETAIL_FIELDS}
+        )
+        return _attach_issued_token_details(tokens, issued_by_jti)
+    except Exception as e:
+        logger.error(f"❌ Error retrieving revoked tokens: {e}")
+        return []
+
+@timed_db_operation
 def can_user_revoke_token(user_id: str, jti: str) -> Optional[bool]:
     """
     Check if a user can revoke a specific token (i.e., they issued it).
@@ -161,32 +502,31 @@ def can_user_revoke_token(user_id: str, jti: str) -> Optional[bool]:
     try:
         # Get token information from issued_tokens collection
         token_info = get_token_by_jti(jti)
-        
-        if not token_info:
-            logger.info(f"🔍 Token with JTI '{jti}' not found in issued tokens")
-            return False
-        
-        # Check if the token was issued by this user
-        token_issuer_id = token_info.get("agent_builder_id")
-        
-        if not token_issuer_id:
-            logger.warning(f"⚠️ Token '{jti}' has no agent_builder_id recorded")
-            return False
-        
-        # Convert to string for comparison (handle ObjectId)
-        if isinstance(token_issuer_id, ObjectId):
-            token_issuer_id = str(token_issuer_id)
-        
-        user_can_revoke = str(token_issuer_id) == str(user_id)
-        
-        logger.info(f"🔍 Ownership check for JTI '{jti}': "
-                   f"Issuer={token_issuer_id}, Requester={user_id}, "
-                   f"CanRevoke={user_can_revoke}")
-        
-        return user_can_revoke
-        
+        return _is_token_owned_by(token_info, user_id, jti)
+
     except Exception as e:
-        logger.error(f"❌ Error checking token ownership for JTI '{jti}': {e}")
+        logger.error("❌ Error checking token ownership for JTI '%s': %s", jti, e)
         return None
 
+async def can_user_revoke_token_async(user_id: str, jti: str) -> Optional[bool]:
+    """Async variant of can_user_revoke_token."""
+    can_revoke, _ = await check_token_revocable_async(user_id, jti)
+    return can_revoke
 
+@timed_db_operation
+async def check_token_revocable_async(user_id: str, jti: str) -> Tuple[Optional[bool], Optional[int]]:
+    """
+    Reads the issued_tokens record once and returns both whether the user may
+    revoke it (as can_user_revoke_token) and its original expiry (Unix timestamp),
+    so the caller can pass it straight to add_jti_to_revocation_list_async.
+    """
+    if not user_id or not jti:
+        logger.warning("⚠️ Missing user_id or jti in can_user_revoke_token")
+        return None, None
+
+    try:
+        token_info = await get_token_by_jti_async(jti)
+        return _is_token_owned_by(token_info, user_id, jti), token_expiry_timestamp(token_info)
+    except Exception as e:
+        logger.error("❌ Error checking token ownership for JTI '%s': %s", jti, e)
+        return None, None
@@ -1,10 +1,14 @@
 # app/db/token_store.py
+import asyncio
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 import logging
 
-from .mongo_client import get_db
+from .mongo_client import get_db, get_async_db
+from .token_write_behind import get_write_behind
+from app.utils.metrics import timed_db_operation
 
 logger = logging.getLogger(__name__)
 
@@ -16,77 +20,281 @@ def get_issued_tokens_collection():
     db = get_db()
     return db[ISSUED_TOKENS_COLLECTION]
 
+def get_issued_tokens_collection_async():
+    """Get the issued tokens collection from the async client."""
+    db = get_async_db()
+    return db[ISSUED_TOKENS_COLLECTION]
+
+def _prepare_token_record(user_id: str, token_record: dict) -> dict:
+    """Fills in agent_builder_id and issued_at if the caller did not set them."""
+    # Add agent_builder_id if not in record
+    if "agent_builder_id" not in token_record:
+        token_record["agent_builder_id"] = ObjectId(user_id)
+
+    # Add timestamp if not in record
+    if "issued_at" not in token_record:
+        token_record["issued_at"] = datetime.now(timezone.utc)
+    return token_record
+
+def _user_tokens_query(user_id: str, status: Optional[str]) -> dict:
+    query = {"agent_builder_id": ObjectId(user_id)}
+    if status:
+        query["status"] = status
+    return query
+
+def _stringify_token_ids(tokens: List[dict]) -> List[dict]:
+    # Convert ObjectId to string
+    for token in tokens:
+        if "_id" in token:
+            token["_id"] = str(token["_id"])
+        if "agent_builder_id" in token:
+            token["agent_builder_id"] = str(token["agent_builder_id"])
+    return tokens
+
+def _get_pending_record(jti: str) -> Optional[dict]:
+    """Returns a record that is still queued in the write-behind buffer, if any."""
+    write_behind = get_write_behind()
+    return write_behind.get_pending_record(jti) if write_behind else None
+
+def _update_pending_status(jti: str, status: str) -> bool:
+    write_behind = get_write_behind()
+    return write_behind.update_pending_status(jti, status) if write_behind else False
+
+def _merge_pending_records(tokens_by_jti: Dict[str, dict], jtis: List[str]) -> Dict[str, dict]:
+    # Records still queued by the write-behind buffer are not in the collection yet
+    for jti in jtis:
+        if jti not in tokens_by_jti:
+            pending_record = _get_pending_record(jti)
+            if pending_record is not None:
+                tokens_by_jti[jti] = pending_record
+    return tokens_by_jti
+
+@timed_db_operation
+def get_tokens_by_jtis(jtis: List[str], projection: Optional[Dict[str, Any]] = None) -> Dict[str, dict]:
+    """Fetches many tokens with a single $in query. Returns them keyed by JTI; unknown JTIs are absent."""
+    jtis = list(dict.fromkeys(jti for jti in jtis if jti))
+    if not jtis:
+        return {}
+    try:
+        collection = get_issued_tokens_collection()
+        if projection is not None:
+            projection = {**projection, "jti": 1}
+        tokens_by_jti = {doc["jti"]: doc for doc in collection.find({"jti": {"$in": jtis}}, projection)}
+        return _merge_pending_records(tokens_by_jti, jtis)
+    except Exception as e:
+        logger.error(f"Error retrieving tokens by JTI: {e}")
+        return {}
+
+@timed_db_operation
+async def get_tokens_by_jtis_async(jtis: List[str], projection: Optional[Dict[str, Any]] = None) -> Dict[str, dict]:
+    """Async variant of get_tokens_by_jtis."""
+    jtis = list(dict.fromkeys(jti for jti in jtis if jti))
+    if not jtis:
+        return {}
+    try:
+        collection = get_issued_tokens_collection_async()
+        if projection is not None:
+            projection = {**projection, "jti": 1}
+        documents = await collection.find({"jti": {"$in": jtis}}, projection).to_list(length=None)
+        return _merge_pending_records({doc["jti"]: doc for doc in documents}, jtis)
+    except Exception as e:
+        logger.error(f"Error retrieving tokens by JTI: {e}")
+        return {}
+
+async def flush_pending_token_records_async() -> int:
+    """Writes any records still queued in the write-behind buffer, so queries over issued_tokens see them."""
+    write_behind = get_write_behind()
+    if write_behind is None:
+        return 0
+    return await asyncio.to_thread(write_behind.flush)
+
+@timed_db_operation
 def update_token_status(jti: str, status: str) -> bool:
     """Update the status of a token (active, expired, revoked)."""
     try:
+        # Registered first: a write-behind flush landing in between then re-applies it after its insert
+        pending_updated = _update_pending_status(jti, status)
         collection = get_issued_tokens_collection()
-        
+
         result = collection.update_one(
             {"jti": jti},
             {"$set": {"status": status}}
         )
-        
-        return result.modified_count > 0
+
+        return result.modified_count > 0 or pending_updated
+    except Exception as e:
+        logger.error(f"Error updating token status: {e}")
+        return False
+
+@timed_db_operation
+async def update_token_status_async(jti: str, status: str) -> bool:
+    """Async variant of update_token_status."""
+    try:
+        # Registered first: a write-behind flush landing in between then re-applies it after its insert
+        pending_updated = _update_pending_status(jti, status)
+        collection = get_issued_tokens_collection_async()
+        result = await collection.update_one(
+            {"jti": jti},
+            {"$set": {"status": status}}
+        )
+        return result.modified_count > 0 or pending_updated
     except Exception as e:
         logger.error(f"Error updating token status: {e}")
         return False
 
+@timed_db_operation
 def get_token_by_jti(jti: str) -> Optional[dict]:
     """Get a token by its JTI."""
     try:
+        pending_record = _get_pending_record(jti)
+        if pending_record is not None:
+            return pending_record
         collection = get_issued_tokens_collection()
         return collection.find_one({"jti": jti})
     except Exception as e:
         logger.error(f"Error retrieving token by JTI: {e}")
         return None
 
+@timed_db_operation
+async def get_token_by_jti_async(jti: str) -> Optional[dict]:
+    """Async variant of get_token_by_jti."""
+    try:
+        pending_record = _get_pending_record(jti)
+        if pending_record is not None:
+            return pending_record
+        collection = get_issued_tokens_collection_async()
+        return await collection.find_one({"jti": jti})
+    except Exception as e:
+        logger.error(f"Error retrieving token by JTI: {e}")
+        return None
+
+@timed_db_operation
 def add_issued_token_record(user_id: str, token_record: dict) -> bool:
     """Add a record of an issued token to the user's history."""
     try:
-        # Add agent_builder_id if not in record
-        if "agent_builder_id" not in token_record:
-            token_record["agent_builder_id"] = ObjectId(user_id)
-        
-        # Add timestamp if not in record
-        if "issued_at" not in token_record:
-            token_record["issued_at"] = datetime.now(timezone.utc)
-        
-        # Store the token record
+        _prepare_token_record(user_id, token_record)
+
+        # Store the token record. The per-user history lives only in issued_tokens
+        # (indexed by agent_builder_id); it is no longer embedded in the user document.
         collection = get_issued_tokens_collection()
         result = collection.insert_one(token_record)
-        
-        # Also add to user's tokens_issued array
-        from .user_store import get_users_collection  # Import here to avoid circular import
-        users_collection = get_users_collection()
-        update_result = users_collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$push": {"tokens_issued": token_record}}
-        )
-        
+
+        return result.inserted_id is not None
+    except Exception as e:
+        logger.error(f"Error adding token record: {e}")
+        return False
+
+@timed_db_operation
+async def add_issued_token_record_async(user_id: str, token_record: dict) -> bool:
+    """Async variant of add_issued_token_record."""
+    try:
+        _prepare_token_record(user_id, token_record)
+
+        collection = get_issued_tokens_collection_async()
+        result = await collection.insert_one(token_record)
+
         return result.inserted_id is not None
     except Exception as e:
         logger.error(f"Error adding token record: {e}")
         return False
 
+@timed_db_operation
+def add_issued_token_records(user_id: str, token_records: List[dict]) -> int:
+    """
+    Bulk variant of add_issued_token_record: one insert_many into issued_tokens.
+
+    Returns the number of records inserted into issued_tokens.
+    """
+    if not token_records:
+        return 0
+    try:
+        for token_record in token_records:
+            _prepare_token_record(user_id, token_record)
+
+        collection = get_issued_tokens_collection()
+        try:
+            result = collection.insert_many(token_records, ordered=False)
+            inserted_count = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted_count = e.details.get("nInserted", 0)
+            logger.error(f"Bulk insert of token records partially failed ({inserted_count}/{len(token_records)} inserted): {e}")
+
+        return inserted_count
+    except Exception as e:
+        logger.error(f"Error adding token records in bulk: {e}")
+        return 0
+
+@timed_db_operation
+async def add_issued_token_records_async(user_id: str, token_records: List[dict]) -> int:
+    """Async variant of add_issued_token_records."""
+    if not token_records:
+        return 0
+    try:
+        for token_record in token_records:
+            _prepare_token_record(user_id, token_record)
+
+        collection = get_issued_tokens_collection_async()
+        try:
+            result = await collection.insert_many(token_records, ordered=False)
+            inserted_count = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted_count = e.details.get("nInserted", 0)
+            logger.error(f"Bulk insert of token records partially failed ({inserted_count}/{len(token_records)} inserted): {e}")
+
+        return inserted_count
+    except Exception as e:
+        logger.error(f"Error adding token records in bulk: {e}")
+        return 0
+
+async def persist_issued_token_record_async(user_id: str, token_record: dict) -> bool:
+    """
+    Records an issued token, through the write-behind queue when it is enabled.
+    Falls back to a direct write when write-behind is disabled or its queue is full.
+    """
+    write_behind = get_write_behind()
+    if write_behind is not None:
+        _prepare_token_record(user_id, token_record)
+        if write_behind.enqueue(user_id, token_record):
+            return True
+        logger.warning("⚠️ Write-behind queue full; recording issued token directly.")
+    return await add_issued_token_record_async(user_id, token_record)
+
+async def persist_issued_token_records_async(user_id: str, token_records: List[dict]) -> int:
+    """Bulk variant of persist_issued_token_record_async. Returns the number of records accepted."""
+    write_behind = get_write_behind()
+    queued = 0
+    if write_behind is not None:
+        for token_record in token_records:
+            _prepare_token_record(user_id, token_record)
+        queued = write_behind.enqueue_many(user_id, token_records)
+        if queued < len(token_records):
+            logger.warning(f"⚠️ Write-behind queue full; recording {len(token_records) - queued} issued tokens directly.")
+    return queued + await add_issued_token_records_async(user_id, token_records[queued:])
+
+@timed_db_operation
 def get_user_issued_tokens(user_id: str, status: Optional[str] = None, limit: int = 20) -> List[dict]:
     """Get tokens issued by a specific user with optional status filter."""
     try:
         collection = get_issued_tokens_collection()
-        
-        query = {"agent_builder_id": ObjectId(user_id)}
-        if status:
-            query["status"] = status
-        
+
+        query = _user_tokens_query(user_id, status)
         tokens = list(collection.find(query).sort("issued_at", -1).limit(limit))
-        
-        # Convert ObjectId to string
-        for token in tokens:
-            if "_id" in token:
-                token["_id"] = str(token["_id"])
-            if "agent_builder_id" in token:
-                token["agent_builder_id"] = str(token["agent_builder_id"])
-        
-        return tokens
+
+        return _stringify_token_ids(tokens)
+    except Exception as e:
+        logger.error(f"Error retrieving user issued tokens: {e}")
+        return []
+
+@timed_db_operation
+async def get_user_issued_tokens_async(user_id: str, status: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """Async variant of get_user_issued_tokens."""
+    try:
+        collection = get_issued_tokens_collection_async()
+
+        query = _user_tokens_query(user_id, status)
+        tokens = await collection.find(query).sort("issued_at", -1).limit(limit).to_list(length=limit)
+
+        return _stringify_token_ids(tokens)
     except Exception as e:
         logger.error(f"Error retrieving user issued tokens: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,252 @@
+# app/db/token_write_behind.py
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple
+import logging
+
+from pymongo.errors import BulkWriteError
+
+from config.settings import (
+    ISSUED_TOKEN_WRITE_BEHIND_ENABLED,
+    ISSUED_TOKEN_WRITE_BEHIND_MAX_QUEUE,
+    ISSUED_TOKEN_WRITE_BEHIND_BATCH_SIZE,
+    ISSUED_TOKEN_WRITE_BEHIND_FLUSH_INTERVAL_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+class IssuedTokenWriteBehind:
+    """
+    Bounded in-memory queue that group-commits issued-token records.
+
+    Records are flushed by a background thread with one insert_many into
+    issued_tokens when `batch_size` records are waiting or
+    `flush_interval_seconds` has passed. `enqueue` never blocks: when the queue
+    is full it returns False and the caller writes the record directly, which
+    pushes back on issuers instead of growing memory.
+
+    Queued records are visible through `get_pending_record` so ownership checks
+    and revocation work for tokens that have not been flushed yet. A batch that
+    still fails after `max_write_attempts` goes back to the head of the queue
+    (and stays pending) to be retried on the next flush; records are only lost
+    if the process stops while MongoDB is unreachable.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_seconds: float, max_write_attempts: int = 3):
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = max(0.001, flush_interval_seconds)
+        self.max_write_attempts = max(1, max_write_attempts)
+
+        self._queue: deque = deque()
+        self._pending_by_jti: Dict[str, Dict[str, Any]] = {}
+        self._status_overrides: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # Serializes the writer thread and explicit flush() calls
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._enqueued = 0
+        self._rejected = 0
+        self._flushed = 0
+        self._dropped = 0
+        self._requeued = 0
+        self._batches = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="issued-token-write-behind", daemon=True)
+        self._thread.start()
+        logger.info(f"🗂️ Issued-token write-behind started (batch={self.batch_size}, "
+                    f"interval={self.flush_interval_seconds * 1000:.0f}ms, max_queue={self.max_queue}).")
+
+    def enqueue(self, user_id: str, token_record: dict) -> bool:
+        """Queues a prepared record. Returns False (without queuing) when the queue is full."""
+        with self._cond:
+            if self._stopping or len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                return False
+            self._queue.append((user_id, token_record))
+            jti = token_record.get("jti")
+            if jti:
+                self._pending_by_jti[jti] = token_record
+            self._enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def enqueue_many(self, user_id: str, token_records: List[dict]) -> int:
+        """Queues as many records as fit. Returns how many were queued (a prefix of token_records)."""
+        queued = 0
+        for token_record in token_records:
+            if not self.enqueue(user_id, token_record):
+                break
+            queued += 1
+        return queued
+
+    def get_pending_record(self, jti: str) -> Optional[dict]:
+        with self._cond:
+            return self._pending_by_jti.get(jti)
+
+    def update_pending_status(self, jti: str, status: str) -> bool:
+        """Applies a status change to a record that is still queued or being written."""
+        with self._cond:
+            token_record = self._pending_by_jti.get(jti)
+            if token_record is None:
+                return False
+            token_record["status"] = status
+            # Re-applied after the write in case the record was already handed to insert_many
+            self._status_overrides[jti] = status
+            return True
+
+    def flush(self) -> int:
+        """
+        Writes everything currently queued. Returns the number of records written.
+        Stops at the first batch that cannot be written; it stays queued.
+        """
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            batch_written = self._write_batch(batch)
+            if batch_written is None:
+                return written
+            written += batch_written
+
+    def stop(self, flush: bool = True):
+        """Stops the writer thread, optionally draining the queue first."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=max(5.0, self.flush_interval_seconds * 10))
+            self._thread = None
+        if flush:
+            written = self.flush()
+            if written:
+                logger.info(f"🗂️ Flushed {written} queued issued-token records on shutdown.")
+            with self._cond:
+                lost = len(self._queue)
+                self._dropped += lost
+            if lost:
+                logger.error(f"❌ {lost} issued-token records could not be written before shutdown and are lost.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "enqueued": self._enqueued,
+                "rejected": self._rejected,
+                "flushed": self._flushed,
+                "dropped": self._dropped,
+                "requeued": self._requeued,
+                "batches": self._batches,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._cond.wait(timeout=self.flush_interval_seconds)
+                if self._stopping:
+                    return
+            batch = self._take_batch()
+            if batch and self._write_batch(batch) is None:
+                # MongoDB is failing; wait an interval before retrying the re-queued batch
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(timeout=self.flush_interval_seconds)
+
+    def _take_batch(self) -> List[Tuple[str, dict]]:
+        with self._cond:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _write_batch(self, batch: List[Tuple[str, dict]]) -> Optional[int]:
+        """Inserts a batch; returns the number written, or None if it was re-queued after the last attempt."""
+        from .token_store import get_issued_tokens_collection  # Import here to avoid circular import
+
+        records = [token_record for _, token_record in batch]
+
+        with self._flush_lock:
+            written = 0
+            for attempt in range(1, self.max_write_attempts + 1):
+                try:
+                    try:
+                        result = get_issued_tokens_collection().insert_many(records, ordered=False)
+                        written = len(result.inserted_ids)
+                    except BulkWriteError as e:
+                        # Duplicate keys from a previous partial attempt are expected on retry
+                        written = e.details.get("nInserted", 0)
+                        non_duplicate_errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+                        if non_duplicate_errors:
+                            raise
+                    break
+                except Exception as e:
+                    logger.error(f"❌ Write-behind flush of {len(records)} token records failed (attempt {attempt}/{self.max_write_attempts}): {e}")
+                    if attempt == self.max_write_attempts:
+                        # Keep the records pending (revocable, ownership-checkable) and retry them later
+                        with self._cond:
+                            self._queue.extendleft(reversed(batch))
+                            self._requeued += len(records)
+                        logger.error(f"❌ Re-queued {len(records)} token records; they will be retried on the next flush.")
+                        return None
+                    time.sleep(min(1.0, 0.1 * attempt))
+
+            self._apply_status_overrides(records)
+
+            with self._cond:
+                for token_record in records:
+                    jti = token_record.get("jti")
+                    self._pending_by_jti.pop(jti, None)
+                    # A status set after the overrides were applied found the record in the collection already
+                    self._status_overrides.pop(jti, None)
+                self._flushed += written
+                self._batches += 1
+        return written
+
+    def _apply_status_overrides(self, records: List[dict]):
+        with self._cond:
+            overrides = {
+                token_record["jti"]: self._status_overrides.pop(token_record["jti"])
+                for token_record in records
+                if token_record.get("jti") in self._status_overrides
+            }
+        if not overrides:
+            return
+        from .token_store import get_issued_tokens_collection  # Import here to avoid circular import
+        collection = get_issued_tokens_collection()
+        for jti, status in overrides.items():
+            try:
+                collection.update_one({"jti": jti}, {"$set": {"status": status}})
+            except Exception as e:
+                logger.error(f"❌ Could not apply status '{status}' to flushed token '{jti}': {e}")
+
+_write_behind: Optional[IssuedTokenWriteBehind] = None
+
+def get_write_behind() -> Optional[IssuedTokenWriteBehind]:
+    """Returns the running write-behind queue, or None when write-behind mode is disabled."""
+    global _write_behind
+    if not ISSUED_TOKEN_WRITE_BEHIND_ENABLED:
+        return None
+    if _write_behind is None:
+        _write_behind = IssuedTokenWriteBehind(
+            max_queue=ISSUED_TOKEN_WRITE_BEHIND_MAX_QUEUE,
+            batch_size=ISSUED_TOKEN_WRITE_BEHIND_BATCH_SIZE,
+            flush_interval_seconds=ISSUED_TOKEN_WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000.0,
+        )
+        _write_behind.start()
+    return _write_behind
+
+def stop_write_behind():
+    """Drains and stops the write-behind queue if it was started."""
+    global _write_behind
+    if _write_behind is not None:
+        logger.info("🗂️ Stopping issued-token write-behind and flushing queued records...")
+        _write_behind.stop(flush=True)
+        _write_behind = None
@@ -4,15 +4,22 @@ from typing import Optional, List, Dict, Any
 from bson import ObjectId
 import logging
 
-from .mongo_client import get_db
+from .mongo_client import get_db, get_async_db
 from app.auth.token_utils import generate_api_token
+from app.auth.api_token_cache import invalidate_api_token_cache
+from app.utils.metrics import timed_db_operation
+from app.models.user_models import User
 # Import from token_store
 from .token_store import (
     get_issued_tokens_collection,  # For backwards compatibility
     get_token_by_jti,
     update_token_status,
     add_issued_token_record,
-    get_user_issued_tokens
+    add_issued_token_records,
+    get_user_issued_tokens,
+    add_issued_token_record_async,
+    add_issued_token_records_async,
+    get_user_issued_tokens_async
 )
 
 record_issued_token = add_issued_token_record # Alias for backward compatibility
@@ -22,11 +29,23 @@ logger = logging.getLogger(__name__)
 # Collection names
 USERS_COLLECTION = "users"
 
+# Fields needed to build a User model. Used by the auth paths so they never load
+# large legacy arrays (e.g. tokens_issued) that are kept on older user documents.
+USER_MODEL_PROJECTION: Dict[str, int] = {
+    (field.alias or name): 1 for name, field in User.model_fields.items()
+}
+
 def get_users_collection():
     """Get the users collection."""
     db = get_db()
     return db[USERS_COLLECTION]
 
+def get_users_collection_async():
+    """Get the users collection from the async client."""
+    db = get_async_db()
+    return db[USERS_COLLECTION]
+
+@timed_db_operation
 def get_user_by_github_id(github_id: str) -> Optional[dict]:
     """Get a user by GitHub ID."""
     try:
@@ -36,15 +55,27 @@ def get_user_by_github_id(github_id: str) -> Optional[dict]:
         logger.error(f"Error retrieving user by GitHub ID: {e}")
         return None
 
-def get_user_by_id(user_id: str) -> Optional[dict]:
-    """Get a user by internal ID."""
+@timed_db_operation
+def get_user_by_id(user_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[dict]:
+    """Get a user by internal ID, optionally limited to the projected fields."""
     try:
         collection = get_users_collection()
-        return collection.find_one({"_id": ObjectId(user_id)})
+        return collection.find_one({"_id": ObjectId(user_id)}, projection)
+    except Exception as e:
+        logger.error(f"Error retrieving user by ID: {e}")
+        return None
+
+@timed_db_operation
+async def get_user_by_id_async(user_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[dict]:
+    """Async variant of get_user_by_id."""
+    try:
+        collection = get_users_collection_async()
+        return await collection.find_one({"_id": ObjectId(user_id)}, projection)
     except Exception as e:
         logger.error(f"Error retrieving user by ID: {e}")
         return None
 
+@timed_db_operation
 def complete_user_registration(user_id: str, registration_data: dict) -> Optional[dict]:
     """Complete user registration with organization details."""
     try:
@@ -61,14 +92,15 @@ def complete_user_registration(user_id: str, registration_data: dict) -> Optiona
             "api_token": api_token,
             "api_token_generated_at": datetime.now(timezone.utc),
             "api_token_expires_at": expires_at,
-            "role": "agent_builder",  # Default role for now
-            "tokens_issued": []  # Initialize empty array for token history
+            "role": "agent_builder"  # Default role for now; token history lives in issued_tokens
         }
         
         result = collection.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        # The previous API token is no longer valid; drop any cached principal for it
+        invalidate_api_token_cache(user_id)
         
         if result.modified_count:
             return collection.find_one({"_id": ObjectId(user_id)})
@@ -77,6 +109,7 @@ def complete_user_registration(user_id: str, registration_data: dict) -> Optiona
         logger.error(f"Error completing user registration: {e}")
         return None
 
+@timed_db_operation
 def regenerate_api_token(user_id: str) -> Optional[dict]:
     """Generate a new API token for a user."""
     try:
@@ -96,6 +129,8 @@ def regenerate_api_token(user_id: str) -> Optional[dict]:
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        # The previous API token is no longer valid; drop any cached principal for it
+        invalidate_api_token_cache(user_id)
         
         if result.modified_count:
             return collection.find_one({"_id": ObjectId(user_id)})
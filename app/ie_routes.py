@@ -1,16 +1,21 @@
 from fastapi import APIRouter, HTTPException, Body, Depends
 from typing import Dict, Any
-from datetime import datetime, timezone
-import jwt
+import asyncio
 import logging
 from bson import ObjectId
 
-from app.core.token_issuer import create_atk
-from app.models.atk_models import ATKIssuanceRequest, ATKIssuanceResponse
+from app.core.signing_executor import get_signing_executor
+from app.models.atk_models import (
+    ATKIssuanceRequest,
+    ATKIssuanceResponse,
+    ATKBatchIssuanceRequest,
+    ATKBatchIssuanceItem,
+    ATKBatchIssuanceResponse,
+)
 from app.models.common_models import MessageResponse
 from app.auth.middleware import require_api_auth
 from app.models.user_models import User  # Import the User model
-from app.db.user_store import record_issued_token
+from app.db.token_store import persist_issued_token_record_async, persist_issued_token_records_async
 
 router = APIRouter(
     prefix="/ie",
@@ -54,8 +59,8 @@ async def issue_new_atk(
     logger.info(f"🔐 ATK issuance request from Agent Builder: {org_name}")
     logger.info(f"   User: {request_body.user_id}, Audience: {request_body.audience_sp_id}")
 
-    # Issue the token
-    signed_atk_str = create_atk(
+    # Issue the token (signing runs on the signing executor, off the event loop)
+    issuance = await get_signing_executor().create_atk(
         user_id=request_body.user_id,
         audience_sp_id=request_body.audience_sp_id,
         permissions=request_body.permissions,
@@ -64,7 +69,7 @@ async def issue_new_atk(
         override_trust_tags=request_body.override_trust_tags
     )
 
-    if not signed_atk_str:
+    if not issuance:
         logger.error(f"❌ Failed to issue ATK for user: {request_body.user_id}")
         raise HTTPException(
             status_code=500,
@@ -73,26 +78,11 @@ async def issue_new_atk(
 
     # Record the issued token for tracking and history
     try:
-        # Decode the JWT to get the AID, JTI, and expiry
-        decoded_token = jwt.decode(
-            signed_atk_str, 
-            options={"verify_signature": False}  # Not validating, just extracting claims
-        )
-        
-        token_record = {
-            "agent_builder_id": ObjectId(str(current_user.id)),  # Fixed: Use .id instead of ["_id"]
-            "aid": decoded_token.get("sub"),
-            "jti": decoded_token.get("jti"),
-            "issued_at": datetime.now(timezone.utc),
-            "expires_at": datetime.fromtimestamp(decoded_token.get("exp"), tz=timezone.utc),
-            "audience": request_body.audience_sp_id,
-            "purpose": request_body.purpose,
-            "status": "active",
-            "permissions": request_body.permissions,
-            "model_id": request_body.model_id
-        }
+        # The issuance result carries the signed claims; no need to decode our own token
+        token_record = issuance.to_token_record()
+        token_record["agent_builder_id"] = ObjectId(str(current_user.id))
         
-        record_id = record_issued_token(str(current_user.id), token_record)  # Fixed: Pass user_id as string
+        record_id = await persist_issued_token_record_async(str(current_user.id), token_record)  # Fixed: Pass user_id as string
         if not record_id:
             logger.warning("⚠️ Failed to record token metadata, but token was issued successfully")
         
@@ -101,4 +91,78 @@ async def issue_new_atk(
         # Don't fail the request for this, just log the warning
 
     logger.info(f"✅ ATK issued successfully by Agent Builder: {org_name}")
-    return ATKIssuanceResponse(atk=signed_atk_str)
\ No newline at end of file
+    return ATKIssuanceResponse(atk=issuance.atk)
+
+@router.post(
+    "/issue-atk/batch",
+    response_model=ATKBatchIssuanceResponse,
+    summary="Issue a batch of Agent Tokens (ATKs)",
+    description="Issues up to the configured maximum number of ATKs under a single authentication "
+                "check and persists their records in bulk. Results are returned per item, "
+                "in request order, with per-item errors.",
+    responses={
+        200: {"description": "Batch processed; inspect each item for its outcome"},
+        400: {"model": MessageResponse, "description": "Invalid request parameters"},
+        401: {"model": MessageResponse, "description": "Authentication required"},
+    }
+)
+async def issue_atk_batch(
+    request_body: ATKBatchIssuanceRequest = Body(...),
+    current_user: User = Depends(require_api_auth)
+):
+    """
+    Issues one ATK per entry in **requests**. Each entry has the same shape as
+    the body of `POST /ie/issue-atk`.
+
+    A failure on one item does not affect the others. All successfully issued
+    tokens are recorded with a single bulk write.
+    """
+    org_name = getattr(current_user, 'organization_name', 'Unknown Organization')
+    user_id = str(current_user.id)
+    logger.info(f"🔐 Batch ATK issuance request ({len(request_body.requests)} items) from Agent Builder: {org_name}")
+
+    signing_executor = get_signing_executor()
+    issuances = await asyncio.gather(
+        *(
+            signing_executor.create_atk(
+                user_id=item.user_id,
+                audience_sp_id=item.audience_sp_id,
+                permissions=item.permissions,
+                purpose=item.purpose,
+                model_id=item.model_id,
+                override_trust_tags=item.override_trust_tags
+            )
+            for item in request_body.requests
+        ),
+        return_exceptions=True
+    )
+
+    results = []
+    token_records = []
+    agent_builder_oid = ObjectId(user_id)
+    for index, issuance in enumerate(issuances):
+        if isinstance(issuance, BaseException):
+            logger.error(f"❌ Unexpected error issuing batch item {index}: {issuance}")
+            issuance = None
+
+        if not issuance:
+            results.append(ATKBatchIssuanceItem(index=index, error="Failed to create and sign the Agent Token."))
+            continue
+
+        token_record = issuance.to_token_record()
+        token_record["agent_builder_id"] = agent_builder_oid
+        token_records.append(token_record)
+        results.append(ATKBatchIssuanceItem(index=index, atk=issuance.atk, jti=issuance.jti))
+
+    if token_records:
+        recorded_count = await persist_issued_token_records_async(user_id, token_records)
+        if recorded_count != len(token_records):
+            logger.warning(f"⚠️ Recorded {recorded_count}/{len(token_records)} token records, but all tokens were issued successfully")
+
+    issued_count = len(token_records)
+    logger.info(f"✅ Batch issued {issued_count}/{len(results)} ATKs for Agent Builder: {org_name}")
+    return ATKBatchIssuanceResponse(
+        results=results,
+        issued_count=issued_count,
+        failed_count=len(results) - issued_count
+    )
@@ -0,0 +1,91 @@
+# app/metrics_routes.py
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from typing import Any, Dict, List, Optional
+
+from app.utils.metrics import get_metrics_registry, MetricFamily
+from app.utils.logging_config import get_logging_stats
+from app.auth.api_token_cache import get_api_token_cache
+from app.auth.verified_token_cache import get_verified_token_cache
+from app.db.revocation_filter import get_revocation_filter
+from app.db.token_write_behind import get_write_behind
+from app.core.signing_executor import get_signing_executor_stats
+from config.settings import METRICS_BEARER_TOKEN
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(tags=["Metrics"])
+_scrape_auth = HTTPBearer(auto_error=False)
+
+def _families_from_stats(prefix: str, stats: Optional[Dict[str, Any]], counters: List[str], gauges: List[str],
+                         labels: Optional[Dict[str, str]] = None) -> List[MetricFamily]:
+    if stats is None:
+        return []
+    labels = labels or {}
+    families = [(f"{prefix}_{key}_total", "counter", f"{prefix} {key}.", [(labels, stats[key])]) for key in counters]
+    families += [(f"{prefix}_{key}", "gauge", f"{prefix} {key}.", [(labels, stats[key])]) for key in gauges]
+    return families
+
+def _collect_caches() -> List[MetricFamily]:
+    """Per-cache counters and hit ratio, labelled by cache, so hit rates can be compared in one query."""
+    caches = {"api_token": get_api_token_cache(), "verified_token": get_verified_token_cache()}
+    stats_by_cache = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    families: List[MetricFamily] = []
+    for key, type_name in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                           ("expirations", "counter"), ("invalidations", "counter"),
+                           ("size", "gauge"), ("hit_ratio", "gauge")):
+        name = f"aif_cache_{key}_total" if type_name == "counter" else f"aif_cache_{key}"
+        samples = [({"cache": cache}, stats[key]) for cache, stats in stats_by_cache.items()]
+        families.append((name, type_name, f"In-process cache {key.replace('_', ' ')}.", samples))
+    return families
+
+def _collect_components() -> List[MetricFamily]:
+    revocation_filter = get_revocation_filter()
+    write_behind = get_write_behind()
+    return (
+        _families_from_stats(
+            "aif_revocation_filter", revocation_filter.stats() if revocation_filter else None,
+            counters=["lookups", "definite_negatives", "false_positives", "rebuilds", "refreshes", "stale_lookups"],
+            gauges=["jtis", "capacity", "size_bytes"])
+        + _families_from_stats(
+            "aif_signing_executor", get_signing_executor_stats(),
+            counters=["completed", "failed"],
+            gauges=["pending", "queue_depth", "max_workers"])
+        + _families_from_stats(
+            "aif_write_behind", write_behind.stats() if write_behind else None,
+            counters=["enqueued", "rejected", "flushed", "dropped", "requeued", "batches"],
+            gauges=["queued", "max_queue"])
+        + _families_from_stats(
+            "aif_log_records", get_logging_stats(),
+            counters=["dropped", "sampled_out"],
+            gauges=[])
+    )
+
+def register_default_collectors():
+    """Exposes the caches, revocation filter, signing executor, write-behind queue and logging pipeline."""
+    registry = get_metrics_registry()
+    registry.register_collector(_collect_caches)
+    registry.register_collector(_collect_components)
+
+async def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_scrape_auth)):
+    """Checks the scraper's bearer token when AIF_METRICS_BEARER_TOKEN is set."""
+    if METRICS_BEARER_TOKEN is None:
+        return
+    presented = credentials.credentials if credentials else ""
+    if not hmac.compare_digest(presented.encode(), METRICS_BEARER_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing metrics token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.get(
+    "/metrics",
+    include_in_schema=False,
+    response_class=Response,
+    dependencies=[Depends(require_metrics_token)],
+)
+async def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(content=get_metrics_registry().render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -2,8 +2,27 @@
 from .atk_models import (
     ATKIssuanceRequest,
     ATKIssuanceResponse,
+    ATKBatchIssuanceRequest,
+    ATKBatchIssuanceItem,
+    ATKBatchIssuanceResponse,
     ATKRevocationRequest,
+    ATKRevocationSelector,
+    ATKBulkRevocationRequest,
+    ATKBulkRevocationResponse,
     RevocationStatusResponse,
+    RevocationStatusBatchRequest,
+    RevocationStatusBatchResponse,
+    RevocationFeedEntry,
+    RevocationFeedResponse,
+    ATKVerificationRequest,
+    ATKBatchVerificationRequest,
+    ATKVerificationResponse,
+    ATKBatchVerificationResponse,
+    IntrospectionResponse,
+    IntrospectionBatchRequest,
+    IntrospectionBatchResponse,
+    KeyringReloadResponse,
+    RevocationFilterRebuildResponse,
     JWK,
     JWKS
 )
@@ -13,8 +32,27 @@ from .common_models import MessageResponse # If you have generic response messag
 __all__ = [
     "ATKIssuanceRequest",
     "ATKIssuanceResponse",
+    "ATKBatchIssuanceRequest",
+    "ATKBatchIssuanceItem",
+    "ATKBatchIssuanceResponse",
     "ATKRevocationRequest",
+    "ATKRevocationSelector",
+    "ATKBulkRevocationRequest",
+    "ATKBulkRevocationResponse",
     "RevocationStatusResponse",
+    "RevocationStatusBatchRequest",
+    "RevocationStatusBatchResponse",
+    "RevocationFeedEntry",
+    "RevocationFeedResponse",
+    "ATKVerificationRequest",
+    "ATKBatchVerificationRequest",
+    "ATKVerificationResponse",
+    "ATKBatchVerificationResponse",
+    "IntrospectionResponse",
+    "IntrospectionBatchRequest",
+    "IntrospectionBatchResponse",
+    "KeyringReloadResponse",
+    "RevocationFilterRebuildResponse",
     "JWK",
     "JWKS",
     "MessageResponse"
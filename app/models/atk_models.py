@@ -1,7 +1,21 @@
 # app/models/atk_models.py
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone # Ensure datetime class is imported
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, validator, model_validator
+
+from config.settings import MAX_ATK_BATCH_SIZE, MAX_REVOCATION_STATUS_BATCH_SIZE, MAX_BULK_REVOCATION_JTIS, MAX_ATK_VERIFY_BATCH_SIZE
+
+def validate_jti(v: str) -> str:
+    """Basic JTI format validation, shared by single and batch revocation models."""
+    if not v.strip():
+        raise ValueError('JTI cannot be empty')
+
+    # Basic format validation - adjust regex based on your JTI format
+    import re
+    if not re.match(r'^[a-zA-Z0-9\-_]+$', v.strip()):
+        raise ValueError('JTI contains invalid characters')
+
+    return v.strip()
 
 class ATKIssuanceRequest(BaseModel):
     user_id: str = Field(..., min_length=1, description="User identifier for delegation.", example="user-poc-001")
@@ -30,21 +44,62 @@ class ATKIssuanceRequest(BaseModel):
 class ATKIssuanceResponse(BaseModel):
     atk: str = Field(..., description="The signed Agent Token (ATK) as a JWT string.")
 
+class ATKBatchIssuanceRequest(BaseModel):
+    requests: List[ATKIssuanceRequest] = Field(..., min_length=1, max_length=MAX_ATK_BATCH_SIZE, description="Issuance requests to process under a single authentication check.")
+
+class ATKBatchIssuanceItem(BaseModel):
+    index: int = Field(..., description="Position of the corresponding request in the batch.")
+    atk: Optional[str] = Field(None, description="The signed ATK, if issuance succeeded.")
+    jti: Optional[str] = Field(None, description="The JTI of the issued ATK, if issuance succeeded.")
+    error: Optional[str] = Field(None, description="Why this item could not be issued.")
+
+class ATKBatchIssuanceResponse(BaseModel):
+    results: List[ATKBatchIssuanceItem]
+    issued_count: int
+    failed_count: int
+
 class ATKRevocationRequest(BaseModel):
     jti: str = Field(..., min_length=1, max_length=100, description="The JWT ID (jti claim) of the ATK to be revoked.")
     
     @validator('jti')
     def validate_jti_format(cls, v):
         """Basic JTI format validation."""
-        if not v.strip():
-            raise ValueError('JTI cannot be empty')
-        
-        # Basic format validation - adjust regex based on your JTI format
-        import re
-        if not re.match(r'^[a-zA-Z0-9\-_]+$', v.strip()):
-            raise ValueError('JTI contains invalid characters')
-        
-        return v.strip()
+        return validate_jti(v)
+
+class ATKRevocationSelector(BaseModel):
+    """Selects active tokens of the authenticated builder; all given criteria must match."""
+    aid_prefix: Optional[str] = Field(None, min_length=1, description="Revoke tokens whose AID starts with this prefix.", example="aif://poc-heimdall.example.com/gpt-4o/user-poc-001/")
+    audience: Optional[str] = Field(None, min_length=1, description="Revoke tokens issued for this Service Provider audience.")
+    user_id: Optional[str] = Field(None, min_length=1, description="Revoke tokens delegated by this end user.")
+    all: bool = Field(False, description="Revoke every active token of the builder. Required when no other criterion is given.")
+
+    @model_validator(mode="after")
+    def require_explicit_scope(self):
+        if not (self.aid_prefix or self.audience or self.user_id or self.all):
+            raise ValueError("Selector needs at least one of aid_prefix, audience, user_id, or all=true.")
+        return self
+
+class ATKBulkRevocationRequest(BaseModel):
+    jtis: Optional[List[str]] = Field(None, min_length=1, max_length=MAX_BULK_REVOCATION_JTIS, description="JWT IDs of the ATKs to revoke.")
+    selector: Optional[ATKRevocationSelector] = Field(None, description="Revoke all active tokens matching this selector instead of a JTI list.")
+
+    @validator('jtis', each_item=True)
+    def validate_jti_format(cls, v):
+        # Same limits as ATKRevocationRequest.jti
+        if len(v) > 100:
+            raise ValueError('JTI must be at most 100 characters')
+        return validate_jti(v)
+
+    @model_validator(mode="after")
+    def require_one_target(self):
+        if (self.jtis is None) == (self.selector is None):
+            raise ValueError("Provide exactly one of 'jtis' or 'selector'.")
+        return self
+
+class ATKBulkRevocationResponse(BaseModel):
+    revoked_count: int = Field(..., description="Number of tokens added to the revocation list.")
+    skipped_jtis: List[str] = Field(default_factory=list, description="Requested JTIs that were not found among the builder's tokens.")
+    complete: bool = Field(True, description="False when an error stopped the revocation part-way; the tokens counted in revoked_count stay revoked and the request can be retried.")
 
 class RevocationStatusResponse(BaseModel):
     jti: str
@@ -53,6 +108,81 @@ class RevocationStatusResponse(BaseModel):
 
     model_config = {"arbitrary_types_allowed": True} # Kept for safety with datetime
 
+class RevocationStatusBatchRequest(BaseModel):
+    jtis: List[str] = Field(..., min_length=1, max_length=MAX_REVOCATION_STATUS_BATCH_SIZE, description="JWT IDs (jti claims) to check for revocation.")
+
+    @validator('jtis', each_item=True)
+    def validate_jti_format(cls, v):
+        if len(v) > 100:
+            raise ValueError('JTI must be at most 100 characters')
+        return validate_jti(v)
+
+class RevocationStatusBatchResponse(BaseModel):
+    statuses: Dict[str, bool] = Field(..., description="Revocation status keyed by JTI.")
+    checked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class RevocationFeedEntry(BaseModel):
+    jti: str
+    revoked_at: datetime
+    exp: Optional[int] = Field(None, description="Original expiry (Unix timestamp) of the revoked ATK, if known. The entry can be dropped after it.")
+
+class RevocationFeedResponse(BaseModel):
+    revocations: List[RevocationFeedEntry]
+    next_cursor: Optional[str] = Field(None, description="Pass as `since` to fetch revocations added after this page.")
+    has_more: bool = Field(..., description="True if more revocations are available right away.")
+
+class ATKVerificationRequest(BaseModel):
+    token: str = Field(..., min_length=1, description="The ATK (compact JWS) to verify.")
+    audience: Optional[str] = Field(None, description="If set, the token's aud must match it.", example="https://sp.example.com/api")
+    check_revocation: bool = Field(True, description="Also reject tokens whose JTI has been revoked.")
+
+class ATKBatchVerificationRequest(BaseModel):
+    tokens: List[str] = Field(..., min_length=1, max_length=MAX_ATK_VERIFY_BATCH_SIZE, description="ATKs to verify.")
+    audience: Optional[str] = Field(None, description="If set, every token's aud must match it.")
+    check_revocation: bool = Field(True, description="Also reject tokens whose JTI has been revoked.")
+
+class ATKVerificationResponse(BaseModel):
+    valid: bool
+    claims: Optional[Dict[str, Any]] = Field(None, description="Decoded claims once the signature checked out (also for e.g. expired tokens).")
+    kid: Optional[str] = None
+    error: Optional[str] = Field(None, description="Machine-readable reason, e.g. 'expired', 'revoked', 'invalid_signature'.")
+    error_detail: Optional[str] = None
+
+class ATKBatchVerificationResponse(BaseModel):
+    results: List[ATKVerificationResponse] = Field(..., description="One result per token, in request order.")
+    valid_count: int
+    invalid_count: int
+
+class IntrospectionResponse(BaseModel):
+    """
+    RFC 7662 introspection response. For an active token the decoded ATK claims
+    are added at the top level, plus `scope` (space-separated permissions) and
+    `token_type`. Inactive tokens only report `active: false`.
+    """
+    active: bool
+    is_revoked: Optional[bool] = Field(None, description="Revocation status of the token's JTI, as in /reg/revocation-status. Omitted if the token was not checked.")
+    checked_at: Optional[datetime] = Field(None, description="When the revocation status was checked.")
+    error: Optional[str] = Field(None, description="Batch only: 'revocation_check_failed' when the revocation status could not be looked up. The token is reported inactive; retry later.")
+
+    model_config = {"extra": "allow"}
+
+class IntrospectionBatchRequest(BaseModel):
+    tokens: List[str] = Field(..., min_length=1, max_length=MAX_ATK_VERIFY_BATCH_SIZE, description="ATKs to introspect.")
+
+class IntrospectionBatchResponse(BaseModel):
+    results: List[IntrospectionResponse] = Field(..., description="One result per token, in request order.")
+
+class KeyringReloadResponse(BaseModel):
+    active_kid: str = Field(..., description="Key ID now used to sign new ATKs.")
+    published_kids: List[str] = Field(..., description="Key IDs published in the JWKS (active, next and retiring).")
+    jwks_etag: str = Field(..., description="ETag of the JWKS for this keyring.")
+
+class RevocationFilterRebuildResponse(BaseModel):
+    jtis: int = Field(..., description="Revoked JTIs loaded into the rebuilt filter.")
+    capacity: int = Field(..., description="JTIs the filter holds before it is rebuilt at a larger size.")
+    size_bytes: int = Field(..., description="Memory used by the filter's bit array.")
+    rebuild_ms: float = Field(..., description="Time taken by the rebuild, in milliseconds.")
+
 class JWK(BaseModel):
     kty: str = Field("OKP")
     crv: str = Field("Ed25519")
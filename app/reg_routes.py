@@ -1,20 +1,87 @@
 # app/reg_routes.py
-from fastapi import APIRouter, HTTPException, Query, Body, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Body, Depends, Request, Response, Form
+from fastapi.responses import JSONResponse
+from typing import Dict, Any, Optional, List
+import hashlib
+import logging
 
-from app.core.key_manager import get_jwks
-from app.auth.middleware import require_api_auth  
+from app.core.key_manager import get_jwks_document
+from app.core.key_rotation import reload_signing_keys_async
+from app.db.revocation_filter import rebuild_revocation_filter
+from app.core.token_validator import (
+    get_atk_verifier,
+    ATKVerificationResult,
+    ERROR_REVOKED,
+    ERROR_REVOCATION_CHECK_FAILED,
+)
+from app.auth.middleware import require_api_auth, require_api_admin
 from app.models.user_models import User 
-from app.db.revocation_store import add_jti_to_revocation_list, is_jti_revoked, can_user_revoke_token 
-from app.models.atk_models import JWKS, ATKRevocationRequest, RevocationStatusResponse
+from app.db.revocation_store import (
+    add_jti_to_revocation_list_async,
+    is_jti_revoked_async,
+    check_token_revocable_async,
+    build_bulk_revocation_query,
+    revoke_tokens_bulk_async,
+    get_revoked_jtis_async,
+    get_revocations_since_async,
+    encode_revocation_cursor,
+    decode_revocation_cursor,
+)
+from app.models.atk_models import (
+    JWKS,
+    ATKRevocationRequest,
+    ATKBulkRevocationRequest,
+    ATKBulkRevocationResponse,
+    RevocationStatusResponse,
+    RevocationStatusBatchRequest,
+    RevocationStatusBatchResponse,
+    RevocationFeedEntry,
+    RevocationFeedResponse,
+    KeyringReloadResponse,
+    RevocationFilterRebuildResponse,
+    ATKVerificationRequest,
+    ATKBatchVerificationRequest,
+    ATKVerificationResponse,
+    ATKBatchVerificationResponse,
+    IntrospectionResponse,
+    IntrospectionBatchRequest,
+    IntrospectionBatchResponse,
+)
 from app.models.common_models import MessageResponse
 from datetime import datetime, timezone # For RevocationStatusResponse default
+from config.settings import (
+    REVOCATION_FEED_MAX_PAGE_SIZE,
+    REVOCATION_FEED_SETTLE_SECONDS,
+    REVOCATION_FEED_MAX_AGE_SECONDS,
+    JWKS_MAX_AGE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     tags=["Registry (REG)"],
     responses={404: {"description": "Not found"}},
 )
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers `etag` (weak comparison, as RFC 9110 requires)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+def _cacheable_json_response(request: Request, body: bytes, etag: str, max_age: int) -> Response:
+    """Serves pre-serialized JSON with ETag and Cache-Control, answering 304 when the client's copy is current."""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get(
     "/.well-known/jwks.json",
     response_model=JWKS, # Use the Pydantic model for response schema
@@ -23,19 +90,22 @@ router = APIRouter(
                 "for verifying ATK signatures.",
     responses={
         200: {"description": "JWKS retrieved successfully"},
+        304: {"description": "The client's cached JWKS (If-None-Match) is still current"},
         500: {"model": MessageResponse, "description": "Internal server error if keys cannot be loaded"},
     }
 )
-async def get_jwks_endpoint():
+async def get_jwks_endpoint(request: Request):
     """
     Serves the JSON Web Key Set (JWKS) containing the public key(s)
     used by this AIF Core Service (acting as IE) to sign ATKs.
+    The document is serialized once per key set and served with a strong ETag.
     """
-    jwks_data = get_jwks() # From key_manager
-    if not jwks_data or not jwks_data.get("keys"):
-        print("❌ JWKS data is not available or keys are missing.")
+    jwks_document = get_jwks_document() # From key_manager
+    if not jwks_document:
+        logger.error("❌ JWKS data is not available or keys are missing.")
         raise HTTPException(status_code=500, detail="Key material not available.")
-    return JWKS(**jwks_data) # Validate against Pydantic model before returning
+    body, etag = jwks_document
+    return _cacheable_json_response(request, body, etag, JWKS_MAX_AGE_SECONDS)
 
 @router.post(
     "/reg/revoke-atk",
@@ -65,43 +135,104 @@ async def revoke_atk_endpoint(
     jti = request_body.jti.strip()
     user_id = str(current_user.id)
     
-    print(f"🔐 Revocation request for JTI: {jti} by user: {user_id}")
+    logger.info("🔐 Revocation request for JTI: %s by user: %s", jti, user_id)
     
-    # Validate that the user can revoke this token
-    can_revoke = can_user_revoke_token(user_id, jti)
+    # Validate that the user can revoke this token (also yields its expiry for compaction)
+    can_revoke, original_exp_timestamp = await check_token_revocable_async(user_id, jti)
     
     if can_revoke is None:
-        print(f"❌ Error checking revocation permissions for JTI: {jti}")
+        logger.error("❌ Error checking revocation permissions for JTI: %s", jti)
         raise HTTPException(
             status_code=500, 
             detail="Error validating token ownership"
         )
     
     if not can_revoke:
-        print(f"🚫 User {user_id} attempted to revoke token {jti} they don't own")
+        logger.warning("🚫 User %s attempted to revoke token %s they don't own", user_id, jti)
         raise HTTPException(
             status_code=403, 
             detail="You can only revoke tokens that you have issued"
         )
     
     # Proceed with revocation
-    success = add_jti_to_revocation_list(
+    success = await add_jti_to_revocation_list_async(
         jti=jti,
+        original_exp_timestamp=original_exp_timestamp,
         agent_builder_id=user_id
     )
     
     if not success:
-        print(f"❌ Failed to add JTI '{jti}' to revocation list")
+        logger.error("❌ Failed to add JTI '%s' to revocation list", jti)
         raise HTTPException(
             status_code=500, 
             detail="Failed to add JTI to revocation list"
         )
     
-    print(f"✅ JTI '{jti}' successfully revoked by user {user_id}")
+    logger.info("✅ JTI '%s' successfully revoked by user %s", jti, user_id)
     return MessageResponse(
         message=f"Token '{jti}' successfully revoked"
     )
 
+@router.post(
+    "/reg/revoke-atk/bulk",
+    response_model=ATKBulkRevocationResponse,
+    summary="Revoke many Agent Tokens (ATKs) at once",
+    description="Revokes a list of JTIs, or every active token matching a selector (AID prefix, "
+                "audience, end-user id, or all). Only tokens issued by the authenticated user are affected. "
+                "The user_id selector matches the stored end-user id, or for older records without one, "
+                "the user segment of the AID.",
+    responses={
+        200: {"description": "Matching tokens added to the revocation list"},
+        401: {"model": MessageResponse, "description": "Authentication required"},
+        422: {"model": MessageResponse, "description": "Invalid request (e.g., both or neither of jtis/selector)"},
+        500: {"description": "Revocation failed; if some tokens were already revoked the body reports them with complete=false"},
+    }
+)
+async def revoke_atk_bulk_endpoint(
+    request_body: ATKBulkRevocationRequest = Body(...),
+    current_user: User = Depends(require_api_auth)
+):
+    """
+    Revokes tokens in bulk, e.g. after a deployment is compromised.
+
+    - **jtis**: JTIs to revoke. JTIs not issued by the caller are reported in `skipped_jtis`.
+    - **selector**: Revoke all active tokens matching `aid_prefix`, `audience`, `user_id`, or `all`.
+    """
+    user_id = str(current_user.id)
+    selector = request_body.selector
+    if selector is not None:
+        query = build_bulk_revocation_query(
+            user_id,
+            aid_prefix=selector.aid_prefix,
+            audience=selector.audience,
+            user_id=selector.user_id
+        )
+        logger.info("🔐 Bulk revocation request by user %s for selector %s", user_id, selector.model_dump(exclude_none=True))
+    else:
+        query = build_bulk_revocation_query(user_id, jtis=request_body.jtis)
+        logger.info("🔐 Bulk revocation request by user %s for %s JTIs", user_id, len(request_body.jtis))
+
+    result = await revoke_tokens_bulk_async(user_id, query)
+    revoked_jtis = result.revoked_jtis
+    if not result.complete:
+        logger.error("❌ Bulk revocation failed for user %s after %s tokens", user_id, len(revoked_jtis))
+        if not revoked_jtis:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to add tokens to revocation list"
+            )
+        # Tokens already revoked stay revoked; report them so the caller knows a retry is needed
+        partial = ATKBulkRevocationResponse(revoked_count=len(revoked_jtis), complete=False)
+        return JSONResponse(status_code=500, content=partial.model_dump())
+
+    skipped_jtis = []
+    if request_body.jtis is not None:
+        revoked_set = set(revoked_jtis)
+        skipped_jtis = [jti for jti in dict.fromkeys(request_body.jtis) if jti not in revoked_set]
+
+    logger.info("✅ %s tokens revoked in bulk by user %s", len(revoked_jtis), user_id)
+    return ATKBulkRevocationResponse(revoked_count=len(revoked_jtis), skipped_jtis=skipped_jtis)
+
 @router.get(
     "/reg/revocation-status",
     response_model=RevocationStatusResponse,
@@ -120,21 +251,316 @@ async def get_revocation_status_endpoint(
     Checks if a given JTI has been revoked.
     - **jti**: The JTI to check.
     """
-    print(f"Received revocation status check for JTI: {jti}")
+    logger.info("Received revocation status check for JTI: %s", jti)
     if not jti: # Should be caught by FastAPI's Query(...) if jti is required
         raise HTTPException(status_code=400, detail="JTI query parameter is required.")
 
-    revoked_status = is_jti_revoked(jti=jti)
+    revoked_status = await is_jti_revoked_async(jti=jti)
 
     if revoked_status is None: # Indicates an error during DB lookup
-        print(f"❌ Error checking revocation status for JTI: {jti}")
+        logger.error("❌ Error checking revocation status for JTI: %s", jti)
         raise HTTPException(status_code=500, detail="Error checking token revocation status.")
     
-    print(f"✅ Revocation status for JTI '{jti}': {revoked_status}")
+    logger.info("✅ Revocation status for JTI '%s': %s", jti, revoked_status)
     return RevocationStatusResponse(
         jti=jti,
         is_revoked=revoked_status,
         # checked_at is defaulted by Pydantic model
     )
 
+@router.post(
+    "/reg/revocation-status/batch",
+    response_model=RevocationStatusBatchResponse,
+    summary="Check the revocation status of many ATK JTIs at once",
+    description="Resolves up to the configured maximum number of JTIs with a single lookup. "
+                "Intended for SP gateways validating many agent tokens together.",
+    responses={
+        200: {"description": "Revocation statuses retrieved"},
+        422: {"model": MessageResponse, "description": "Invalid request (e.g., malformed JTI or too many JTIs)"},
+        500: {"model": MessageResponse, "description": "Internal server error during lookup"},
+    }
+)
+async def get_revocation_status_batch_endpoint(
+    request_body: RevocationStatusBatchRequest = Body(...)
+):
+    """
+    Checks whether each of the given JTIs has been revoked.
+    - **jtis**: The JTIs to check. Duplicates are answered once.
+    """
+    logger.info("Received batch revocation status check for %s JTIs", len(request_body.jtis))
+    revoked_jtis = await get_revoked_jtis_async(request_body.jtis)
+
+    if revoked_jtis is None: # Indicates an error during DB lookup
+        logger.error("❌ Error checking revocation status for %s JTIs", len(request_body.jtis))
+        raise HTTPException(status_code=500, detail="Error checking token revocation status.")
+
+    return RevocationStatusBatchResponse(
+        statuses={jti: jti in revoked_jtis for jti in request_body.jtis}
+    )
+
+@router.get(
+    "/reg/revocations",
+    response_model=RevocationFeedResponse,
+    summary="List revocations added after a cursor",
+    description="Incremental revocation feed for SP-side caching. Returns revocations in "
+                "revoked_at order; pass `next_cursor` back as `since` to fetch the next page. "
+                "Responses carry an ETag and honour If-None-Match.",
+    responses={
+        200: {"description": "Revocations retrieved"},
+        304: {"description": "Nothing changed since the ETag sent in If-None-Match"},
+        400: {"model": MessageResponse, "description": "Invalid cursor"},
+        500: {"model": MessageResponse, "description": "Internal server error during lookup"},
+    }
+)
+async def get_revocations_feed_endpoint(
+    request: Request,
+    since: Optional[str] = Query(None, description="Cursor returned by a previous call. Omit to start from the beginning."),
+    limit: int = Query(500, ge=1, le=REVOCATION_FEED_MAX_PAGE_SIZE, description="Maximum number of revocations to return.")
+):
+    """
+    Returns revocations added after `since`.
+    - **since**: Opaque cursor from a previous response's `next_cursor`.
+    - **limit**: Page size.
+    """
+    try:
+        cursor = decode_revocation_cursor(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'since' cursor.")
+
+    documents = await get_revocations_since_async(cursor, limit, settle_seconds=REVOCATION_FEED_SETTLE_SECONDS)
+    if documents is None:
+        logger.error("❌ Error reading revocation feed since cursor: %s", since)
+        raise HTTPException(status_code=500, detail="Error reading revocation list.")
+
+    entries = [
+        RevocationFeedEntry(
+            jti=doc["jti"],
+            # MongoDB returns naive datetimes; they are stored as UTC
+            revoked_at=doc["revoked_at"].replace(tzinfo=timezone.utc),
+            exp=doc.get("original_exp_ts")
+        )
+        for doc in documents
+    ]
+    # An empty page keeps the caller's cursor so it can simply poll again
+    next_cursor = encode_revocation_cursor(documents[-1]["revoked_at"], documents[-1]["_id"]) if documents else since
+    body = RevocationFeedResponse(
+        revocations=entries,
+        next_cursor=next_cursor,
+        has_more=len(documents) == limit,
+    ).model_dump_json().encode()
+
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return _cacheable_json_response(request, body, etag, REVOCATION_FEED_MAX_AGE_SECONDS)
+
+def _verification_response(result: ATKVerificationResult) -> ATKVerificationResponse:
+    return ATKVerificationResponse(
+        valid=result.valid,
+        claims=result.claims,
+        kid=result.kid,
+        error=result.error,
+        error_detail=result.error_detail
+    )
+
+@router.post(
+    "/reg/verify",
+    response_model=ATKVerificationResponse,
+    summary="Verify an Agent Token (ATK)",
+    description="Verifies the ATK's signature against the published keys, checks exp/iat/iss "
+                "(and aud if given) with a small leeway, and by default its revocation status. "
+                "An invalid token is a normal 200 response with valid=false and an error code.",
+    responses={
+        200: {"description": "Verification result"},
+        422: {"model": MessageResponse, "description": "Invalid request body"},
+    }
+)
+async def verify_atk_endpoint(request_body: ATKVerificationRequest = Body(...)):
+    """
+    Verifies a single ATK.
+    - **token**: The ATK.
+    - **audience**: Expected audience (optional).
+    - **check_revocation**: Whether to consult the revocation list (default true).
+    """
+    result = await get_atk_verifier().verify_async(
+        request_body.token,
+        audience=request_body.audience,
+        check_revocation=request_body.check_revocation
+    )
+    return _verification_response(result)
+
+@router.post(
+    "/reg/verify/batch",
+    response_model=ATKBatchVerificationResponse,
+    summary="Verify many Agent Tokens (ATKs) at once",
+    description="Like /reg/verify for up to the configured maximum number of tokens; "
+                "revocation is resolved for the whole batch with a single lookup.",
+    responses={
+        200: {"description": "Verification results, in request order"},
+        422: {"model": MessageResponse, "description": "Invalid request body (e.g., too many tokens)"},
+    }
+)
+async def verify_atk_batch_endpoint(request_body: ATKBatchVerificationRequest = Body(...)):
+    """
+    Verifies a batch of ATKs.
+    - **tokens**: The ATKs.
+    - **audience**: Expected audience for every token (optional).
+    - **check_revocation**: Whether to consult the revocation list (default true).
+    """
+    results = await get_atk_verifier().verify_many_async(
+        request_body.tokens,
+        audience=request_body.audience,
+        check_revocation=request_body.check_revocation
+    )
+    valid_count = sum(1 for result in results if result.valid)
+    return ATKBatchVerificationResponse(
+        results=[_verification_response(result) for result in results],
+        valid_count=valid_count,
+        invalid_count=len(results) - valid_count
+    )
+
+def _introspection_responses(results: List[ATKVerificationResult]) -> List[IntrospectionResponse]:
+    """
+    Maps verification results to RFC 7662 responses; revocation is reported as in /reg/revocation-status.
+    A token whose revocation status could not be checked is never reported active.
+    """
+    checked_at = datetime.now(timezone.utc)
+
+    responses = []
+    for result in results:
+        if result.error == ERROR_REVOCATION_CHECK_FAILED:
+            responses.append(IntrospectionResponse(active=False, error=ERROR_REVOCATION_CHECK_FAILED))
+        elif result.error == ERROR_REVOKED:
+            responses.append(IntrospectionResponse(active=False, is_revoked=True, checked_at=checked_at))
+        elif not result.valid:
+            # RFC 7662: say nothing more about tokens that are not active
+            responses.append(IntrospectionResponse(active=False))
+        else:
+            data = dict(result.claims)
+            permissions = data.get("permissions")
+            if isinstance(permissions, list):
+                data["scope"] = " ".join(str(permission) for permission in permissions)
+            data.update(token_type="ATK", active=True, is_revoked=False, checked_at=checked_at)
+            responses.append(IntrospectionResponse.model_validate(data))
+    return responses
+
+@router.post(
+    "/reg/introspect",
+    response_model=IntrospectionResponse,
+    response_model_exclude_none=True,
+    summary="Introspect an Agent Token (ATK) (RFC 7662)",
+    description="Takes a form-encoded `token` and returns `active` plus the decoded claims in one call. "
+                "A token is active when its signature, exp/iat/iss and revocation status all check out. "
+                "Verified tokens are cached by hash until they expire. Public, like /reg/verify: the "
+                "response only discloses claims the presenter can already read from the unencrypted ATK.",
+    responses={
+        200: {"description": "Introspection result"},
+        422: {"model": MessageResponse, "description": "Missing token"},
+        500: {"model": MessageResponse, "description": "Internal server error during revocation lookup"},
+    }
+)
+async def introspect_atk_endpoint(
+    token: str = Form(..., min_length=1),
+    token_type_hint: Optional[str] = Form(None)
+):
+    """
+    Introspects a single ATK.
+    - **token**: The ATK.
+    - **token_type_hint**: Accepted for RFC 7662 compatibility; only ATKs are introspected.
+    """
+    results = await get_atk_verifier().verify_many_async([token], check_revocation=True)
+    if results[0].error == ERROR_REVOCATION_CHECK_FAILED:
+        raise HTTPException(status_code=500, detail="Error checking token revocation status.")
+    return _introspection_responses(results)[0]
+
+@router.post(
+    "/reg/introspect/batch",
+    response_model=IntrospectionBatchResponse,
+    response_model_exclude_none=True,
+    summary="Introspect many Agent Tokens (ATKs) at once",
+    description="Like /reg/introspect for up to the configured maximum number of tokens (JSON body); "
+                "revocation is resolved for the whole batch with a single lookup. If that lookup fails, "
+                "the affected tokens are reported inactive with error=revocation_check_failed. Public.",
+    responses={
+        200: {"description": "Introspection results, in request order"},
+        422: {"model": MessageResponse, "description": "Invalid request body (e.g., too many tokens)"},
+    }
+)
+async def introspect_atk_batch_endpoint(request_body: IntrospectionBatchRequest = Body(...)):
+    """
+    Introspects a batch of ATKs.
+    - **tokens**: The ATKs.
+    """
+    results = await get_atk_verifier().verify_many_async(request_body.tokens, check_revocation=True)
+    return IntrospectionBatchResponse(results=_introspection_responses(results))
+
+@router.post(
+    "/reg/admin/keys/reload",
+    response_model=KeyringReloadResponse,
+    summary="Reload the signing keyring",
+    description="Reloads the signing keys from KEYS_DIR in this worker without a restart. "
+                "Other workers follow via SIGHUP or the keyring file watcher. Requires an admin API token.",
+    responses={
+        200: {"description": "Keyring reloaded"},
+        401: {"model": MessageResponse, "description": "Authentication required"},
+        403: {"model": MessageResponse, "description": "Admin role required"},
+        500: {"model": MessageResponse, "description": "Keyring on disk is invalid; previous keys remain active"},
+    }
+)
+async def reload_keys_endpoint(current_user: User = Depends(require_api_admin)):
+    """
+    Reloads keyring.json (or the single legacy key pair) and swaps the active signer atomically.
+    In-flight issuance finishes with the key it started with.
+    """
+    logger.info("🔑 Keyring reload requested by admin %s", current_user.id)
+    try:
+        keyring = await reload_signing_keys_async()
+    except Exception as e:
+        logger.error("❌ Keyring reload failed: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="Keyring reload failed; previous keys remain active."
+        )
+    return KeyringReloadResponse(
+        active_kid=keyring.active_kid,
+        published_kids=list(keyring.keys),
+        jwks_etag=keyring.version
+    )
+
+@router.post(
+    "/reg/admin/revocation-filter/rebuild",
+    response_model=RevocationFilterRebuildResponse,
+    summary="Rebuild the revocation filter",
+    description="Rebuilds this worker's in-memory revocation filter from revoked_atks, e.g. after bulk "
+                "maintenance or TTL compaction. Other workers rebuild on their own schedule "
+                "(AIF_REVOCATION_FILTER_REBUILD_SECONDS). Requires an admin API token.",
+    responses={
+        200: {"description": "Filter rebuilt"},
+        401: {"model": MessageResponse, "description": "Authentication required"},
+        403: {"model": MessageResponse, "description": "Admin role required"},
+        409: {"model": MessageResponse, "description": "The revocation filter is disabled"},
+        500: {"model": MessageResponse, "description": "Rebuild failed; the previous filter remains active"},
+    }
+)
+async def rebuild_revocation_filter_endpoint(current_user: User = Depends(require_api_admin)):
+    """
+    Reads the full revoked JTI set and swaps in a freshly sized filter.
+    Revocations made while the rebuild runs are carried over.
+    """
+    logger.info("🧮 Revocation filter rebuild requested by admin %s", current_user.id)
+    try:
+        stats = await rebuild_revocation_filter()
+    except Exception as e:
+        logger.error("❌ Revocation filter rebuild failed: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="Revocation filter rebuild failed; the previous filter remains active."
+        )
+    if stats is None:
+        raise HTTPException(status_code=409, detail="The revocation filter is disabled (AIF_REVOCATION_FILTER_ENABLED).")
+    return RevocationFilterRebuildResponse(
+        jtis=stats["jtis"],
+        capacity=stats["capacity"],
+        size_bytes=stats["size_bytes"],
+        rebuild_ms=stats["last_rebuild_ms"]
+    )
+
 # Add other REG-specific routes here in the future (e.g., for SP registration info, issuer lists if federated)
\ No newline at end of file
@@ -8,14 +8,13 @@ from typing import List, Dict, Optional
 import logging
 import json
 from datetime import datetime, timezone
-import jwt # For decoding ATK to get JTI in issue_token_form_post
 
 from app.utils.docs import render_markdown_file
 
 # Core imports
-from .core.token_issuer import create_atk
-# Updated to use get_revoked_tokens for the revoke_token_form_get display
-from .db.revocation_store import add_jti_to_revocation_list, get_revoked_tokens, is_jti_revoked
+from .core.signing_executor import get_signing_executor
+# Updated to use get_revoked_tokens_async for the revoke_token_form_get display
+from .db.revocation_store import add_jti_to_revocation_list_async, get_revoked_tokens_async, is_jti_revoked_async
 from .core.key_manager import get_jwks
 from .models.user_models import User # Assuming User model is Pydantic or similar
 from .auth.middleware import (
@@ -29,7 +28,7 @@ from .db.user_store import (
     regenerate_api_token,
     # get_service_provider_by_user_id,
 )
-from .db.token_store import add_issued_token_record, get_user_issued_tokens
+from .db.token_store import persist_issued_token_record_async, get_user_issued_tokens_async
 
 # Import configurations
 from config.settings import (
@@ -154,7 +153,7 @@ async def revoked_tokens_check_form(
     revocation_result_display = None # For displaying results after check
     
     if jti_to_check:
-        is_it_revoked = is_jti_revoked(jti_to_check) # Call the function
+        is_it_revoked = await is_jti_revoked_async(jti_to_check) # Call the function
         if is_it_revoked is None: # DB or other error
             revocation_result_display = f"Error: Could not determine revocation status for JTI: {jti_to_check}."
             if not status_message: status_message = revocation_result_display; message_type = "error"
@@ -271,7 +270,7 @@ async def ui_dashboard_dispatch(
         # Get API token info
         api_token = getattr(current_user, 'api_token', None)
         
-        issued_tokens_list = get_user_issued_tokens(user_id=str(current_user.id), limit=10)
+        issued_tokens_list = await get_user_issued_tokens_async(user_id=str(current_user.id), limit=10)
         days_until_expiry = None
         
         # Check token expiry
@@ -353,7 +352,7 @@ async def profile_page(request: Request, current_user: User = Depends(require_au
 @router.get("/issue-token", response_class=HTMLResponse, name="issue_token_form_get")
 async def issue_token_form_get(request: Request, current_user: User = Depends(require_agent_builder)):
     context = get_base_template_context(request, "IAM Heimdall", current_user)
-    issued_tokens_list = get_user_issued_tokens(user_id=str(current_user.id), status="active", limit=10)
+    issued_tokens_list = await get_user_issued_tokens_async(user_id=str(current_user.id), status="active", limit=10)
     context.update({
         "supported_models": SUPPORTED_AI_MODELS,
         "standard_permissions": STANDARD_PERMISSIONS_LIST,
@@ -382,28 +381,19 @@ async def issue_token_form_post(
         actual_permissions = [p.strip() for p in input_permissions_str.split(',') if p.strip()]
         if not actual_permissions: raise ValueError("At least one permission required.")
 
-        signed_atk = create_atk(
+        issuance = await get_signing_executor().create_atk(
             user_id=user_id.strip(), audience_sp_id=audience_sp_id.strip(),
             permissions=actual_permissions, purpose=purpose.strip(),
             model_id=model_id.strip(), override_trust_tags=None # Simplified for PoC UI
         )
-        if signed_atk:
-            issued_atk_val = signed_atk
+        if issuance:
+            issued_atk_val = issuance.atk
             message = "✅ ATK issued successfully!"
             if DEFAULT_AIF_TRUST_TAGS: message += f" (Defaults: {json.dumps(DEFAULT_AIF_TRUST_TAGS)})"
             else: message += " (No default trust tags.)"
             message_type = "success"
             try:
-                # Ensure PyJWT is used for decoding if that's what you settled on
-                decoded_token = jwt.decode(signed_atk, options={"verify_signature": False, "verify_exp": False, "verify_aud": False})
-                token_record = {
-                    "aid": decoded_token.get("sub"), "jti": decoded_token.get("jti"),
-                    "issued_at": datetime.fromtimestamp(decoded_token.get("iat"), tz=timezone.utc),
-                    "expires_at": datetime.fromtimestamp(decoded_token.get("exp"), tz=timezone.utc),
-                    "audience": audience_sp_id.strip(), "permissions": actual_permissions,
-                    "purpose": purpose.strip(), "model_id": model_id.strip(), "status": "active"
-                }
-                add_issued_token_record(str(current_user.id), token_record)
+                await persist_issued_token_record_async(str(current_user.id), issuance.to_token_record())
             except Exception as e: logging.warning(f"Could not record issued token: {e}", exc_info=True)
             form_data_repopulate = {"model_id": model_id} # Clear form
         else: message = "❌ Failed to issue ATK. Logs may have details."
@@ -412,7 +402,7 @@ async def issue_token_form_post(
         logging.error(f"Error issuing token UI: {e}", exc_info=True)
         message = "❌ Unexpected error issuing token."
 
-    issued_tokens_list = get_user_issued_tokens(user_id=str(current_user.id), status="active", limit=10)
+    issued_tokens_list = await get_user_issued_tokens_async(user_id=str(current_user.id), status="active", limit=10)
     context.update({
         "message": message, "message_type": message_type, "issued_atk": issued_atk_val,
         "supported_models": SUPPORTED_AI_MODELS, "standard_permissions": STANDARD_PERMISSIONS_LIST,
@@ -429,7 +419,7 @@ async def revoke_token_form_get(
     context = get_base_template_context(request, "IAM Heimdall", current_user)
     revoked_tokens_list_display = []
     try:
-        revoked_tokens_list_raw = get_revoked_tokens(agent_builder_id=str(current_user.id), limit=20)
+        revoked_tokens_list_raw = await get_revoked_tokens_async(agent_builder_id=str(current_user.id), limit=20)
         for item_raw in revoked_tokens_list_raw:
             item = dict(item_raw)
             # Ensure correct datetime conversion for template
@@ -453,7 +443,7 @@ async def revoke_token_form_post(
     message, msg_type = "", "error"
     try:
         if not jti.strip(): raise ValueError("JTI cannot be empty.")
-        success = add_jti_to_revocation_list(jti=jti.strip(), agent_builder_id=str(current_user.id))
+        success = await add_jti_to_revocation_list_async(jti=jti.strip(), agent_builder_id=str(current_user.id))
         if success: message, msg_type = f"✅ JTI '{jti}' processed for revocation.", "success"
         else: message = f"❌ Failed to add JTI '{jti}' to revocation list."
     except ValueError as e: message = f"❌ Validation Error: {str(e)}"
@@ -0,0 +1,55 @@
+# app/utils/bloom_filter.py
+import hashlib
+import math
+from typing import Iterable
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Sized for `capacity` items at the requested false-positive rate. Membership
+    answers are "definitely not present" (False) or "possibly present" (True).
+    Positions use double hashing over a single 128-bit BLAKE2b digest.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1.")
+        self.capacity = max(1, capacity)
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def is_saturated(self) -> bool:
+        """True once more items were added than the filter was sized for."""
+        return self.count > self.capacity
@@ -0,0 +1,135 @@
+# app/utils/logging_config.py
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+_DEFAULT_FORMAT = '%(levelname)s:     %(message)s'
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parses "logger=rate,logger=rate" (e.g. "app.db.revocation_store=0.01") into a dict.
+    Raises ValueError on a malformed entry or a rate outside [0, 1].
+    """
+    rates = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, rate = item.partition("=")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid log sampling entry '{item}', expected 'logger=rate'.")
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"Log sampling rate for '{name.strip()}' must be between 0 and 1.")
+        rates[name.strip()] = value
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records below WARNING from the configured
+    loggers (and their children). Warnings and errors always pass, so sampling
+    only thins out the per-request success lines.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float]):
+        super().__init__()
+        self.sample_rates = dict(sample_rates)
+        self._rate_by_logger: Dict[str, float] = {}
+        self.sampled_out = 0
+
+    def _rate_for(self, logger_name: str) -> float:
+        rate = self._rate_by_logger.get(logger_name)
+        if rate is None:
+            # Most specific configured prefix wins; resolved once per logger name
+            rate = 1.0
+            for name, configured_rate in sorted(self.sample_rates.items(), key=lambda item: len(item[0])):
+                if logger_name == name or logger_name.startswith(name + "."):
+                    rate = configured_rate
+            self._rate_by_logger[logger_name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them first, and
+    drops them (counting the drops) instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stdlib formats here, on the calling thread; the listener's handlers do it instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def configure_logging(level: str = "INFO", queue_size: int = 10000, sample_rates: Optional[Dict[str, float]] = None):
+    """
+    Routes the root logger through a bounded queue drained by a background
+    thread, so request handlers never format or write log lines themselves.
+    Handlers already on the root logger (e.g. run.py's basicConfig) become the
+    listener's outputs; otherwise records go to stdout. Safe to call again.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None:
+        return
+
+    output_handlers: List[logging.Handler] = list(root.handlers)
+    if not output_handlers:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter(_DEFAULT_FORMAT))
+        output_handlers = [stream_handler]
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(0, queue_size)))
+    if sample_rates:
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+    _listener = QueueListener(_queue_handler.queue, *output_handlers, respect_handler_level=True)
+
+    for handler in output_handlers:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flushes queued records and restores the root logger's direct handlers."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    listener, queue_handler = _listener, _queue_handler
+    _listener = _queue_handler = None
+    listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(queue_handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+def get_logging_stats() -> Dict[str, int]:
+    """Records dropped on a full queue and records removed by sampling."""
+    if _queue_handler is None:
+        return {"dropped": 0, "sampled_out": 0}
+    sampled_out = sum(f.sampled_out for f in _queue_handler.filters if isinstance(f, SamplingFilter))
+    return {"dropped": _queue_handler.dropped, "sampled_out": sampled_out}
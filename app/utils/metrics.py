@@ -0,0 +1,328 @@
+# app/utils/metrics.py
+"""
+Minimal in-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keep their label children in a
+dict created once per label combination, so recording a sample is a dict
+lookup plus a few arithmetic operations under a lock. Values that already
+live elsewhere (cache stats, queue depths) are read at scrape time by
+registered collectors instead of being mirrored on every request.
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config.settings import METRICS_ENABLED
+from .request_timing import record_phase, REQUEST_PHASES_ENABLED
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# (name, type, help, [(labels, value), ...]) as returned by collectors
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape_label_value(str(value))}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+class _GaugeChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # One slot per upper bound plus the +Inf overflow slot
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Returns the child for these label values, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {values}.")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _labelled_children(self):
+        with self._lock:
+            items = list(self._children.items())
+        for values, child in items:
+            yield list(zip(self.labelnames, values)), child
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def samples(self):
+        return [(self.name, labels, child._value) for labels, child in self._labelled_children()]
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def samples(self):
+        return [(self.name, labels, child._value) for labels, child in self._labelled_children()]
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self):
+        samples = []
+        for labels, child in self._labelled_children():
+            with child._lock:
+                counts, total = list(child._counts), child._sum
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels + [("le", _format_value(upper_bound))], cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors, and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Adds a callable that returns metric families computed at scrape time."""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector in collectors:
+            for name, type_name, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.items())} {_format_value(value)}")
+        return ("\n".join(lines) + "\n").encode()
+
+_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _registry
+
+# --- Service metrics ---
+
+HTTP_REQUEST_SECONDS = _registry.histogram(
+    "aif_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = _registry.gauge(
+    "aif_http_requests_in_flight", "HTTP requests currently being served.")
+ATK_SIGN_SECONDS = _registry.histogram(
+    "aif_atk_sign_seconds", "Time spent in create_atk (claims and signature), excluding executor queue wait.")
+ATK_SIGN_QUEUE_WAIT_SECONDS = _registry.histogram(
+    "aif_atk_sign_queue_wait_seconds", "Time an issuance waited for a signing worker.")
+DB_OPERATION_SECONDS = _registry.histogram(
+    "aif_db_operation_duration_seconds", "Latency of MongoDB store functions.", ("operation",))
+
+# Nesting depth of timed store calls in the current context (request or task)
+_db_operation_depth: ContextVar[int] = ContextVar("aif_db_operation_depth", default=0)
+
+def timed_db_operation(func):
+    """
+    Records a store function's latency in aif_db_operation_duration_seconds,
+    labelled with its name, and as request phase "db.<name>". Only the outermost
+    timed call is recorded: a store function calling another (e.g.
+    check_token_revocable_async -> get_token_by_jti_async) already includes
+    its time, and recording both would count it twice.
+    """
+    if not (METRICS_ENABLED or REQUEST_PHASES_ENABLED):
+        return func
+    child = DB_OPERATION_SECONDS.labels(func.__name__) if METRICS_ENABLED else None
+    phase_name = f"db.{func.__name__}"
+
+    def observe(elapsed: float):
+        if child is not None:
+            child.observe(elapsed)
+        record_phase(phase_name, elapsed)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            depth = _db_operation_depth.get()
+            if depth:
+                return await func(*args, **kwargs)
+            token = _db_operation_depth.set(depth + 1)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - started)
+                _db_operation_depth.reset(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = _db_operation_depth.get()
+        if depth:
+            return func(*args, **kwargs)
+        token = _db_operation_depth.set(depth + 1)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - started)
+            _db_operation_depth.reset(token)
+    return wrapper
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and the in-flight request gauge.
+    Requests are labelled with the matched route template (e.g. /reg/verify),
+    or "unmatched", so raw paths never become label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path: Optional[str] = getattr(route, "path", None)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path or "unmatched", str(status_code)).observe(elapsed)
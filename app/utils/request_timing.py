@@ -0,0 +1,141 @@
+# app/utils/request_timing.py
+"""
+Per-request phase timing.
+
+RequestTimingMiddleware gives each HTTP request a phase recorder in a context
+variable; code on the request path marks phases with `request_phase(...)`,
+`@timed_phase(...)` or `record_phase(...)`. Outside a request (CLI, startup)
+the helpers are no-ops. The recorded phases become a Server-Timing response
+header and, for requests slower than the threshold, one log line.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from config.settings import SERVER_TIMING_ENABLED, SLOW_REQUEST_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+# Phases are only collected when something consumes them
+REQUEST_PHASES_ENABLED: bool = SERVER_TIMING_ENABLED or SLOW_REQUEST_THRESHOLD_MS > 0
+
+class RequestPhases:
+    """Accumulated duration and call count per phase name, in first-seen order."""
+    __slots__ = ("durations", "counts")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def as_milliseconds(self) -> List[Tuple[str, float, int]]:
+        return [(name, seconds * 1000, self.counts[name]) for name, seconds in self.durations.items()]
+
+_current_phases: ContextVar[Optional[RequestPhases]] = ContextVar("aif_request_phases", default=None)
+
+def record_phase(name: str, seconds: float):
+    """Adds `seconds` to phase `name` of the current request, if there is one."""
+    phases = _current_phases.get()
+    if phases is not None:
+        phases.add(name, seconds)
+
+@contextmanager
+def request_phase(name: str):
+    """Times the enclosed block (which may contain awaits) as phase `name`."""
+    phases = _current_phases.get()
+    if phases is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.add(name, time.perf_counter() - started)
+
+def timed_phase(name: str):
+    """Decorator timing each call of a sync or async function as phase `name`."""
+    def decorator(func):
+        if not REQUEST_PHASES_ENABLED:
+            return func
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with request_phase(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with request_phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def format_server_timing(phases: RequestPhases, total_seconds: float) -> str:
+    entries = [f"{name};dur={milliseconds:.2f}" for name, milliseconds, _ in phases.as_milliseconds()]
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware that collects the phases of each request. Adds a
+    Server-Timing header (AIF_SERVER_TIMING_ENABLED) and logs the breakdown of
+    requests slower than AIF_SLOW_REQUEST_THRESHOLD_MS.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED, slow_request_threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_request_threshold_ms = slow_request_threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases = RequestPhases()
+        token = _current_phases.set(phases)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    # Phases still running at this point (e.g. background tasks) are not included
+                    header = format_server_timing(phases, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_phases.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            if self.slow_request_threshold_ms > 0 and total_ms >= self.slow_request_threshold_ms:
+                self._log_slow_request(scope, status_code, total_ms, phases)
+
+    @staticmethod
+    def _log_slow_request(scope, status_code: int, total_ms: float, phases: RequestPhases):
+        breakdown = phases.as_milliseconds()
+        logger.warning(
+            "🐢 Slow request: %s %s -> %s in %.1fms [%s]",
+            scope["method"], scope["path"], status_code, total_ms,
+            " ".join(f"{name}={milliseconds:.1f}ms" + (f"(x{count})" if count > 1 else "") for name, milliseconds, count in breakdown) or "no phases",
+            extra={
+                "request_method": scope["method"],
+                "request_path": scope["path"],
+                "status_code": status_code,
+                "duration_ms": round(total_ms, 3),
+                "phases_ms": {name: round(milliseconds, 3) for name, milliseconds, _ in breakdown},
+            },
+        )
@@ -0,0 +1,53 @@
+# benchmarks/common.py
+"""
+Shared setup for the offline benchmark tools.
+
+Importing this module pins the environment the app's settings are read from
+(throwaway keys directory, no write-behind, no revocation filter), so it must
+be imported before any `app` or `config` module.
+"""
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("AIF_KEYS_DIR", tempfile.mkdtemp(prefix="aif_bench_keys_"))
+os.environ.setdefault("AIF_ISSUED_TOKEN_WRITE_BEHIND", "false")
+os.environ.setdefault("AIF_REVOCATION_FILTER_ENABLED", "false")
+
+def set_log_level(level: str):
+    """Sets the level create_app() configures logging with; call before importing app modules."""
+    os.environ["AIF_LOG_LEVEL"] = level.upper()
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sample list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_metadata(**extra: Any) -> Dict[str, Any]:
+    """Timestamp, commit and interpreter details recorded with every result file."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        **extra,
+    }
@@ -0,0 +1,550 @@
+# benchmarks/inmemory_mongo.py
+"""
+In-memory stand-in for the subset of the PyMongo API used by app/db, so the
+benchmarks and the load generator run offline without a MongoDB server.
+
+Equality and $in lookups on `_id` and on single-field indexes created with
+create_index() go through hash indexes, like MongoDB's indexed lookups;
+everything else is a collection scan. Supported query operators: equality,
+$in, $ne, $gt, $gte, $lt, $lte, $exists, $regex, $or, $and. Supported update
+operators: $set, $setOnInsert, $unset, $inc, $push. Anything else raises
+NotImplementedError rather than silently returning wrong results.
+
+    from benchmarks.inmemory_mongo import install_inmemory_mongo
+    db, async_db = install_inmemory_mongo()   # before the first get_db()/get_async_db()
+"""
+import asyncio
+import copy
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+def _get_field(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _compare(value: Any, operand: Any, op) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return op(value, operand)
+    except TypeError:
+        return False
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, operand in condition.items():
+            if op == "$in":
+                if not any(_equals(value, item) for item in operand):
+                    return False
+            elif op == "$ne":
+                if _equals(value, operand):
+                    return False
+            elif op == "$gt":
+                if not _compare(value, operand, lambda a, b: a > b):
+                    return False
+            elif op == "$gte":
+                if not _compare(value, operand, lambda a, b: a >= b):
+                    return False
+            elif op == "$lt":
+                if not _compare(value, operand, lambda a, b: a < b):
+                    return False
+            elif op == "$lte":
+                if not _compare(value, operand, lambda a, b: a <= b):
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            elif op == "$regex":
+                if not isinstance(value, str) or not re.search(operand, value):
+                    return False
+            else:
+                raise NotImplementedError(f"Query operator {op} is not supported by the in-memory stand-in.")
+        return True
+    return _equals(value, condition)
+
+def _equals(value: Any, expected: Any) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub_query) for sub_query in condition):
+                return False
+        elif key == "$and":
+            if not all(_matches(doc, sub_query) for sub_query in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key} is not supported by the in-memory stand-in.")
+        elif not _matches_condition(_get_field(doc, key), condition):
+            return False
+    return True
+
+def _copy_value(value: Any) -> Any:
+    # Scalars (str, int, datetime, ObjectId) are immutable; only containers need a deep copy
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return {key: _copy_value(value) for key, value in doc.items()}
+    include_id = bool(projection.get("_id", 1))
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(bool(value) for value in fields.values()):
+        result = {key: _copy_value(doc[key]) for key in fields if key in doc}
+    else:
+        result = {key: _copy_value(value) for key, value in doc.items() if key not in fields or fields[key]}
+    if include_id and "_id" in doc:
+        result["_id"] = doc["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+def _sort_key(value: Any):
+    # MongoDB orders missing/None before numbers, strings and dates; keep types apart so mixed fields don't raise
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (3, value.binary)
+    return (4, value)
+
+def _index_key(keys) -> Optional[str]:
+    """Field name for a single-field index spec, None for compound indexes."""
+    if isinstance(keys, str):
+        return keys
+    keys = list(keys)
+    return keys[0][0] if len(keys) == 1 else None
+
+def _index_name(keys) -> str:
+    if isinstance(keys, str):
+        return f"{keys}_1"
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+class InMemoryCursor:
+    def __init__(self, documents: List[Dict[str, Any]], projection: Optional[Dict[str, Any]]):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: Optional[int] = None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        for field, field_direction in reversed(keys):
+            self._documents.sort(key=lambda doc: _sort_key(_get_field(doc, field)), reverse=field_direction < 0)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _results(self) -> List[Dict[str, Any]]:
+        documents = self._documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(doc, self._projection) for doc in documents]
+
+    def __iter__(self):
+        return iter(self._results())
+
+    def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._results()
+        return results if length is None else results[:length]
+
+class InMemoryCollection:
+    def __init__(self, database: "InMemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        # field -> value -> set of _ids, for single-field indexes
+        self._hash_indexes: Dict[str, Dict[Any, set]] = {}
+        self._unique_fields: set = set()
+        self._index_information: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+        self._lock = threading.RLock()
+
+    # --- Indexes ---
+
+    def create_index(self, keys, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        index_name = name or _index_name(keys)
+        with self._lock:
+            key_list = [(keys, 1)] if isinstance(keys, str) else list(keys)
+            self._index_information[index_name] = {"key": key_list, "unique": unique, **kwargs}
+            field = _index_key(keys)
+            if field is not None and field != "_id" and field not in self._hash_indexes:
+                index: Dict[Any, set] = {}
+                for doc_id, doc in self._documents.items():
+                    self._index_value(index, _get_field(doc, field), doc_id)
+                self._hash_indexes[field] = index
+            if field is not None and unique:
+                self._unique_fields.add(field)
+        return index_name
+
+    def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self._index_information)
+
+    @staticmethod
+    def _index_value(index: Dict[Any, set], value: Any, doc_id: Any):
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is _MISSING:
+                item = None
+            try:
+                index.setdefault(item, set()).add(doc_id)
+            except TypeError:
+                pass  # Unhashable values (e.g. embedded documents) are only found by scans
+
+    def _unindex(self, doc: Dict[str, Any]):
+        for field, index in self._hash_indexes.items():
+            value = _get_field(doc, field)
+            for item in (value if isinstance(value, list) else [value]):
+                try:
+                    ids = index.get(None if item is _MISSING else item)
+                except TypeError:
+                    continue
+                if ids is not None:
+                    ids.discard(doc["_id"])
+
+    def _reindex(self, doc: Dict[str, Any]):
+        for field, index in self._hash_indexes.items():
+            self._index_value(index, _get_field(doc, field), doc["_id"])
+
+    def _check_unique(self, doc: Dict[str, Any], ignore_id: Any = _MISSING):
+        if doc["_id"] in self._documents and doc["_id"] != ignore_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        for field in self._unique_fields:
+            value = _get_field(doc, field)
+            if value is _MISSING or field == "_id":
+                continue
+            existing = self._hash_indexes.get(field, {}).get(value, set()) - {ignore_id}
+            if existing:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}_1", 11000)
+
+    # --- Queries ---
+
+    def _candidate_ids(self, query: Dict[str, Any]) -> Iterable[Any]:
+        for field, condition in query.items():
+            if field.startswith("$"):
+                continue
+            values = None
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                values = condition["$in"]
+            elif not isinstance(condition, (dict, list)):
+                values = [condition]
+            if values is None:
+                continue
+            if field == "_id":
+                return [value for value in values if value in self._documents]
+            index = self._hash_indexes.get(field)
+            if index is not None:
+                ids: set = set()
+                for value in values:
+                    ids |= index.get(value, set())
+                return ids
+        return list(self._documents)
+
+    def _find_documents(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        query = query or {}
+        with self._lock:
+            documents = [self._documents[doc_id] for doc_id in self._candidate_ids(query) if doc_id in self._documents]
+            return [doc for doc in documents if _matches(doc, query)]
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> InMemoryCursor:
+        cursor = InMemoryCursor(self._find_documents(filter), projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        return cursor
+
+    def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        query = filter or {}
+        with self._lock:
+            for doc_id in self._candidate_ids(query):
+                doc = self._documents.get(doc_id)
+                if doc is not None and _matches(doc, query):
+                    return _project(doc, projection)
+        return None
+
+    def count_documents(self, filter: Dict[str, Any], **kwargs) -> int:
+        return len(self._find_documents(filter))
+
+    def estimated_document_count(self) -> int:
+        return len(self._documents)
+
+    # --- Writes ---
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = copy.deepcopy(document)
+        with self._lock:
+            self._check_unique(stored)
+            self._documents[stored["_id"]] = stored
+            self._reindex(stored)
+        return stored["_id"]
+
+    def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        inserted_ids, write_errors = [], []
+        for position, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+            except DuplicateKeyError as e:
+                write_errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids), "upserted": []})
+        return InsertManyResult(inserted_ids, True)
+
+    @staticmethod
+    def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+        for op, fields in update.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                for field, value in fields.items():
+                    doc[field] = copy.deepcopy(value)
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                for field in fields:
+                    doc.pop(field, None)
+            elif op == "$inc":
+                for field, amount in fields.items():
+                    doc[field] = doc.get(field, 0) + amount
+            elif op == "$push":
+                for field, value in fields.items():
+                    doc.setdefault(field, []).append(copy.deepcopy(value))
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the in-memory stand-in.")
+
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool, many: bool) -> Dict[str, Any]:
+        with self._lock:
+            matched = self._find_documents(filter)
+            if not many:
+                matched = matched[:1]
+            modified = 0
+            for doc in matched:
+                before = copy.deepcopy(doc)
+                self._unindex(doc)
+                self._apply_update(doc, update, inserting=False)
+                try:
+                    self._check_unique(doc, ignore_id=doc["_id"])
+                finally:
+                    self._reindex(doc)
+                modified += doc != before
+            raw = {"n": len(matched), "nModified": modified}
+            if not matched and upsert:
+                new_doc = {key: value for key, value in filter.items() if not key.startswith("$") and not isinstance(value, dict)}
+                self._apply_update(new_doc, update, inserting=True)
+                raw["upserted"] = self._insert(new_doc)
+                raw["n"] = 1
+            return raw
+
+    def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, many=False), True)
+
+    def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, many=True), True)
+
+    def delete_many(self, filter: Dict[str, Any]) -> DeleteResult:
+        with self._lock:
+            documents = self._find_documents(filter)
+            for doc in documents:
+                self._unindex(doc)
+                del self._documents[doc["_id"]]
+        return DeleteResult({"n": len(documents)}, True)
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [], "writeErrors": []}
+        for position, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, UpdateOne):
+                    raw = self._update(request._filter, request._doc, bool(request._upsert), many=False)
+                    if "upserted" in raw:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": position, "_id": raw["upserted"]})
+                    else:
+                        result["nMatched"] += raw["n"]
+                        result["nModified"] += raw["nModified"]
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by the in-memory stand-in.")
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": position, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+class InMemoryDatabase:
+    def __init__(self, name: str = "aif_benchmark_db"):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = InMemoryCollection(self, name)
+            return collection
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def command(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        if name == "collMod":
+            collection = self[args[0]]
+            index = kwargs.get("index", {})
+            info = collection._index_information.get(index.get("name"))
+            if info is not None:
+                info.update({key: value for key, value in index.items() if key != "name"})
+        return {"ok": 1}
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def drop_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+
+# --- Async facade (pymongo.AsyncMongoClient style) over the same storage ---
+#
+# Every operation suspends at least once, like a real driver awaiting the server,
+# so concurrent requests interleave (and queue) the way they would in production.
+# A non-zero latency adds a simulated round trip on top.
+
+class AsyncInMemoryCursor:
+    def __init__(self, cursor: InMemoryCursor, latency_seconds: float):
+        self._cursor = cursor
+        self._latency_seconds = latency_seconds
+        self._iterator = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count: int):
+        self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int):
+        self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await asyncio.sleep(self._latency_seconds)
+        return self._cursor.to_list(length)
+
+    def __aiter__(self):
+        self._iterator = None
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._iterator is None:
+            await asyncio.sleep(self._latency_seconds)
+            self._iterator = iter(self._cursor)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def _round_trip(method_name: str):
+    async def method(self, *args, **kwargs):
+        await asyncio.sleep(self._latency_seconds)
+        return getattr(self._collection, method_name)(*args, **kwargs)
+    method.__name__ = method_name
+    return method
+
+class AsyncInMemoryCollection:
+    def __init__(self, collection: InMemoryCollection, latency_seconds: float = 0.0):
+        self._collection = collection
+        self._latency_seconds = latency_seconds
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> AsyncInMemoryCursor:
+        return AsyncInMemoryCursor(self._collection.find(*args, **kwargs), self._latency_seconds)
+
+    find_one = _round_trip("find_one")
+    insert_one = _round_trip("insert_one")
+    insert_many = _round_trip("insert_many")
+    update_one = _round_trip("update_one")
+    update_many = _round_trip("update_many")
+    delete_many = _round_trip("delete_many")
+    bulk_write = _round_trip("bulk_write")
+    count_documents = _round_trip("count_documents")
+    estimated_document_count = _round_trip("estimated_document_count")
+    create_index = _round_trip("create_index")
+
+class AsyncInMemoryDatabase:
+    def __init__(self, database: InMemoryDatabase, latency_seconds: float = 0.0):
+        self._database = database
+        self._latency_seconds = latency_seconds
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncInMemoryCollection:
+        return AsyncInMemoryCollection(self._database[name], self._latency_seconds)
+
+    def __getattr__(self, name: str) -> AsyncInMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(self._latency_seconds)
+        return self._database.command(name, *args, **kwargs)
+
+class AsyncInMemoryClient:
+    """Just enough of AsyncMongoClient for the app's startup ping and shutdown."""
+
+    def __init__(self, database: AsyncInMemoryDatabase):
+        self.admin = database
+
+    async def close(self):
+        pass
+
+def install_inmemory_mongo(database: Optional[InMemoryDatabase] = None,
+                           latency_seconds: float = 0.0) -> Tuple[InMemoryDatabase, AsyncInMemoryDatabase]:
+    """
+    Points app.db.mongo_client's sync and async databases at one in-memory
+    database, so get_db()/get_async_db() (and the app's startup hooks) never
+    connect to a server. `latency_seconds` is added to every async operation
+    to stand in for the network round trip; sync calls are never delayed.
+    """
+    from app.db import mongo_client
+
+    database = database or InMemoryDatabase()
+    async_database = AsyncInMemoryDatabase(database, latency_seconds)
+    mongo_client._db = database
+    mongo_client._async_db = async_database
+    mongo_client._async_db_client = AsyncInMemoryClient(async_database)
+    return database, async_database
@@ -0,0 +1,372 @@
+# benchmarks/load_test.py
+"""
+In-process load generator for the IE and REG APIs.
+
+Drives the real `create_app()` application through httpx's ASGI transport
+(startup and shutdown hooks included) against the in-memory MongoDB stand-in,
+so it runs offline on a laptop. Each concurrency level runs a closed loop of
+N virtual clients, each sending the next request as soon as its previous one
+completes, with the endpoint drawn from a weighted mix.
+
+The stand-in suspends on every async database call, so concurrent requests
+interleave and queue as they would against a real server; --db-latency-ms adds
+a simulated round trip. Client and server share one event loop, which is what
+a single uvicorn worker looks like from the inside; client overhead is
+included in the latencies, so treat the numbers as per-worker capacity rather
+than end-to-end latency.
+
+    python -m benchmarks.load_test --mix sp-checks --concurrency 1,8,32,128
+    python -m benchmarks.load_test --mix "revocation-status=80,jwks=10,issue-atk=8,revoke-atk=2" -o load.json
+
+With several concurrency levels, the report's "capacity" entry names the
+highest throughput of --slo-endpoint whose p99 stayed within --slo-p99-ms:
+the point where one worker stops keeping up.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from statistics import fmean
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.common import percentile, run_metadata, set_log_level
+
+MIX_PRESETS: Dict[str, Dict[str, float]] = {
+    # Service providers checking presented ATKs: the traffic that dominates in production
+    "sp-checks": {"revocation-status": 1.0},
+    "mixed": {"revocation-status": 70, "jwks": 15, "issue-atk": 12, "revoke-atk": 3},
+    "issuance": {"issue-atk": 1.0},
+}
+
+ISSUE_ATK_PATH = "/api/v1/ie/issue-atk"
+REVOKE_ATK_PATH = "/reg/revoke-atk"
+REVOCATION_STATUS_PATH = "/reg/revocation-status"
+JWKS_PATH = "/.well-known/jwks.json"
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """A preset name, or comma-separated `endpoint=weight` pairs."""
+    if spec in MIX_PRESETS:
+        return dict(MIX_PRESETS[spec])
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'; expected one of {sorted(OPERATIONS)}.")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for '{name}': {weight!r}.")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("The traffic mix needs at least one endpoint with a positive weight.")
+    return mix
+
+def parse_levels(spec: str) -> List[int]:
+    try:
+        levels = [int(level) for level in spec.split(",") if level.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid concurrency list: {spec!r}.")
+    if not levels or any(level < 1 for level in levels):
+        raise argparse.ArgumentTypeError("Concurrency levels must be positive integers.")
+    return levels
+
+class LoadState:
+    """Agent Builders and the JTIs the traffic draws from, shared by all virtual clients."""
+
+    def __init__(self):
+        self.builder_headers: List[Dict[str, str]] = []
+        # Per builder: issued JTIs that have not been revoked yet (revoke-atk only revokes its own tokens)
+        self.revocable_jtis: List[List[str]] = []
+        # JTIs an SP might present: issued ones (mostly live) and a sample of revoked ones
+        self.presented_jtis: List[str] = []
+
+    def add_issued(self, builder_index: int, jti: str):
+        self.revocable_jtis[builder_index].append(jti)
+        self.presented_jtis.append(jti)
+
+class EndpointStats:
+    __slots__ = ("latencies", "statuses", "errors", "skipped")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.skipped = 0
+
+    def record(self, seconds: float, status_code: int):
+        self.latencies.append(seconds)
+        self.statuses[status_code] += 1
+        if status_code >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed_seconds: float) -> Dict[str, Any]:
+        latencies_ms = sorted(seconds * 1000 for seconds in self.latencies)
+        summary: Dict[str, Any] = {
+            "requests": len(latencies_ms),
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "status_codes": {str(code): count for code, count in sorted(self.statuses.items())},
+            "throughput_rps": round(len(latencies_ms) / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+        }
+        if latencies_ms:
+            summary.update({
+                "mean_ms": round(fmean(latencies_ms), 3),
+                "p50_ms": round(percentile(latencies_ms, 0.50), 3),
+                "p95_ms": round(percentile(latencies_ms, 0.95), 3),
+                "p99_ms": round(percentile(latencies_ms, 0.99), 3),
+                "max_ms": round(latencies_ms[-1], 3),
+            })
+        return summary
+
+# --- Endpoint drivers: each sends one request and returns its status code, or None if it had nothing to send ---
+
+def _decode_jti(atk: str) -> str:
+    import jwt
+    return jwt.decode(atk, options={"verify_signature": False})["jti"]
+
+async def issue_atk(client, state: LoadState, rng: random.Random) -> Optional[int]:
+    builder_index = rng.randrange(len(state.builder_headers))
+    response = await client.post(ISSUE_ATK_PATH, headers=state.builder_headers[builder_index], json={
+        "user_id": f"load-user-{rng.randrange(10_000)}",
+        "audience_sp_id": "https://sp.load.example/api",
+        "permissions": ["read:articles_all"],
+        "purpose": "Load test issuance",
+        "model_id": "gpt-4.1",
+    })
+    if response.status_code == 200:
+        state.add_issued(builder_index, _decode_jti(response.json()["atk"]))
+    return response.status_code
+
+async def revocation_status(client, state: LoadState, rng: random.Random) -> Optional[int]:
+    jti = rng.choice(state.presented_jtis) if state.presented_jtis else str(uuid.uuid4())
+    response = await client.get(REVOCATION_STATUS_PATH, params={"jti": jti})
+    return response.status_code
+
+async def revoke_atk(client, state: LoadState, rng: random.Random) -> Optional[int]:
+    builder_index = rng.randrange(len(state.builder_headers))
+    revocable = state.revocable_jtis[builder_index]
+    if not revocable:
+        return None
+    # Taken out before the await so two clients never revoke the same JTI
+    jti = revocable.pop(rng.randrange(len(revocable)))
+    response = await client.post(REVOKE_ATK_PATH, headers=state.builder_headers[builder_index], json={"jti": jti})
+    return response.status_code
+
+async def get_jwks(client, state: LoadState, rng: random.Random) -> Optional[int]:
+    response = await client.get(JWKS_PATH)
+    return response.status_code
+
+OPERATIONS: Dict[str, Callable[[Any, LoadState, random.Random], Awaitable[Optional[int]]]] = {
+    "issue-atk": issue_atk,
+    "revocation-status": revocation_status,
+    "revoke-atk": revoke_atk,
+    "jwks": get_jwks,
+}
+
+# --- Setup ---
+
+def seed_builders(database, count: int) -> List[Dict[str, str]]:
+    from bson import ObjectId
+    from app.auth.token_utils import generate_api_token
+
+    headers = []
+    for _ in range(count):
+        user_id = ObjectId()
+        api_token, expires_at = generate_api_token(str(user_id))
+        database["users"].insert_one({
+            "_id": user_id, "github_id": str(user_id), "registration_complete": True, "role": "agent_builder",
+            "organization_name": "Load Test Org", "api_token": api_token, "api_token_expires_at": expires_at,
+        })
+        headers.append({"Authorization": f"Bearer {api_token}"})
+    return headers
+
+def seed_revoked(database, count: int, rng: random.Random) -> List[str]:
+    """Background revocations so status checks run against a realistically sized revoked set."""
+    from bson import ObjectId
+    from app.db.revocation_store import _build_revocation_doc
+    from config.settings import REVOKED_TOKENS_COLLECTION_NAME
+
+    expires_ts = int(time.time()) + 3600
+    revoked_by = str(ObjectId())
+    jtis = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+    for start in range(0, count, 10_000):
+        database[REVOKED_TOKENS_COLLECTION_NAME].insert_many(
+            [_build_revocation_doc(jti, expires_ts, revoked_by) for jti in jtis[start:start + 10_000]])
+    return jtis
+
+async def prepare_state(client, database, args, rng: random.Random) -> LoadState:
+    # Indexes were created by create_app() against the in-memory database
+    state = LoadState()
+    state.builder_headers = seed_builders(database, args.builders)
+    state.revocable_jtis = [[] for _ in state.builder_headers]
+
+    # Pre-issued through the API so issued_tokens matches real traffic
+    for _ in range(args.preissue):
+        status_code = await issue_atk(client, state, rng)
+        if status_code != 200:
+            raise RuntimeError(f"Pre-issuing ATKs failed with HTTP {status_code}.")
+
+    revoked = seed_revoked(database, args.revoked, rng)
+    # Roughly one presented token in twenty is revoked
+    state.presented_jtis.extend(rng.sample(revoked, min(len(revoked), max(1, len(state.presented_jtis) // 20))))
+    return state
+
+# --- Load loop ---
+
+async def run_level(client, state: LoadState, mix: Dict[str, float], concurrency: int, duration: float,
+                    warmup: float, seed: int) -> Dict[str, Any]:
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    stats = {name: EndpointStats() for name in names}
+    loop_started = time.perf_counter()
+    measure_from = loop_started + warmup
+    deadline = measure_from + duration
+
+    async def virtual_client(client_index: int):
+        rng = random.Random(seed * 100_003 + concurrency * 1_009 + client_index)
+        clock = time.perf_counter
+        while True:
+            name = rng.choices(names, weights)[0]
+            started = clock()
+            if started >= deadline:
+                return
+            status_code = await OPERATIONS[name](client, state, rng)
+            finished = clock()
+            if started < measure_from or finished > deadline:
+                continue
+            if status_code is None:
+                stats[name].skipped += 1
+            else:
+                stats[name].record(finished - started, status_code)
+
+    await asyncio.gather(*(virtual_client(index) for index in range(concurrency)))
+
+    endpoints = {name: endpoint_stats.summary(duration) for name, endpoint_stats in stats.items()}
+    all_latencies = EndpointStats()
+    for endpoint_stats in stats.values():
+        all_latencies.latencies.extend(endpoint_stats.latencies)
+        all_latencies.statuses.update(endpoint_stats.statuses)
+        all_latencies.errors += endpoint_stats.errors
+        all_latencies.skipped += endpoint_stats.skipped
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": duration,
+        "total": all_latencies.summary(duration),
+        "endpoints": endpoints,
+    }
+
+def find_capacity(levels: List[Dict[str, Any]], endpoint: str, p99_budget_ms: float) -> Dict[str, Any]:
+    """Highest throughput of `endpoint` among levels whose p99 stayed within budget and error-free."""
+    best: Optional[Dict[str, Any]] = None
+    for level in levels:
+        summary = level["endpoints"].get(endpoint)
+        if not summary or not summary["requests"] or summary["errors"]:
+            continue
+        if summary["p99_ms"] <= p99_budget_ms and (best is None or summary["throughput_rps"] > best["throughput_rps"]):
+            best = {"concurrency": level["concurrency"], "throughput_rps": summary["throughput_rps"],
+                    "p99_ms": summary["p99_ms"]}
+    return {"endpoint": endpoint, "p99_budget_ms": p99_budget_ms, "within_budget": best}
+
+def _print_level(level: Dict[str, Any]):
+    print(f"\n  concurrency={level['concurrency']}  total={level['total']['throughput_rps']:,.0f} req/s  "
+          f"errors={level['total']['errors']}", file=sys.stderr)
+    for name, summary in level["endpoints"].items():
+        if not summary["requests"]:
+            print(f"    {name:<18} no completed requests (skipped={summary['skipped']})", file=sys.stderr)
+            continue
+        print(f"    {name:<18} {summary['throughput_rps']:>9,.0f} req/s  p50={summary['p50_ms']:>8.2f}ms  "
+              f"p95={summary['p95_ms']:>8.2f}ms  p99={summary['p99_ms']:>8.2f}ms  errors={summary['errors']}",
+              file=sys.stderr)
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    from benchmarks.inmemory_mongo import install_inmemory_mongo
+
+    database, _ = install_inmemory_mongo(latency_seconds=args.db_latency_ms / 1000)
+
+    from app import create_app
+    app = create_app()
+    rng = random.Random(args.seed)
+    levels: List[Dict[str, Any]] = []
+
+    async with app.router.lifespan_context(app):
+        # App exceptions come back as 500 responses and count as errors instead of aborting the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            state = await prepare_state(client, database, args, rng)
+            print(f"🌱 Seeded {args.builders} builders, {args.preissue} issued and {args.revoked} revoked ATKs",
+                  file=sys.stderr)
+            for concurrency in args.concurrency:
+                level = await run_level(client, state, args.mix, concurrency, args.duration, args.warmup, args.seed)
+                _print_level(level)
+                levels.append(level)
+
+    report: Dict[str, Any] = {
+        "meta": run_metadata(
+            mix=args.mix,
+            concurrency_levels=args.concurrency,
+            duration_seconds=args.duration,
+            warmup_seconds=args.warmup,
+            builders=args.builders,
+            preissued=args.preissue,
+            revoked=args.revoked,
+            db_latency_ms=args.db_latency_ms,
+            seed=args.seed,
+            log_level=args.log_level,
+        ),
+        "levels": levels,
+    }
+    if args.slo_endpoint in args.mix:
+        report["capacity"] = find_capacity(levels, args.slo_endpoint, args.slo_p99_ms)
+        within_budget = report["capacity"]["within_budget"]
+        print(f"\n📈 {args.slo_endpoint} within p99 <= {args.slo_p99_ms}ms: "
+              + (f"{within_budget['throughput_rps']:,.0f} req/s at concurrency {within_budget['concurrency']}"
+                 if within_budget else "no level met the budget"), file=sys.stderr)
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Drive the in-process app with a weighted traffic mix and report latency per endpoint.")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("mixed"),
+                        help=f"Preset ({', '.join(MIX_PRESETS)}) or 'endpoint=weight,...' over {', '.join(OPERATIONS)}. Default: mixed.")
+    parser.add_argument("--concurrency", type=parse_levels, default=parse_levels("1,8,32,128"),
+                        help="Comma-separated virtual client counts, run in order (default 1,8,32,128).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per concurrency level.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level.")
+    parser.add_argument("--builders", type=int, default=10, help="Agent Builder accounts sending issue/revoke traffic.")
+    parser.add_argument("--preissue", type=int, default=500, help="ATKs issued before the run for status checks and revocations.")
+    parser.add_argument("--revoked", type=int, default=10_000, help="Background revoked JTIs seeded into revoked_atks.")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0,
+                        help="Simulated MongoDB round trip added to every async database call (e.g. 0.5 for a LAN).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the traffic and data (same seed, same request sequence per client).")
+    parser.add_argument("--slo-endpoint", default="revocation-status", choices=sorted(OPERATIONS),
+                        help="Endpoint whose sustainable throughput is reported.")
+    parser.add_argument("--slo-p99-ms", type=float, default=25.0, help="p99 budget for the capacity estimate.")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="Application log level; the default keeps per-request INFO logging out of the measurement.")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+    if args.builders < 1:
+        parser.error("--builders must be at least 1.")
+
+    set_log_level(args.log_level)
+
+    # The settings module prints configuration warnings, which would corrupt JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"📊 Wrote load test report to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline micro-benchmarks for the issuance and registry hot paths.
+
+Runs against the in-memory MongoDB stand-in (benchmarks/inmemory_mongo.py) and
+a throwaway Ed25519 keyring, so no server or deployed keys are needed. Results
+are written as JSON (stdout by default); progress goes to stderr.
+
+    python -m benchmarks.run_benchmarks                     # full run, JSON on stdout
+    python -m benchmarks.run_benchmarks --quick -o out.json # fewer iterations and sizes
+    python -m benchmarks.run_benchmarks --only revocation   # name substring filter
+
+Benchmarks:
+  - create_atk                         full issuance (claims + signature), sync
+  - sign.jwt_encode / sign.atk_signer  PyJWT encode from the PEM vs. the pre-parsed ATKSigner on the same claims
+  - revocation.is_jti_revoked[_async]  lookup latency per revoked-set size, hit and miss,
+                                       plus the async miss path with the revocation filter
+  - auth.validate_api_token            cold (cache cleared each call) vs. cached
+  - jwks.get_jwks_endpoint             full 200 response vs. 304 revalidation
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from statistics import fmean
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.common import percentile, run_metadata, set_log_level
+
+FULL_REVOKED_SET_SIZES = [0, 1_000, 10_000, 100_000]
+QUICK_REVOKED_SET_SIZES = [0, 1_000, 10_000]
+
+def _summarize(name: str, samples_ns: List[int], params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    samples_us = sorted(sample / 1000 for sample in samples_ns)
+    total_seconds = sum(samples_ns) / 1e9
+    return {
+        "name": name,
+        "params": params or {},
+        "iterations": len(samples_us),
+        "ops_per_sec": round(len(samples_us) / total_seconds, 1) if total_seconds else None,
+        "mean_us": round(fmean(samples_us), 3),
+        "min_us": round(samples_us[0], 3),
+        "p50_us": round(percentile(samples_us, 0.50), 3),
+        "p95_us": round(percentile(samples_us, 0.95), 3),
+        "p99_us": round(percentile(samples_us, 0.99), 3),
+        "max_us": round(samples_us[-1], 3),
+    }
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int) -> List[int]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(iterations):
+        started = clock()
+        fn()
+        samples.append(clock() - started)
+    return samples
+
+async def measure_async(fn: Callable[[], Awaitable[Any]], iterations: int, warmup: int) -> List[int]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(iterations):
+        started = clock()
+        await fn()
+        samples.append(clock() - started)
+    return samples
+
+class BenchmarkRunner:
+    def __init__(self, iterations: int, warmup: int, revoked_set_sizes: List[int], only: List[str]):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.revoked_set_sizes = revoked_set_sizes
+        self.only = only
+        self.results: List[Dict[str, Any]] = []
+
+    def wanted(self, *names: str) -> bool:
+        return not self.only or any(pattern in name for pattern in self.only for name in names)
+
+    def record(self, name: str, samples_ns: List[int], **params):
+        result = _summarize(name, samples_ns, params)
+        self.results.append(result)
+        print(f"  {name:<42} {_format_params(params):<22} p50={result['p50_us']:>10.2f}us  "
+              f"p99={result['p99_us']:>10.2f}us  {result['ops_per_sec']:>12,.0f} ops/s", file=sys.stderr)
+
+    def run_sync(self, name: str, fn: Callable[[], Any], iterations: Optional[int] = None, **params):
+        if self.wanted(name):
+            self.record(name, measure(fn, iterations or self.iterations, self.warmup), **params)
+
+    async def run_async(self, name: str, fn: Callable[[], Awaitable[Any]], iterations: Optional[int] = None, **params):
+        if self.wanted(name):
+            self.record(name, await measure_async(fn, iterations or self.iterations, self.warmup), **params)
+
+def _format_params(params: Dict[str, Any]) -> str:
+    return " ".join(f"{key}={value}" for key, value in params.items())
+
+# --- Benchmarks ---
+
+def bench_issuance(runner: BenchmarkRunner):
+    import jwt
+    from app.core.key_manager import get_keyring
+    from app.core.signer import get_atk_signer
+    from app.core.token_issuer import create_atk
+    from config.settings import ALGORITHM, STANDARD_PERMISSIONS_LIST, SUPPORTED_AI_MODELS
+
+    user_id = str(uuid.uuid4())
+    permissions = STANDARD_PERMISSIONS_LIST[:3]
+    model_id = SUPPORTED_AI_MODELS[0]
+
+    # Issuance is CPU-bound; fewer iterations keep the full run short without hurting the percentiles much
+    runner.run_sync(
+        "create_atk",
+        lambda: create_atk(user_id=user_id, audience_sp_id="sp-benchmark", permissions=permissions,
+                           purpose="benchmark", model_id=model_id),
+        iterations=max(1, runner.iterations // 2),
+        permissions=len(permissions),
+    )
+
+    result = create_atk(user_id=user_id, audience_sp_id="sp-benchmark", permissions=permissions,
+                        purpose="benchmark", model_id=model_id)
+    claims = jwt.decode(result.atk, options={"verify_signature": False})
+    active_key = get_keyring().active
+    headers = {"kid": active_key.kid, "typ": "JWT"}
+    signer = get_atk_signer()
+    # The pre-ATKSigner path handed PyJWT the PEM, which it re-parses on every encode
+    private_key_pem = active_key.private_key_pem.encode()
+
+    runner.run_sync("sign.jwt_encode",
+                    lambda: jwt.encode(claims, private_key_pem, algorithm=ALGORITHM, headers=headers))
+    runner.run_sync("sign.atk_signer", lambda: signer.sign(claims))
+
+async def bench_revocation(runner: BenchmarkRunner, database):
+    from bson import ObjectId
+    from app.db import revocation_filter as revocation_filter_module
+    from app.db.mongo_client import ensure_revocation_indexes
+    from app.db.revocation_filter import RevocationFilter
+    from app.db.revocation_store import _build_revocation_doc, is_jti_revoked, is_jti_revoked_async
+    from config.settings import REVOKED_TOKENS_COLLECTION_NAME, REVOCATION_FILTER_FALSE_POSITIVE_RATE
+
+    if not runner.wanted("revocation.is_jti_revoked", "revocation.is_jti_revoked_async.filter"):
+        return
+
+    ensure_revocation_indexes(database)
+    collection = database[REVOKED_TOKENS_COLLECTION_NAME]
+    expires_ts = int(time.time()) + 3600
+    revoked_by = str(ObjectId())
+    revoked_jtis: List[str] = []
+    missing_jti = str(uuid.uuid4())
+
+    for size in runner.revoked_set_sizes:
+        new_jtis = [str(uuid.uuid4()) for _ in range(size - len(revoked_jtis))]
+        if new_jtis:
+            collection.insert_many([_build_revocation_doc(jti, expires_ts, revoked_by) for jti in new_jtis])
+            revoked_jtis.extend(new_jtis)
+        revoked_jti = revoked_jtis[len(revoked_jtis) // 2] if revoked_jtis else None
+
+        runner.run_sync("revocation.is_jti_revoked", lambda: is_jti_revoked(missing_jti),
+                        revoked=size, outcome="miss")
+        await runner.run_async("revocation.is_jti_revoked_async", lambda: is_jti_revoked_async(missing_jti),
+                               revoked=size, outcome="miss")
+        if revoked_jti is not None:
+            runner.run_sync("revocation.is_jti_revoked", lambda: is_jti_revoked(revoked_jti),
+                            revoked=size, outcome="hit")
+            await runner.run_async("revocation.is_jti_revoked_async", lambda: is_jti_revoked_async(revoked_jti),
+                                   revoked=size, outcome="hit")
+
+        if runner.wanted("revocation.is_jti_revoked_async.filter"):
+            bloom = RevocationFilter(REVOCATION_FILTER_FALSE_POSITIVE_RATE, max(1, size))
+            await bloom.rebuild()
+            previous_filter = revocation_filter_module._revocation_filter
+            revocation_filter_module._revocation_filter = bloom
+            try:
+                await runner.run_async("revocation.is_jti_revoked_async.filter", lambda: is_jti_revoked_async(missing_jti),
+                                       revoked=size, outcome="miss")
+            finally:
+                revocation_filter_module._revocation_filter = previous_filter
+
+async def bench_auth(runner: BenchmarkRunner, database):
+    from bson import ObjectId
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.auth.api_token_cache import get_api_token_cache
+    from app.auth.middleware import validate_api_token
+    from app.auth.token_utils import generate_api_token
+
+    if not runner.wanted("auth.validate_api_token"):
+        return
+
+    user_id = ObjectId()
+    api_token, expires_at = generate_api_token(str(user_id))
+    database["users"].insert_one({
+        "_id": user_id, "github_id": str(user_id), "registration_complete": True, "role": "agent_builder",
+        "api_token": api_token, "api_token_expires_at": expires_at,
+    })
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=api_token)
+    if await validate_api_token(credentials) is None:
+        raise RuntimeError("validate_api_token rejected the benchmark user's token.")
+
+    api_token_cache = get_api_token_cache()
+
+    async def validate_cold():
+        if api_token_cache is not None:
+            api_token_cache.clear()
+        return await validate_api_token(credentials)
+
+    await runner.run_async("auth.validate_api_token", validate_cold, cache="cold")
+    if api_token_cache is not None:
+        await runner.run_async("auth.validate_api_token", lambda: validate_api_token(credentials), cache="warm")
+
+async def bench_jwks(runner: BenchmarkRunner):
+    from starlette.requests import Request
+    from app.core.key_manager import get_jwks_document
+    from app.reg_routes import get_jwks_endpoint
+
+    if not runner.wanted("jwks.get_jwks_endpoint"):
+        return
+
+    _, etag = get_jwks_document()
+
+    def make_request(headers: Dict[str, str]) -> Request:
+        return Request({
+            "type": "http", "method": "GET", "path": "/reg/jwks.json", "query_string": b"",
+            "headers": [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+        })
+
+    full_request = make_request({})
+    revalidation_request = make_request({"If-None-Match": etag})
+
+    async def serve_full():
+        response = await get_jwks_endpoint(full_request)
+        return response.body
+
+    await runner.run_async("jwks.get_jwks_endpoint", serve_full, response="200")
+    await runner.run_async("jwks.get_jwks_endpoint", lambda: get_jwks_endpoint(revalidation_request), response="304")
+
+async def run(args) -> Dict[str, Any]:
+    from benchmarks.inmemory_mongo import install_inmemory_mongo
+
+    database, _ = install_inmemory_mongo()
+
+    from app.core.key_manager import load_keys
+    load_keys()
+
+    runner = BenchmarkRunner(
+        iterations=args.iterations or (500 if args.quick else 5000),
+        warmup=args.warmup,
+        revoked_set_sizes=QUICK_REVOKED_SET_SIZES if args.quick else FULL_REVOKED_SET_SIZES,
+        only=args.only,
+    )
+    started = time.perf_counter()
+    bench_issuance(runner)
+    await bench_revocation(runner, database)
+    await bench_auth(runner, database)
+    await bench_jwks(runner)
+
+    return {
+        "meta": run_metadata(
+            iterations=runner.iterations,
+            warmup=runner.warmup,
+            quick=args.quick,
+            log_level=args.log_level,
+            duration_seconds=round(time.perf_counter() - started, 3),
+        ),
+        "results": runner.results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline micro-benchmarks and emit JSON results.")
+    parser.add_argument("-o", "--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and smaller revoked sets (smoke run).")
+    parser.add_argument("--iterations", type=int, help="Timed iterations per benchmark (default 5000, 500 with --quick).")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed iterations before each benchmark.")
+    parser.add_argument("--only", action="append", default=[], metavar="SUBSTRING",
+                        help="Run only benchmarks whose name contains SUBSTRING (repeatable).")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="Log level during the run; the default keeps per-call INFO logging out of the timings.")
+    args = parser.parse_args(argv)
+
+    set_log_level(args.log_level)
+
+    # The settings module prints configuration warnings, which would corrupt JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from app.utils.logging_config import configure_logging, stop_logging
+        configure_logging(level=args.log_level)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            stop_logging()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"📊 Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
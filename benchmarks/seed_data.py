@@ -0,0 +1,302 @@
+# benchmarks/seed_data.py
+"""
+Seeds users, issued_tokens and revoked_atks with synthetic, production-shaped data.
+
+Agent Builders get heavy-tailed issuance volumes: Pareto weights, so a few
+builders issue most tokens. Issue times are spread over a history window, and
+token lifetimes are log-uniform between a min and a max. A configurable
+fraction of tokens is revoked at a random point in its lifetime. Documents
+match what the service writes, and revocations reuse its revoked_atks
+builder. Everything except the builders' API tokens is derived from --seed and
+--reference-time, so two runs with the same arguments produce the same data.
+
+    # Into the database configured by AIF_DATABASE_URL / AIF_DATABASE_NAME
+    python -m benchmarks.seed_data --builders 2000 --tokens 5000000 --revoked-ratio 0.05 --drop
+    # Generator throughput only, into the in-memory stand-in
+    python -m benchmarks.seed_data --inmemory --tokens 200000
+
+Note that revoked_atks entries whose token expired more than the retention
+grace ago are removed by the TTL index shortly after seeding. Use a history
+window shorter than the grace period to keep all of them.
+"""
+import argparse
+import bisect
+import contextlib
+import json
+import logging
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.common import run_metadata
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SeedConfig:
+    builders: int = 100
+    tokens: int = 100_000
+    revoked_ratio: float = 0.05
+    # Pareto shape of per-builder issuance volume; ~1.16 gives the 80/20 split
+    pareto_alpha: float = 1.16
+    history_days: float = 30.0
+    min_lifetime_minutes: float = 15.0
+    max_lifetime_minutes: float = 7 * 24 * 60
+    # Entries kept in the legacy users.tokens_issued array per builder (0: field not written)
+    legacy_tokens_issued: int = 0
+    batch_size: int = 5000
+    seed: int = 42
+    reference_time: Optional[datetime] = None
+
+class SeedRandom(random.Random):
+    """random.Random with the id and UUID helpers the seeder needs, all derived from the seed."""
+
+    def object_id(self, generated_at: datetime):
+        """An ObjectId carrying `generated_at` as its timestamp, as if the driver had created it then."""
+        from bson import ObjectId
+        return ObjectId(int(generated_at.timestamp()).to_bytes(4, "big") + self.getrandbits(64).to_bytes(8, "big"))
+
+    def uuid4(self) -> str:
+        return str(uuid.UUID(int=self.getrandbits(128), version=4))
+
+    def log_uniform(self, low: float, high: float) -> float:
+        return math.exp(self.uniform(math.log(low), math.log(high)))
+
+def _builder_documents(config: SeedConfig, rng: SeedRandom, now: datetime) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """Builder user documents and their cumulative issuance weights."""
+    from app.auth.token_utils import generate_api_token
+
+    documents, cumulative_weights, total = [], [], 0.0
+    for index in range(config.builders):
+        created_at = (now - timedelta(days=config.history_days + rng.uniform(0, 365))).replace(microsecond=0)
+        user_id = rng.object_id(created_at)
+        api_token, api_token_expires_at = generate_api_token(str(user_id))
+        documents.append({
+            "_id": user_id,
+            "github_id": str(10_000_000 + index),
+            "github_username": f"seed-builder-{index}",
+            "name": f"Seed Builder {index}",
+            "email": f"builder{index}@seed.example.com",
+            "organization_name": f"Seed Org {index % max(1, config.builders // 5)}",
+            "role": "agent_builder",
+            "api_token": api_token,
+            "api_token_generated_at": now,
+            "api_token_expires_at": api_token_expires_at,
+            "registration_complete": True,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        total += rng.paretovariate(config.pareto_alpha)
+        cumulative_weights.append(total)
+    return documents, cumulative_weights
+
+def _token_batches(config: SeedConfig, rng: SeedRandom, now: datetime, builder_ids: List[Any],
+                   cumulative_weights: List[float]) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Yields (issued_tokens batch, revoked_atks batch) pairs of at most batch_size tokens."""
+    from app.db.revocation_store import _build_revocation_doc
+    from config.settings import CORE_AIF_SERVICE_ISSUER_ID, STANDARD_PERMISSIONS_LIST, SUPPORTED_AI_MODELS
+
+    history_seconds = config.history_days * 86400
+    total_weight = cumulative_weights[-1]
+    audiences = [f"https://sp{index}.seed.example.com/api" for index in range(50)]
+
+    remaining = config.tokens
+    while remaining > 0:
+        count = min(config.batch_size, remaining)
+        remaining -= count
+        issued_batch, revoked_batch = [], []
+        for _ in range(count):
+            builder_id = builder_ids[bisect.bisect_left(cumulative_weights, rng.random() * total_weight)]
+            issued_at = (now - timedelta(seconds=rng.uniform(0, history_seconds))).replace(microsecond=0)
+            expires_at = issued_at + timedelta(minutes=round(rng.log_uniform(config.min_lifetime_minutes, config.max_lifetime_minutes)))
+            jti = rng.uuid4()
+            model_id = rng.choice(SUPPORTED_AI_MODELS)
+            user_id = f"seed-user-{rng.randrange(1_000_000)}"
+            record = {
+                "_id": rng.object_id(issued_at),
+                "aid": f"{CORE_AIF_SERVICE_ISSUER_ID}/{model_id}/{user_id}/{rng.uuid4()}",
+                "jti": jti,
+                "user_id": user_id,
+                "issued_at": issued_at,
+                "expires_at": expires_at,
+                "audience": rng.choice(audiences),
+                "purpose": "Synthetic seed data",
+                "status": "active",
+                "permissions": rng.sample(STANDARD_PERMISSIONS_LIST, rng.randint(1, 3)),
+                "model_id": model_id,
+                "agent_builder_id": builder_id,
+            }
+            if rng.random() < config.revoked_ratio:
+                record["status"] = "revoked"
+                revocation = _build_revocation_doc(jti, int(expires_at.timestamp()), str(builder_id))
+                revoked_at = issued_at + (min(expires_at, now) - issued_at) * rng.random()
+                revocation["_id"] = rng.object_id(revoked_at)
+                revocation["revoked_at"] = revoked_at
+                revoked_batch.append(revocation)
+            issued_batch.append(record)
+        yield issued_batch, revoked_batch
+
+def seed_database(db, config: SeedConfig) -> Dict[str, Any]:
+    """
+    Writes the synthetic data set into `db` with unordered bulk inserts and
+    creates the service's indexes afterwards (faster than maintaining them
+    during the load). Returns counts and timings.
+    """
+    from app.db.mongo_client import ensure_db_indexes, ensure_revocation_indexes
+    from config.settings import ISSUED_TOKENS_COLLECTION_NAME, REVOKED_TOKENS_COLLECTION_NAME, USERS_COLLECTION_NAME
+
+    rng = SeedRandom(config.seed)
+    now = (config.reference_time or datetime.now(timezone.utc)).replace(microsecond=0)
+    started = time.perf_counter()
+
+    builders, cumulative_weights = _builder_documents(config, rng, now)
+    builder_ids = [builder["_id"] for builder in builders]
+    for start in range(0, len(builders), config.batch_size):
+        db[USERS_COLLECTION_NAME].insert_many(builders[start:start + config.batch_size], ordered=False)
+    logger.info("🌱 Inserted %d builders", len(builders))
+
+    issued_collection = db[ISSUED_TOKENS_COLLECTION_NAME]
+    revoked_collection = db[REVOKED_TOKENS_COLLECTION_NAME]
+    issued_total = revoked_total = revoked_unexpired = 0
+    tokens_per_builder: Dict[Any, int] = dict.fromkeys(builder_ids, 0)
+    # Most recent records per builder for the legacy embedded array
+    legacy_records: Dict[Any, List[Dict[str, Any]]] = {builder_id: [] for builder_id in builder_ids}
+
+    for issued_batch, revoked_batch in _token_batches(config, rng, now, builder_ids, cumulative_weights):
+        issued_collection.insert_many(issued_batch, ordered=False)
+        if revoked_batch:
+            revoked_collection.insert_many(revoked_batch, ordered=False)
+        issued_total += len(issued_batch)
+        revoked_total += len(revoked_batch)
+        revoked_unexpired += sum(1 for revocation in revoked_batch if revocation["original_exp_at"] > now)
+        for record in issued_batch:
+            tokens_per_builder[record["agent_builder_id"]] += 1
+            if config.legacy_tokens_issued:
+                history = legacy_records[record["agent_builder_id"]]
+                history.append(record)
+                if len(history) > 2 * config.legacy_tokens_issued:
+                    history.sort(key=lambda item: item["issued_at"])
+                    del history[:-config.legacy_tokens_issued]
+        elapsed = time.perf_counter() - started
+        logger.info("🌱 %d/%d tokens (%d revoked), %.0f tokens/s", issued_total, config.tokens, revoked_total,
+                    issued_total / elapsed if elapsed else 0)
+
+    if config.legacy_tokens_issued:
+        from pymongo import UpdateOne
+        operations = []
+        for builder_id, history in legacy_records.items():
+            history.sort(key=lambda item: item["issued_at"])
+            entries = [{key: value for key, value in record.items() if key != "_id"}
+                       for record in history[-config.legacy_tokens_issued:]]
+            operations.append(UpdateOne({"_id": builder_id}, {"$set": {"tokens_issued": entries}}))
+        for start in range(0, len(operations), config.batch_size):
+            db[USERS_COLLECTION_NAME].bulk_write(operations[start:start + config.batch_size], ordered=False)
+        logger.info("🌱 Wrote legacy tokens_issued arrays (up to %d entries per builder)", config.legacy_tokens_issued)
+
+    insert_seconds = time.perf_counter() - started
+    ensure_db_indexes(db)
+    ensure_revocation_indexes(db)
+    index_seconds = time.perf_counter() - started - insert_seconds
+
+    volumes = sorted(tokens_per_builder.values(), reverse=True)
+    top_decile = volumes[:max(1, len(volumes) // 10)]
+    return {
+        "users": len(builders),
+        "issued_tokens": issued_total,
+        "revoked_atks": revoked_total,
+        # The rest expired before the reference time and are left to the TTL index
+        "revoked_atks_unexpired": revoked_unexpired,
+        "tokens_per_builder": {
+            "max": volumes[0] if volumes else 0,
+            "median": volumes[len(volumes) // 2] if volumes else 0,
+            "top_10_percent_share": round(sum(top_decile) / issued_total, 3) if issued_total else 0.0,
+        },
+        "reference_time": now.isoformat(),
+        "insert_seconds": round(insert_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "tokens_per_second": round(issued_total / insert_seconds, 1) if insert_seconds else None,
+    }
+
+def _existing_documents(db) -> Dict[str, int]:
+    from config.settings import ISSUED_TOKENS_COLLECTION_NAME, REVOKED_TOKENS_COLLECTION_NAME, USERS_COLLECTION_NAME
+
+    counts = {name: db[name].estimated_document_count()
+              for name in (USERS_COLLECTION_NAME, ISSUED_TOKENS_COLLECTION_NAME, REVOKED_TOKENS_COLLECTION_NAME)}
+    return {name: count for name, count in counts.items() if count}
+
+def _parse_reference_time(value: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid ISO 8601 time: {value!r}.")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(description="Seed users, issued_tokens and revoked_atks with reproducible synthetic data.")
+    parser.add_argument("--builders", type=int, default=defaults.builders, help="Agent Builder user documents.")
+    parser.add_argument("--tokens", type=int, default=defaults.tokens, help="issued_tokens documents in total.")
+    parser.add_argument("--revoked-ratio", type=float, default=defaults.revoked_ratio, help="Fraction of issued tokens that are revoked.")
+    parser.add_argument("--pareto-alpha", type=float, default=defaults.pareto_alpha,
+                        help="Shape of per-builder issuance volume; lower is more skewed.")
+    parser.add_argument("--history-days", type=float, default=defaults.history_days, help="Issue times are spread over this many days.")
+    parser.add_argument("--min-lifetime-minutes", type=float, default=defaults.min_lifetime_minutes, help="Shortest token lifetime.")
+    parser.add_argument("--max-lifetime-minutes", type=float, default=defaults.max_lifetime_minutes, help="Longest token lifetime (log-uniform in between).")
+    parser.add_argument("--legacy-tokens-issued", type=int, default=defaults.legacy_tokens_issued,
+                        help="Also embed up to N recent token records in users.tokens_issued, as older deployments did.")
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size, help="Documents per insert_many call.")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Random seed; same seed and reference time, same data.")
+    parser.add_argument("--reference-time", type=_parse_reference_time,
+                        help="ISO 8601 'now' the data is generated relative to (default: current time).")
+    parser.add_argument("--inmemory", action="store_true", help="Seed the in-memory stand-in instead of MongoDB (measures the generator).")
+    parser.add_argument("--drop", action="store_true", help="Drop users, issued_tokens and revoked_atks first if they contain data.")
+    args = parser.parse_args(argv)
+
+    if args.builders < 1 or args.tokens < 0 or args.batch_size < 1:
+        parser.error("--builders and --batch-size must be at least 1 and --tokens must not be negative.")
+    if not 0 <= args.revoked_ratio <= 1:
+        parser.error("--revoked-ratio must be between 0 and 1.")
+    if not 0 < args.min_lifetime_minutes <= args.max_lifetime_minutes:
+        parser.error("--min-lifetime-minutes must be positive and not above --max-lifetime-minutes.")
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
+    config = SeedConfig(
+        builders=args.builders, tokens=args.tokens, revoked_ratio=args.revoked_ratio, pareto_alpha=args.pareto_alpha,
+        history_days=args.history_days, min_lifetime_minutes=args.min_lifetime_minutes,
+        max_lifetime_minutes=args.max_lifetime_minutes, legacy_tokens_issued=max(0, args.legacy_tokens_issued),
+        batch_size=args.batch_size, seed=args.seed, reference_time=args.reference_time,
+    )
+
+    # The settings module prints configuration warnings; stdout is reserved for the JSON summary
+    with contextlib.redirect_stdout(sys.stderr):
+        from app.db.mongo_client import get_db, close_db_connection
+        if args.inmemory:
+            from benchmarks.inmemory_mongo import install_inmemory_mongo
+            install_inmemory_mongo()
+
+        db = get_db()
+        existing = _existing_documents(db)
+        if existing and not args.drop:
+            logger.error("❌ Database '%s' already has data %s; pass --drop to replace it.", db.name, existing)
+            close_db_connection()
+            return 1
+        try:
+            for name in existing:
+                db.drop_collection(name)
+                logger.info("🗑️ Dropped %s", name)
+            summary = seed_database(db, config)
+        finally:
+            close_db_connection()
+
+    config_summary = {key: (value.isoformat() if isinstance(value, datetime) else value) for key, value in asdict(config).items()}
+    print(json.dumps({"meta": run_metadata(database=db.name, inmemory=args.inmemory, config=config_summary),
+                      "summary": summary}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
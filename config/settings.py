@@ -12,20 +12,92 @@ AIF_PORT: int = int(os.getenv('AIF_PORT', '5000'))
 UVICORN_RELOAD_MODE: bool = os.getenv('UVICORN_RELOAD', "true").lower() == 'true'
 APP_DEBUG_MODE: bool = os.getenv('APP_DEBUG_MODE', "true").lower() == 'true'
 
+# --- Metrics Configuration ---
+# Request/DB latency histograms and cache stats, served in Prometheus text format at GET /metrics.
+# Off by default: the endpoint reveals routes, traffic and internals to whoever can reach it.
+METRICS_ENABLED: bool = os.getenv("AIF_METRICS_ENABLED", "false").lower() == 'true'
+# If set, GET /metrics requires "Authorization: Bearer <token>" (configure the scraper with it)
+METRICS_BEARER_TOKEN: Optional[str] = os.getenv("AIF_METRICS_BEARER_TOKEN") or None
+
+# --- Request Timing Configuration ---
+# Per-request phase breakdown (auth, signing, DB operations...) as a Server-Timing response header
+SERVER_TIMING_ENABLED: bool = os.getenv("AIF_SERVER_TIMING_ENABLED", "false").lower() == 'true'
+# Requests slower than this are logged with their phase breakdown (0 disables)
+SLOW_REQUEST_THRESHOLD_MS: float = float(os.getenv("AIF_SLOW_REQUEST_THRESHOLD_MS", "500"))
+
+# --- Logging Configuration ---
+# AIF_LOG_LEVEL; the unprefixed LOG_LEVEL is still read for existing deployments
+LOG_LEVEL: str = os.getenv("AIF_LOG_LEVEL", os.getenv("LOG_LEVEL", "INFO"))
+# Records are handed to a background writer thread through a queue of this size (0 = unbounded);
+# when it is full, new records are dropped rather than blocking the request.
+LOG_QUEUE_SIZE: int = int(os.getenv("AIF_LOG_QUEUE_SIZE", "10000"))
+# Per-logger sampling of records below WARNING, e.g. "app.db.revocation_store=0.01,app.core.token_issuer=0.1"
+LOG_SAMPLE_RATES: str = os.getenv("AIF_LOG_SAMPLE_RATES", "")
+
 # --- Key Management Configuration ---
 KEYS_DIR_CONFIG: str = os.getenv("AIF_KEYS_DIR", "keys_poc")
 PROJECT_ROOT_DIR = Path(__file__).resolve().parent.parent
 KEYS_DIR = PROJECT_ROOT_DIR / KEYS_DIR_CONFIG
 KEY_ID: str = os.getenv("AIF_KEY_ID", "poc-heimdall-key-01")
 ALGORITHM: str = "EdDSA"
+# How often each worker checks KEYS_DIR/keyring.json for a rotation (0 disables; SIGHUP and
+# POST /reg/admin/keys/reload still work)
+KEYRING_WATCH_INTERVAL_SECONDS: float = float(os.getenv("AIF_KEYRING_WATCH_INTERVAL_SECONDS", "30"))
+# Cache-Control max-age for /.well-known/jwks.json; clients revalidate with If-None-Match afterwards
+JWKS_MAX_AGE_SECONDS: int = int(os.getenv("AIF_JWKS_MAX_AGE_SECONDS", "300"))
+
+# Clock-skew allowance when checking exp/iat/nbf in /reg/verify
+ATK_VERIFY_LEEWAY_SECONDS: float = float(os.getenv("AIF_ATK_VERIFY_LEEWAY_SECONDS", "30"))
+
+# --- Signing Executor Configuration ---
+# "thread", "process" or "inline" (sign on the event loop)
+ATK_SIGNING_EXECUTOR: str = os.getenv("AIF_ATK_SIGNING_EXECUTOR", "thread").lower()
+ATK_SIGNING_WORKERS: int = int(os.getenv("AIF_ATK_SIGNING_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 # --- Database Configuration ---
 MONGO_DATABASE_URL: str = os.getenv("AIF_DATABASE_URL", "mongodb://localhost:27017/")
 MONGO_DATABASE_NAME: str = os.getenv("AIF_DATABASE_NAME", "aif_core_service_poc_db")
 REVOKED_TOKENS_COLLECTION_NAME: str = "revoked_atks"
+# Revocation entries are removed by a TTL index this long after the revoked ATK's own expiry.
+# The grace window covers clock skew and SPs still holding the token in a cache.
+REVOKED_TOKEN_RETENTION_GRACE_SECONDS: int = int(os.getenv("AIF_REVOKED_TOKEN_RETENTION_GRACE_SECONDS", "3600"))
 USERS_COLLECTION_NAME: str = "users"
 ISSUED_TOKENS_COLLECTION_NAME: str = "issued_tokens"
 
+# --- Issued-Token Write-Behind Configuration ---
+# When enabled, issued-token records are queued in memory and group-committed in the background
+ISSUED_TOKEN_WRITE_BEHIND_ENABLED: bool = os.getenv("AIF_ISSUED_TOKEN_WRITE_BEHIND", "false").lower() == 'true'
+ISSUED_TOKEN_WRITE_BEHIND_MAX_QUEUE: int = int(os.getenv("AIF_ISSUED_TOKEN_WRITE_BEHIND_MAX_QUEUE", "10000"))
+ISSUED_TOKEN_WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("AIF_ISSUED_TOKEN_WRITE_BEHIND_BATCH_SIZE", "500"))
+ISSUED_TOKEN_WRITE_BEHIND_FLUSH_INTERVAL_MS: int = int(os.getenv("AIF_ISSUED_TOKEN_WRITE_BEHIND_FLUSH_INTERVAL_MS", "200"))
+
+# --- Revocation Filter Configuration ---
+# Bloom filter over revoked JTIs; definite negatives skip the database lookup.
+# Revocations made by other workers become visible after at most one refresh interval.
+REVOCATION_FILTER_ENABLED: bool = os.getenv("AIF_REVOCATION_FILTER_ENABLED", "false").lower() == 'true'
+REVOCATION_FILTER_FALSE_POSITIVE_RATE: float = float(os.getenv("AIF_REVOCATION_FILTER_FALSE_POSITIVE_RATE", "0.001"))
+REVOCATION_FILTER_MIN_CAPACITY: int = int(os.getenv("AIF_REVOCATION_FILTER_MIN_CAPACITY", "100000"))
+REVOCATION_FILTER_REFRESH_SECONDS: float = float(os.getenv("AIF_REVOCATION_FILTER_REFRESH_SECONDS", "2"))
+REVOCATION_FILTER_REBUILD_SECONDS: float = float(os.getenv("AIF_REVOCATION_FILTER_REBUILD_SECONDS", "900"))
+# If no refresh or rebuild has succeeded for this long, lookups bypass the filter and go to MongoDB
+REVOCATION_FILTER_MAX_STALENESS_SECONDS: float = float(os.getenv(
+    "AIF_REVOCATION_FILTER_MAX_STALENESS_SECONDS", str(3 * REVOCATION_FILTER_REFRESH_SECONDS)))
+
+# --- Batch API Configuration ---
+MAX_ATK_BATCH_SIZE: int = int(os.getenv("AIF_MAX_ATK_BATCH_SIZE", "500"))
+MAX_REVOCATION_STATUS_BATCH_SIZE: int = int(os.getenv("AIF_MAX_REVOCATION_STATUS_BATCH_SIZE", "1000"))
+MAX_ATK_VERIFY_BATCH_SIZE: int = int(os.getenv("AIF_MAX_ATK_VERIFY_BATCH_SIZE", "500"))
+MAX_BULK_REVOCATION_JTIS: int = int(os.getenv("AIF_MAX_BULK_REVOCATION_JTIS", "10000"))
+# Tokens matched by a bulk revocation are written to revoked_atks in chunks of this size
+BULK_REVOCATION_CHUNK_SIZE: int = int(os.getenv("AIF_BULK_REVOCATION_CHUNK_SIZE", "1000"))
+
+# --- Revocation Feed Configuration (GET /reg/revocations) ---
+REVOCATION_FEED_MAX_PAGE_SIZE: int = int(os.getenv("AIF_REVOCATION_FEED_MAX_PAGE_SIZE", "1000"))
+# Revocations newer than this are held back so that a slow concurrent write with an
+# earlier revoked_at can never land behind a cursor that a client already holds.
+REVOCATION_FEED_SETTLE_SECONDS: float = float(os.getenv("AIF_REVOCATION_FEED_SETTLE_SECONDS", "2"))
+REVOCATION_FEED_MAX_AGE_SECONDS: int = int(os.getenv("AIF_REVOCATION_FEED_MAX_AGE_SECONDS", "5"))
+
 # --- AI Model Configuration ---
 SUPPORTED_AI_MODELS: List[str] = [
     # === OpenAI Models (Latest Generation) ===
@@ -250,6 +322,18 @@ JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "jwt-secret-key-change-me-in-p
 SESSION_SECRET_KEY: str = os.getenv("SESSION_SECRET_KEY", "session-secret-key-change-me-in-production")
 BASE_URL: str = os.getenv("BASE_URL", f"http://{AIF_HOST}:{AIF_PORT}")
 
+# In-process cache of authenticated API-token principals (per worker).
+# Other workers see a regenerated token only after their entry's TTL expires.
+API_TOKEN_CACHE_ENABLED: bool = os.getenv("AIF_API_TOKEN_CACHE_ENABLED", "true").lower() == 'true'
+API_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("AIF_API_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+API_TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("AIF_API_TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# In-process cache of verified ATKs for /reg/verify and /reg/introspect (per worker),
+# keyed by token hash. Entries end at the token's exp, capped at the TTL below.
+VERIFIED_TOKEN_CACHE_ENABLED: bool = os.getenv("AIF_VERIFIED_TOKEN_CACHE_ENABLED", "true").lower() == 'true'
+VERIFIED_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("AIF_VERIFIED_TOKEN_CACHE_MAX_ENTRIES", "50000"))
+VERIFIED_TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("AIF_VERIFIED_TOKEN_CACHE_TTL_SECONDS", "900"))
+
 # --- Application Security ---
 FLASK_SECRET_KEY: str = os.getenv('FLASK_SECRET_KEY', 'a-very-secret-key-for-dev-only-change-me')
 
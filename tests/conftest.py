@@ -0,0 +1,80 @@
+"""Shared fixtures: the app and its stores run against the in-memory MongoDB stand-in and a throwaway keyring."""
+import os
+import tempfile
+
+# Settings are read at import time, so the environment is fixed before any app module loads
+os.environ.setdefault("AIF_KEYS_DIR", tempfile.mkdtemp(prefix="aif_test_keys_"))
+os.environ.setdefault("AIF_ISSUED_TOKEN_WRITE_BEHIND", "false")
+os.environ.setdefault("AIF_REVOCATION_FILTER_ENABLED", "false")
+os.environ.setdefault("AIF_LOG_LEVEL", "WARNING")
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from benchmarks.inmemory_mongo import install_inmemory_mongo
+
+@pytest.fixture
+def database():
+    """A fresh in-memory database behind get_db()/get_async_db(), with per-process caches emptied."""
+    from app.auth.api_token_cache import get_api_token_cache
+    from app.auth.verified_token_cache import get_verified_token_cache
+    from app.core.key_manager import load_keys
+
+    db, _ = install_inmemory_mongo()
+    load_keys()
+    for cache in (get_api_token_cache(), get_verified_token_cache()):
+        if cache is not None:
+            cache.clear()
+    yield db
+
+@pytest.fixture
+def app(database):
+    from app import create_app
+    return create_app()
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as test_client:
+        yield test_client
+
+def make_user(database, role: str = "agent_builder") -> dict:
+    """Inserts a registered user with a fresh API token; returns its id and Authorization header."""
+    from app.auth.token_utils import generate_api_token
+
+    user_id = ObjectId()
+    api_token, expires_at = generate_api_token(str(user_id))
+    database["users"].insert_one({
+        "_id": user_id, "github_id": str(user_id), "registration_complete": True, "role": role,
+        "organization_name": "Test Org", "api_token": api_token, "api_token_expires_at": expires_at,
+    })
+    return {"id": str(user_id), "token": api_token, "headers": {"Authorization": f"Bearer {api_token}"}}
+
+@pytest.fixture
+def builder(database):
+    return make_user(database)
+
+@pytest.fixture
+def other_builder(database):
+    return make_user(database)
+
+@pytest.fixture
+def admin(database):
+    return make_user(database, role="admin")
+
+ISSUE_ATK_BODY = {
+    "user_id": "user-test-001",
+    "audience_sp_id": "https://sp.example.com/api",
+    "permissions": ["read:articles_all"],
+    "purpose": "Test issuance",
+    "model_id": "gpt-4.1",
+}
+
+def issue_atk(client, user: dict, **overrides) -> str:
+    response = client.post("/api/v1/ie/issue-atk", headers=user["headers"], json={**ISSUE_ATK_BODY, **overrides})
+    assert response.status_code == 200, response.text
+    return response.json()["atk"]
+
+def jti_of(atk: str) -> str:
+    import jwt
+    return jwt.decode(atk, options={"verify_signature": False})["jti"]
@@ -1 +1,221 @@
-"""Module docstring"""
+"""Tests for the Issuing Entity routes and the issued-token write-behind queue."""
+import asyncio
+
+import pytest
+
+from app.db import token_store, token_write_behind
+from app.db.token_write_behind import IssuedTokenWriteBehind, stop_write_behind
+from tests.conftest import ISSUE_ATK_BODY, issue_atk, jti_of
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """
+    Enables write-behind with a queue whose writer thread is not started, so
+    records stay pending until the test flushes them.
+    """
+    queue = IssuedTokenWriteBehind(max_queue=10, batch_size=100, flush_interval_seconds=60)
+    monkeypatch.setattr(token_write_behind, "ISSUED_TOKEN_WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(token_write_behind, "_write_behind", queue)
+    yield queue
+    token_write_behind._write_behind = None
+
+def test_issue_atk_requires_api_token(client):
+    response = client.post("/api/v1/ie/issue-atk", json={})
+    assert response.status_code == 401
+
+def test_issue_atk_records_token(client, database, builder):
+    jti = jti_of(issue_atk(client, builder))
+    record = database["issued_tokens"].find_one({"jti": jti})
+    assert record["status"] == "active"
+    assert str(record["agent_builder_id"]) == builder["id"]
+
+def test_write_behind_token_can_be_revoked_before_flush(client, database, builder, write_behind):
+    jti = jti_of(issue_atk(client, builder))
+    assert database["issued_tokens"].find_one({"jti": jti}) is None
+    assert write_behind.get_pending_record(jti) is not None
+
+    # The ownership check sees the pending record, so the issuer can revoke it right away
+    response = client.post("/reg/revoke-atk", headers=builder["headers"], json={"jti": jti})
+    assert response.status_code == 200, response.text
+    assert client.get("/reg/revocation-status", params={"jti": jti}).json()["is_revoked"] is True
+
+    assert write_behind.flush() == 1
+    assert database["issued_tokens"].find_one({"jti": jti})["status"] == "revoked"
+    assert write_behind.get_pending_record(jti) is None
+
+def test_write_behind_pending_token_cannot_be_revoked_by_another_builder(client, builder, other_builder, write_behind):
+    jti = jti_of(issue_atk(client, builder))
+    response = client.post("/reg/revoke-atk", headers=other_builder["headers"], json={"jti": jti})
+    assert response.status_code in (403, 404)
+    assert client.get("/reg/revocation-status", params={"jti": jti}).json()["is_revoked"] is False
+
+def test_write_behind_full_queue_falls_back_to_direct_write(client, database, builder, monkeypatch):
+    queue = IssuedTokenWriteBehind(max_queue=1, batch_size=100, flush_interval_seconds=60)
+    monkeypatch.setattr(token_write_behind, "ISSUED_TOKEN_WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(token_write_behind, "_write_behind", queue)
+
+    queued_jti = jti_of(issue_atk(client, builder))
+    direct_jti = jti_of(issue_atk(client, builder))
+
+    assert queue.get_pending_record(queued_jti) is not None
+    assert database["issued_tokens"].find_one({"jti": queued_jti}) is None
+    assert database["issued_tokens"].find_one({"jti": direct_jti}) is not None
+    assert queue.stats()["rejected"] == 1
+    token_write_behind._write_behind = None
+
+def test_stop_write_behind_drains_queue(database, monkeypatch):
+    queue = IssuedTokenWriteBehind(max_queue=10, batch_size=100, flush_interval_seconds=60)
+    queue.start()
+    monkeypatch.setattr(token_write_behind, "_write_behind", queue)
+    for index in range(3):
+        assert queue.enqueue("builder", {"jti": f"jti-{index}", "status": "active"})
+
+    stop_write_behind()
+
+    assert token_write_behind._write_behind is None
+    assert database["issued_tokens"].count_documents({}) == 3
+    assert queue.stats()["queued"] == 0
+    assert not queue.enqueue("builder", {"jti": "late"})
+
+class _FlakyCollection:
+    """Fails the first `failures` insert_many calls, then delegates to the real collection."""
+
+    def __init__(self, collection, failures: int):
+        self._collection = collection
+        self.failures = failures
+        self.calls = 0
+
+    def insert_many(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("simulated network error")
+        return self._collection.insert_many(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+def _use_flaky_collection(monkeypatch, database, failures: int) -> _FlakyCollection:
+    flaky = _FlakyCollection(database["issued_tokens"], failures)
+    monkeypatch.setattr(token_store, "get_issued_tokens_collection", lambda: flaky)
+    monkeypatch.setattr(token_write_behind.time, "sleep", lambda seconds: None)
+    return flaky
+
+def test_write_behind_retries_failed_insert(database, monkeypatch):
+    flaky = _use_flaky_collection(monkeypatch, database, failures=1)
+    queue = IssuedTokenWriteBehind(max_queue=10, batch_size=100, flush_interval_seconds=60, max_write_attempts=3)
+    queue.enqueue("builder", {"jti": "retry-1", "status": "active"})
+    queue.enqueue("builder", {"jti": "retry-2", "status": "active"})
+
+    assert queue.flush() == 2
+    assert flaky.calls == 2
+    assert database["issued_tokens"].count_documents({}) == 2
+    assert queue.stats()["dropped"] == 0
+
+def test_write_behind_requeues_batch_after_last_attempt(database, monkeypatch):
+    flaky = _use_flaky_collection(monkeypatch, database, failures=2)
+    queue = IssuedTokenWriteBehind(max_queue=10, batch_size=100, flush_interval_seconds=60, max_write_attempts=2)
+    queue.enqueue("builder", {"jti": "kept", "status": "active"})
+
+    assert queue.flush() == 0
+    assert queue.stats()["requeued"] == 1
+    assert queue.stats()["queued"] == 1
+    assert queue.stats()["dropped"] == 0
+    assert queue.get_pending_record("kept") is not None
+
+    # MongoDB is back: the next flush writes the re-queued record
+    assert queue.flush() == 1
+    assert flaky.calls == 3
+    assert database["issued_tokens"].find_one({"jti": "kept"})["status"] == "active"
+    assert queue.get_pending_record("kept") is None
+
+def test_stop_write_behind_reports_records_it_could_not_write(database, monkeypatch):
+    _use_flaky_collection(monkeypatch, database, failures=100)
+    queue = IssuedTokenWriteBehind(max_queue=10, batch_size=100, flush_interval_seconds=60, max_write_attempts=1)
+    queue.enqueue("builder", {"jti": "unwritable", "status": "active"})
+
+    queue.stop()
+
+    assert queue.stats()["dropped"] == 1
+
+class _FlushingCollection:
+    """Runs a write-behind flush right after each update_one, as if the writer thread landed in between."""
+
+    def __init__(self, collection, queue: IssuedTokenWriteBehind):
+        self._collection = collection
+        self._queue = queue
+
+    def update_one(self, *args, **kwargs):
+        result = self._collection.update_one(*args, **kwargs)
+        self._queue.flush()
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+def test_status_update_survives_flush_between_database_and_pending_update(database, write_behind, monkeypatch):
+    write_behind.enqueue("builder", {"jti": "racing", "status": "active"})
+    flushing = _FlushingCollection(database["issued_tokens"], write_behind)
+    monkeypatch.setattr(token_store, "get_issued_tokens_collection", lambda: flushing)
+
+    assert token_store.update_token_status("racing", "revoked") is True
+    assert database["issued_tokens"].find_one({"jti": "racing"})["status"] == "revoked"
+    assert "racing" not in write_behind._status_overrides
+
+def test_persist_issued_token_records_async_splits_between_queue_and_direct_write(database, monkeypatch):
+    queue = IssuedTokenWriteBehind(max_queue=2, batch_size=100, flush_interval_seconds=60)
+    monkeypatch.setattr(token_write_behind, "ISSUED_TOKEN_WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(token_write_behind, "_write_behind", queue)
+    builder_id = "6650f0c2a1b2c3d4e5f60718"
+    records = [{"jti": f"bulk-{index}", "status": "active"} for index in range(5)]
+
+    accepted = asyncio.run(token_store.persist_issued_token_records_async(builder_id, records))
+
+    assert accepted == 5
+    assert queue.stats()["queued"] == 2
+    assert database["issued_tokens"].count_documents({}) == 3
+    token_write_behind._write_behind = None
+
+# --- API token authentication and its cache ---
+
+def test_regenerated_api_token_rejects_old_token(client, builder):
+    from app.db.user_store import regenerate_api_token
+
+    issue_atk(client, builder)  # Caches the principal for the current token
+    regenerated = regenerate_api_token(builder["id"])
+
+    response = client.post("/api/v1/ie/issue-atk", headers=builder["headers"], json=ISSUE_ATK_BODY)
+    assert response.status_code == 401
+    issue_atk(client, {"headers": {"Authorization": f"Bearer {regenerated['api_token']}"}})
+
+def test_regeneration_during_lookup_does_not_cache_stale_user(client, builder, monkeypatch):
+    from app.auth import middleware
+    from app.auth.api_token_cache import get_api_token_cache
+    from app.db.user_store import regenerate_api_token
+
+    real_lookup = middleware.get_user_by_id_async
+
+    async def lookup_then_regenerate(user_id, projection=None):
+        # The read returns the old document; the token is regenerated before validation caches it
+        user = await real_lookup(user_id, projection)
+        regenerate_api_token(user_id)
+        return user
+
+    monkeypatch.setattr(middleware, "get_user_by_id_async", lookup_then_regenerate)
+    client.post("/api/v1/ie/issue-atk", headers=builder["headers"], json=ISSUE_ATK_BODY)
+    monkeypatch.setattr(middleware, "get_user_by_id_async", real_lookup)
+
+    assert get_api_token_cache().get(builder["token"]) is None
+    response = client.post("/api/v1/ie/issue-atk", headers=builder["headers"], json=ISSUE_ATK_BODY)
+    assert response.status_code == 401
+
+def test_api_token_cache_index_drops_users_without_live_entries():
+    from bson import ObjectId
+    from app.auth.api_token_cache import APITokenCache
+    from app.models.user_models import User
+
+    cache = APITokenCache(max_entries=2, ttl_seconds=60)
+    for index in range(10):
+        cache.put(f"token-{index}", User(_id=ObjectId(), registration_complete=True))
+
+    assert len(cache._keys_by_user) <= 2 * 2
+    assert all(cache._keys_by_user.values())
@@ -0,0 +1,43 @@
+"""Tests for log sampling (app.utils.logging_config)."""
+import logging
+import random
+
+import pytest
+
+from app.utils.logging_config import SamplingFilter, parse_sample_rates
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates(" app.db.revocation_store=0.01, app.reg_routes = 1 ,") == {
+        "app.db.revocation_store": 0.01,
+        "app.reg_routes": 1.0,
+    }
+
+@pytest.mark.parametrize("spec", ["app.reg_routes", "=0.5", "app.reg_routes=often", "app.reg_routes=1.5", "app.reg_routes=-0.1"])
+def test_parse_sample_rates_rejects_malformed_entries(spec):
+    with pytest.raises(ValueError):
+        parse_sample_rates(spec)
+
+def _record(logger_name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(logger_name, level, __file__, 1, "message", None, None)
+
+def test_sampling_filter_keeps_configured_fraction(monkeypatch):
+    monkeypatch.setattr(random, "random", random.Random(1234).random)
+    sampling = SamplingFilter({"app.db": 0.1})
+
+    kept = sum(sampling.filter(_record("app.db.revocation_store")) for _ in range(10000))
+
+    assert 900 <= kept <= 1100
+    assert sampling.sampled_out == 10000 - kept
+
+def test_sampling_filter_most_specific_logger_wins_and_warnings_pass():
+    sampling = SamplingFilter({"app": 0.0, "app.reg_routes": 1.0})
+
+    assert sampling.filter(_record("app.reg_routes"))
+    assert sampling.filter(_record("app.reg_routes.batch"))
+    assert not sampling.filter(_record("app.db.token_store"))
+    assert not sampling.filter(_record("app.db.token_store", logging.DEBUG))
+    assert sampling.filter(_record("app.db.token_store", logging.WARNING))
+    # Only a logger name or its dotted children match a prefix
+    assert sampling.filter(_record("application"))
+    assert sampling.sampled_out == 2
@@ -0,0 +1,66 @@
+"""Tests for the Prometheus scrape endpoint."""
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import metrics_routes
+from app.utils import metrics
+
+@pytest.fixture
+def metrics_client(database, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "METRICS_ENABLED", True)
+    with TestClient(app_module.create_app()) as test_client:
+        yield test_client
+
+def test_metrics_disabled_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+def _sample(exposition: str, name: str, **labels: str) -> float:
+    """Value of the sample `name` whose labels include `labels`; fails if there is none."""
+    for line in exposition.splitlines():
+        match = re.fullmatch(r"(\w+)(?:\{(.*)\})? (\S+)", line)
+        if not match or match.group(1) != name:
+            continue
+        sample_labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(sample_labels.get(label) == value for label, value in labels.items()):
+            return float(match.group(3))
+    raise AssertionError(f"No {name} sample with labels {labels}")
+
+def test_metrics_open_without_configured_token(metrics_client):
+    metrics_client.get("/reg/revocation-status", params={"jti": "metrics-jti"})
+    metrics_client.get("/no/such/path/metrics-test")
+
+    response = metrics_client.get("/metrics")
+
+    assert response.status_code == 200
+    # Labelled with the route template, never the raw path or query string
+    assert _sample(response.text, "aif_http_request_duration_seconds_count",
+                   method="GET", route="/reg/revocation-status", status="200") >= 1
+    assert _sample(response.text, "aif_http_request_duration_seconds_count",
+                   method="GET", route="unmatched", status="404") >= 1
+    assert "metrics-jti" not in response.text and "/no/such/path" not in response.text
+
+def test_metrics_record_db_operation_latency(metrics_client, monkeypatch):
+    # Store functions are wrapped at import; wrap a fresh one with metrics switched on
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+
+    @metrics.timed_db_operation
+    def metrics_test_lookup():
+        return None
+
+    metrics_test_lookup()
+    metrics_test_lookup()
+
+    response = metrics_client.get("/metrics")
+    assert _sample(response.text, "aif_db_operation_duration_seconds_count", operation="metrics_test_lookup") == 2
+    assert _sample(response.text, "aif_db_operation_duration_seconds_bucket", operation="metrics_test_lookup", le="+Inf") == 2
+
+def test_metrics_require_configured_bearer_token(metrics_client, monkeypatch):
+    monkeypatch.setattr(metrics_routes, "METRICS_BEARER_TOKEN", "scrape-secret")
+
+    assert metrics_client.get("/metrics").status_code == 401
+    assert metrics_client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = metrics_client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
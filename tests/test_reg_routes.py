@@ -1 +1,315 @@
-"""Module docstring"""
+"""Tests for the Registry routes: revocation, revocation status and the admin endpoints."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from app import reg_routes
+from app.db import revocation_filter as revocation_filter_module
+from app.db import revocation_store
+from app.db.revocation_filter import RevocationFilter
+from app.db.revocation_store import is_jti_revoked_async
+from tests.conftest import issue_atk, jti_of
+
+@pytest.fixture
+def revocation_filter(database, monkeypatch):
+    """Enables the revocation filter for the test; the app startup hook builds it when a client is used."""
+    bloom = RevocationFilter(false_positive_rate=0.001, min_capacity=1000)
+    monkeypatch.setattr(revocation_filter_module, "_revocation_filter", bloom)
+    return bloom
+
+class _CountingCollection:
+    """Counts find_one calls, delegating everything to the real collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.find_one_calls = 0
+
+    async def find_one(self, *args, **kwargs):
+        self.find_one_calls += 1
+        return await self._collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+def _count_revocation_lookups(monkeypatch) -> _CountingCollection:
+    counting = _CountingCollection(revocation_store.get_revoked_tokens_collection_async())
+    monkeypatch.setattr(revocation_store, "get_revoked_tokens_collection_async", lambda: counting)
+    return counting
+
+def _revoke_from_another_worker(database, jti: str):
+    database["revoked_atks"].insert_one({"jti": jti, "revoked_at": datetime.now(timezone.utc)})
+
+# --- Revocation filter ---
+
+def test_revocation_filter_definite_negative_skips_database(database, revocation_filter, monkeypatch):
+    _revoke_from_another_worker(database, "revoked-jti")
+    asyncio.run(revocation_filter.rebuild())
+    lookups = _count_revocation_lookups(monkeypatch)
+
+    assert asyncio.run(is_jti_revoked_async("never-revoked-jti")) is False
+    assert lookups.find_one_calls == 0
+    assert revocation_filter.definite_negatives == 1
+
+    assert asyncio.run(is_jti_revoked_async("revoked-jti")) is True
+    assert lookups.find_one_calls == 1
+
+def test_revocation_filter_sees_local_revocation_immediately(revocation_filter, client, builder):
+    assert revocation_filter.ready
+    jti = jti_of(issue_atk(client, builder))
+    assert client.get("/reg/revocation-status", params={"jti": jti}).json()["is_revoked"] is False
+
+    response = client.post("/reg/revoke-atk", headers=builder["headers"], json={"jti": jti})
+    assert response.status_code == 200, response.text
+
+    assert not revocation_filter.definitely_not_revoked(jti)
+    assert client.get("/reg/revocation-status", params={"jti": jti}).json()["is_revoked"] is True
+
+def test_revocation_filter_refresh_picks_up_other_workers_revocations(database, revocation_filter):
+    asyncio.run(revocation_filter.rebuild())
+    _revoke_from_another_worker(database, "remote-jti")
+
+    # Until the next refresh this worker still answers from its filter
+    assert asyncio.run(is_jti_revoked_async("remote-jti")) is False
+
+    asyncio.run(revocation_filter.refresh())
+    assert asyncio.run(is_jti_revoked_async("remote-jti")) is True
+    assert revocation_filter.refreshes == 1
+
+def test_revocation_filter_falls_back_to_database_while_refresh_keeps_failing(database, monkeypatch):
+    bloom = RevocationFilter(false_positive_rate=0.001, min_capacity=1000, max_staleness_seconds=0.05)
+    monkeypatch.setattr(revocation_filter_module, "_revocation_filter", bloom)
+    asyncio.run(bloom.rebuild())
+    _revoke_from_another_worker(database, "remote-jti")
+
+    def unreachable():
+        raise ConnectionError("simulated network error")
+
+    monkeypatch.setattr(revocation_filter_module, "get_async_db", unreachable)
+
+    async def run_failing_refreshes():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(bloom.run(refresh_seconds=0.01, rebuild_seconds=3600), timeout=0.2)
+
+    asyncio.run(run_failing_refreshes())
+
+    assert bloom.refreshes == 0
+    assert bloom.is_stale() and not bloom.ready
+    # The stale filter never saw the remote revocation; the lookup must reach revoked_atks instead
+    assert asyncio.run(is_jti_revoked_async("remote-jti")) is True
+    assert bloom.stale_lookups == 1
+
+def test_rebuild_revocation_filter_requires_admin(revocation_filter, client, builder):
+    assert client.post("/reg/admin/revocation-filter/rebuild").status_code == 401
+    response = client.post("/reg/admin/revocation-filter/rebuild", headers=builder["headers"])
+    assert response.status_code == 403
+
+def test_rebuild_revocation_filter_loads_revoked_jtis(database, revocation_filter, client, admin):
+    for index in range(3):
+        _revoke_from_another_worker(database, f"maintenance-{index}")
+
+    response = client.post("/reg/admin/revocation-filter/rebuild", headers=admin["headers"])
+
+    assert response.status_code == 200, response.text
+    assert response.json()["jtis"] == 3
+    assert revocation_filter.rebuilds == 2  # Startup, then the admin request
+    assert not revocation_filter.definitely_not_revoked("maintenance-0")
+
+def test_rebuild_revocation_filter_when_disabled(client, admin):
+    response = client.post("/reg/admin/revocation-filter/rebuild", headers=admin["headers"])
+    assert response.status_code == 409
+
+# --- Revocation feed ---
+
+def _revoked_at(seconds_ago: float) -> datetime:
+    # Whole milliseconds, the cursor's precision
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)).replace(microsecond=0)
+
+def _insert_revocations(database, *jtis_with_revoked_at):
+    database["revoked_atks"].insert_many([
+        {"_id": ObjectId(), "jti": jti, "revoked_at": revoked_at, "original_exp_ts": 1_900_000_000}
+        for jti, revoked_at in jtis_with_revoked_at
+    ])
+
+def _feed(client, **params):
+    response = client.get("/reg/revocations", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_revocation_feed_pages_across_revoked_at_tie(client, database):
+    tied_at = _revoked_at(60)
+    _insert_revocations(database, ("first", _revoked_at(120)), ("tie-a", tied_at), ("tie-b", tied_at),
+                        ("tie-c", tied_at), ("last", _revoked_at(30)))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = _feed(client, limit=2, **({"since": cursor} if cursor else {}))
+        seen += [entry["jti"] for entry in page["revocations"]]
+        cursor, pages = page["next_cursor"], pages + 1
+        if not page["has_more"]:
+            break
+
+    # Every revocation exactly once, even though a page boundary falls inside the tie
+    assert seen[0] == "first" and seen[-1] == "last"
+    assert sorted(seen[1:4]) == ["tie-a", "tie-b", "tie-c"]
+    assert len(seen) == 5 and pages == 3
+    assert _feed(client, since=cursor)["revocations"] == []
+
+def test_revocation_feed_holds_back_unsettled_revocations(client, database, monkeypatch):
+    monkeypatch.setattr(reg_routes, "REVOCATION_FEED_SETTLE_SECONDS", 10)
+    _insert_revocations(database, ("settled", _revoked_at(60)), ("just-revoked", _revoked_at(1)))
+
+    page = _feed(client)
+    assert [entry["jti"] for entry in page["revocations"]] == ["settled"]
+
+    # Once the settle window has passed the late entry shows up after the returned cursor
+    monkeypatch.setattr(reg_routes, "REVOCATION_FEED_SETTLE_SECONDS", 0)
+    assert [entry["jti"] for entry in _feed(client, since=page["next_cursor"])["revocations"]] == ["just-revoked"]
+
+def test_revocation_feed_empty_page_keeps_cursor(client, database):
+    _insert_revocations(database, ("only", _revoked_at(60)))
+    cursor = _feed(client)["next_cursor"]
+
+    page = _feed(client, since=cursor)
+    assert page == {"revocations": [], "next_cursor": cursor, "has_more": False}
+
+def test_revocation_feed_honours_if_none_match(client, database):
+    _insert_revocations(database, ("cached", _revoked_at(60)))
+    response = client.get("/reg/revocations")
+    etag = response.headers["etag"]
+
+    unchanged = client.get("/reg/revocations", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    _insert_revocations(database, ("new", _revoked_at(30)))
+    changed = client.get("/reg/revocations", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+@pytest.mark.parametrize("since", ["not-a-cursor", "bm90LWEtY3Vyc29y", "MTIzOm5vdC1hbi1vYmplY3RpZA"])
+def test_revocation_feed_rejects_invalid_cursor(client, since):
+    response = client.get("/reg/revocations", params={"since": since})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid 'since' cursor."
+
+# --- Bulk revocation ---
+
+def _is_revoked(client, jti: str) -> bool:
+    return client.get("/reg/revocation-status", params={"jti": jti}).json()["is_revoked"]
+
+def test_bulk_revoke_jti_list_skips_tokens_of_other_builders(client, database, builder, other_builder):
+    own_jtis = [jti_of(issue_atk(client, builder)) for _ in range(2)]
+    foreign_jti = jti_of(issue_atk(client, other_builder))
+
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"],
+                           json={"jtis": own_jtis + [foreign_jti, "unknown-jti"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"revoked_count": 2, "skipped_jtis": [foreign_jti, "unknown-jti"], "complete": True}
+    assert all(_is_revoked(client, jti) for jti in own_jtis)
+    assert not _is_revoked(client, foreign_jti)
+    assert database["issued_tokens"].find_one({"jti": foreign_jti})["status"] == "active"
+    assert {doc["status"] for doc in database["issued_tokens"].find({"jti": {"$in": own_jtis}})} == {"revoked"}
+
+def test_bulk_revoke_selector_only_matches_own_active_tokens(client, database, builder, other_builder):
+    target_jti = jti_of(issue_atk(client, builder, user_id="user-a"))
+    kept_jti = jti_of(issue_atk(client, builder, user_id="user-b"))
+    foreign_jti = jti_of(issue_atk(client, other_builder, user_id="user-a"))
+
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"selector": {"user_id": "user-a"}})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["revoked_count"] == 1
+    assert _is_revoked(client, target_jti)
+    assert not _is_revoked(client, kept_jti)
+    assert not _is_revoked(client, foreign_jti)
+    assert database["issued_tokens"].find_one({"jti": kept_jti})["status"] == "active"
+
+def test_bulk_revoke_user_id_selector_matches_legacy_records_by_aid(client, database, builder):
+    database["issued_tokens"].insert_one({
+        "jti": "legacy-jti", "agent_builder_id": ObjectId(builder["id"]), "status": "active",
+        "aid": "aif://issuer.example.com/gpt-4.1/user-legacy/0f4c6d1e", "issued_at": datetime.now(timezone.utc),
+    })
+
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"selector": {"user_id": "user-legacy"}})
+
+    assert response.json()["revoked_count"] == 1
+    assert _is_revoked(client, "legacy-jti")
+
+def test_bulk_revoke_selector_all_revokes_every_active_token(client, builder, other_builder):
+    own_jtis = [jti_of(issue_atk(client, builder)) for _ in range(3)]
+    foreign_jti = jti_of(issue_atk(client, other_builder))
+
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"selector": {"all": True}})
+
+    assert response.json()["revoked_count"] == 3
+    assert all(_is_revoked(client, jti) for jti in own_jtis)
+    assert not _is_revoked(client, foreign_jti)
+
+@pytest.mark.parametrize("jti", ["", "x" * 101, "bad jti!"])
+def test_bulk_revoke_validates_each_jti_like_single_revocation(client, builder, jti):
+    bulk = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"jtis": ["valid-jti", jti]})
+    single = client.post("/reg/revoke-atk", headers=builder["headers"], json={"jti": jti})
+    assert bulk.status_code == single.status_code == 422
+
+def test_bulk_revoke_reports_partial_failure(client, database, builder, monkeypatch):
+    jtis = [jti_of(issue_atk(client, builder)) for _ in range(3)]
+    real_revoke_chunk = revocation_store._revoke_chunk_async
+    calls = []
+
+    async def fail_second_chunk(token_infos, agent_builder_id):
+        calls.append(len(token_infos))
+        if len(calls) == 2:
+            raise ConnectionError("simulated network error")
+        await real_revoke_chunk(token_infos, agent_builder_id)
+
+    monkeypatch.setattr(revocation_store, "_revoke_chunk_async", fail_second_chunk)
+    query = revocation_store.build_bulk_revocation_query(builder["id"], jtis=jtis)
+    result = asyncio.run(revocation_store.revoke_tokens_bulk_async(builder["id"], query, chunk_size=1))
+
+    assert result.complete is False
+    assert len(result.revoked_jtis) == 1 and result.revoked_jtis[0] in jtis
+    assert database["revoked_atks"].count_documents({}) == 1
+
+    # The endpoint surfaces the committed part instead of a bare error
+    monkeypatch.setattr("app.reg_routes.revoke_tokens_bulk_async",
+                        lambda *args: _completed(revocation_store.BulkRevocationResult(result.revoked_jtis, complete=False)))
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"jtis": jtis})
+    assert response.status_code == 500
+    assert response.json() == {"revoked_count": 1, "skipped_jtis": [], "complete": False}
+
+async def _completed(value):
+    return value
+
+# --- Introspection ---
+
+def test_introspect_batch_reports_active_revoked_and_invalid_tokens(client, builder):
+    active_atk, revoked_atk = issue_atk(client, builder), issue_atk(client, builder)
+    client.post("/reg/revoke-atk", headers=builder["headers"], json={"jti": jti_of(revoked_atk)})
+
+    response = client.post("/reg/introspect/batch", json={"tokens": [active_atk, revoked_atk, "not-a-token"]})
+
+    assert response.status_code == 200, response.text
+    active, revoked, invalid = response.json()["results"]
+    assert active["active"] is True and active["jti"] == jti_of(active_atk)
+    assert revoked["active"] is False and revoked["is_revoked"] is True
+    assert invalid == {"active": False}
+
+def test_introspect_batch_failed_revocation_lookup_marks_entries_inactive(client, builder, monkeypatch):
+    atk = issue_atk(client, builder)
+
+    async def failed_lookup(jtis):
+        return None
+
+    monkeypatch.setattr("app.core.token_validator.get_revoked_jtis_async", failed_lookup)
+    response = client.post("/reg/introspect/batch", json={"tokens": [atk, "not-a-token"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == [
+        {"active": False, "error": "revocation_check_failed"},
+        {"active": False},
+    ]
+    # The single-token endpoint has no per-entry channel and still reports a server error
+    assert client.post("/reg/introspect", data={"token": atk}).status_code == 500
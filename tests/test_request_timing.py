@@ -0,0 +1,104 @@
+"""Tests for per-request phase timing: Server-Timing, the slow-request log and timed store calls."""
+import asyncio
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import metrics
+from app.utils.metrics import timed_db_operation
+from app.utils.request_timing import RequestTimingMiddleware, record_phase
+
+@pytest.fixture
+def phases_enabled(monkeypatch):
+    """Makes timed_db_operation wrap functions decorated during the test, whatever the settings."""
+    monkeypatch.setattr(metrics, "REQUEST_PHASES_ENABLED", True)
+
+def _timed_app(server_timing: bool, slow_request_threshold_ms: float, endpoint) -> TestClient:
+    app = FastAPI()
+    app.get("/timed")(endpoint)
+    app.add_middleware(RequestTimingMiddleware, server_timing=server_timing,
+                       slow_request_threshold_ms=slow_request_threshold_ms)
+    return TestClient(app)
+
+async def _two_lookups():
+    record_phase("db.lookup", 0.002)
+    record_phase("db.lookup", 0.003)
+    return {"ok": True}
+
+def _server_timing(response) -> dict:
+    entries = dict(entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+    return {name: float(milliseconds) for name, milliseconds in entries.items()}
+
+def test_server_timing_header_sums_repeated_phases(caplog):
+    client = _timed_app(server_timing=True, slow_request_threshold_ms=0, endpoint=_two_lookups)
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.request_timing"):
+        response = client.get("/timed")
+
+    assert response.status_code == 200
+    timing = _server_timing(response)
+    assert list(timing) == ["db.lookup", "total"]
+    assert timing["db.lookup"] == pytest.approx(5.0)
+    assert timing["total"] >= 0
+    assert not caplog.records  # A zero threshold disables the slow-request log
+
+def test_server_timing_header_off_when_disabled():
+    response = _timed_app(server_timing=False, slow_request_threshold_ms=0, endpoint=_two_lookups).get("/timed")
+    assert "server-timing" not in response.headers
+
+def test_slow_request_log_carries_phase_breakdown(caplog):
+    client = _timed_app(server_timing=False, slow_request_threshold_ms=0.001, endpoint=_two_lookups)
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.request_timing"):
+        client.get("/timed")
+
+    [record] = caplog.records
+    assert "GET /timed -> 200" in record.getMessage()
+    assert "db.lookup=5.0ms(x2)" in record.getMessage()
+    assert record.status_code == 200
+    assert record.phases_ms == {"db.lookup": pytest.approx(5.0)}
+
+def test_nested_timed_db_operations_record_only_the_outermost_call(phases_enabled):
+    @timed_db_operation
+    async def get_record_async():
+        return "record"
+
+    @timed_db_operation
+    async def check_record_async():
+        return await get_record_async()
+
+    @timed_db_operation
+    def get_record():
+        return "record"
+
+    @timed_db_operation
+    def check_record():
+        return get_record()
+
+    async def endpoint():
+        await check_record_async()
+        await get_record_async()
+        check_record()
+        return {"ok": True}
+
+    response = _timed_app(server_timing=True, slow_request_threshold_ms=0, endpoint=endpoint).get("/timed")
+
+    assert list(_server_timing(response)) == ["db.check_record_async", "db.get_record_async", "db.check_record", "total"]
+
+def test_concurrent_timed_db_operations_are_each_recorded(phases_enabled, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(metrics, "record_phase", lambda name, seconds: recorded.append(name))
+
+    @timed_db_operation
+    async def slow_lookup():
+        await asyncio.sleep(0.01)
+
+    async def run_concurrently():
+        await asyncio.gather(slow_lookup(), slow_lookup())
+
+    # Each gathered call runs in its own task context, so neither counts as nested
+    asyncio.run(run_concurrently())
+
+    assert recorded == ["db.slow_lookup", "db.slow_lookup"]
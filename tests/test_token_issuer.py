@@ -1 +1,363 @@
-"""Module docstring"""
+"""Tests for ATK signing, key rotation and verification (app.core)."""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import asyncio
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+
+from app.auth import verified_token_cache
+from app.auth.verified_token_cache import VerifiedTokenCache
+from app.core import key_manager, key_rotation
+from app.core.key_manager import get_keyring, keyring_files_changed, load_keys
+from app.core.signing_executor import SigningExecutor
+from app.core.token_issuer import create_atk
+from app.core.token_validator import (
+    ATKVerifier,
+    ERROR_EXPIRED,
+    ERROR_INVALID_AUDIENCE,
+    ERROR_INVALID_ISSUER,
+    ERROR_INVALID_SIGNATURE,
+    ERROR_NOT_YET_VALID,
+    ERROR_REVOKED,
+    ERROR_UNKNOWN_KID,
+    ERROR_UNSUPPORTED_ALGORITHM,
+)
+from app.db.revocation_store import add_jti_to_revocation_list
+from config.settings import CORE_AIF_SERVICE_ISSUER_ID, KEY_ID
+from tests.conftest import issue_atk, jti_of
+
+SIGN_KWARGS = {
+    "user_id": "user-test-001",
+    "audience_sp_id": "https://sp.example.com/api",
+    "permissions": ["read:articles_all"],
+    "purpose": "Test issuance",
+    "model_id": "gpt-4.1",
+}
+
+def _sign(**overrides):
+    result = create_atk(**SIGN_KWARGS, **overrides)
+    assert result is not None
+    return result.atk
+
+def _kid_of(token: str) -> str:
+    return jwt.get_unverified_header(token)["kid"]
+
+# --- Key rotation ---
+
+@pytest.fixture
+def keys_dir(database, tmp_path, monkeypatch):
+    """Points key_manager and key_rotation at an empty KEYS_DIR holding a fresh legacy key pair."""
+    paths = {
+        "KEYS_DIR": tmp_path,
+        "KEYRING_MANIFEST_PATH": tmp_path / "keyring.json",
+        "PRIVATE_KEY_PATH": tmp_path / "aif_private_key.pem",
+        "PUBLIC_KEY_PATH": tmp_path / "aif_public_key.pem",
+    }
+    for module in (key_manager, key_rotation):
+        for name, path in paths.items():
+            monkeypatch.setattr(module, name, path)
+    load_keys(force_reload=True)
+    yield tmp_path
+    monkeypatch.undo()
+    load_keys(force_reload=True)
+
+def _jwks(client):
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == get_keyring().version
+    assert client.get("/.well-known/jwks.json", headers={"If-None-Match": etag}).status_code == 304
+    return [key["kid"] for key in response.json()["keys"]], etag
+
+def _reload():
+    assert keyring_files_changed()
+    key_rotation.reload_signing_keys()
+    assert not keyring_files_changed()
+
+def test_key_rotation_updates_jwks_and_etag_at_each_stage(keys_dir, client):
+    initial_kids, initial_etag = _jwks(client)
+    assert initial_kids == [KEY_ID]
+
+    # init: same key, now described by a manifest
+    key_rotation.init_manifest()
+    _reload()
+    assert _jwks(client) == ([KEY_ID], initial_etag)
+    old_token = _sign()
+    assert _kid_of(old_token) == KEY_ID
+
+    # add-next: k2 is published, the old key still signs
+    key_rotation.add_next_key("k2")
+    _reload()
+    next_kids, next_etag = _jwks(client)
+    assert next_kids == [KEY_ID, "k2"]
+    assert next_etag != initial_etag
+    assert _kid_of(_sign()) == KEY_ID
+
+    # promote: k2 signs and is listed first; tokens from the old key still verify
+    key_rotation.promote_key("k2")
+    _reload()
+    promoted_kids, promoted_etag = _jwks(client)
+    assert promoted_kids == ["k2", KEY_ID]
+    assert promoted_etag not in (initial_etag, next_etag)
+    new_token = _sign()
+    assert _kid_of(new_token) == "k2"
+    assert ATKVerifier().verify(old_token).valid
+    assert ATKVerifier().verify(new_token).valid
+
+    # retire: the old key leaves the JWKS and its tokens stop verifying
+    key_rotation.retire_key(KEY_ID)
+    _reload()
+    retired_kids, retired_etag = _jwks(client)
+    assert retired_kids == ["k2"]
+    assert retired_etag not in (initial_etag, next_etag, promoted_etag)
+    assert ATKVerifier().verify(old_token).error == ERROR_UNKNOWN_KID
+    assert ATKVerifier().verify(new_token).valid
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_add_next_key_creates_private_key_owner_only(keys_dir):
+    key_rotation.init_manifest()
+    key_rotation.add_next_key("k2")
+
+    assert stat.S_IMODE((keys_dir / "k2.private.pem").stat().st_mode) == 0o600
+    manifest = json.loads((keys_dir / "keyring.json").read_text())
+    assert [entry["kid"] for entry in manifest["keys"]] == [KEY_ID, "k2"]
+
+def test_add_next_key_refuses_to_overwrite_key_file(keys_dir):
+    key_rotation.init_manifest()
+    (keys_dir / "k2.private.pem").write_text("existing")
+
+    with pytest.raises(FileExistsError):
+        key_rotation.add_next_key("k2")
+    assert (keys_dir / "k2.private.pem").read_text() == "existing"
+
+def test_replacing_a_per_kid_key_file_is_detected(keys_dir):
+    key_rotation.init_manifest()
+    key_rotation.add_next_key("k2")
+    key_rotation.reload_signing_keys()
+    assert not keyring_files_changed()
+
+    # Swap in another public key for k2 without touching keyring.json
+    replacement = keys_dir / "k2.public.pem.new"
+    _, public_pem = key_manager._generate_ed25519_keys_pem()
+    replacement.write_bytes(public_pem + b"\n")
+    os.replace(replacement, keys_dir / "k2.public.pem")
+
+    assert keyring_files_changed()
+
+class _ReplacedDuringSubmit(ThreadPoolExecutor):
+    """A pool that reload_workers replaces and shuts down just as a sign is submitted to it."""
+
+    def __init__(self, signing_executor: SigningExecutor):
+        super().__init__(max_workers=1)
+        self._signing_executor = signing_executor
+
+    def submit(self, *args, **kwargs):
+        self._signing_executor._executor = ThreadPoolExecutor(max_workers=1)
+        self.shutdown(wait=False)
+        return super().submit(*args, **kwargs)
+
+def test_signing_executor_retries_submit_on_pool_replaced_by_reload(database):
+    signing_executor = SigningExecutor(mode="thread", max_workers=1)
+    signing_executor._executor = _ReplacedDuringSubmit(signing_executor)
+
+    result = asyncio.run(signing_executor.create_atk(**SIGN_KWARGS))
+
+    assert result is not None
+    assert ATKVerifier().verify(result.atk).valid
+    assert signing_executor.stats()["failed"] == 0
+    signing_executor.shutdown()
+
+# --- ATK verification ---
+
+AUDIENCE = "https://sp.example.com/api"
+NOW = 1_800_000_000
+LEEWAY = 30
+
+@pytest.fixture
+def verifier(database):
+    return ATKVerifier(leeway_seconds=LEEWAY)
+
+def _claims(**overrides):
+    claims = {"iss": CORE_AIF_SERVICE_ISSUER_ID, "sub": "aid", "aud": AUDIENCE,
+              "iat": NOW, "exp": NOW + 3600, "jti": "jti-verify-001"}
+    claims.update(overrides)
+    return {name: value for name, value in claims.items() if value is not None}
+
+def _encode(claims, kid=None, private_key=None):
+    active = get_keyring().active
+    return jwt.encode(claims, private_key or active.private_key, algorithm="EdDSA",
+                      headers={"kid": kid or active.kid, "typ": "JWT"})
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _forge(header, claims, signature: bytes = b"") -> str:
+    signing_input = f"{_b64url(json.dumps(header).encode())}.{_b64url(json.dumps(claims).encode())}"
+    return f"{signing_input}.{_b64url(signature)}"
+
+def test_verify_accepts_valid_token(verifier):
+    result = verifier.verify(_encode(_claims()), audience=AUDIENCE, now=NOW)
+    assert result.valid, result.error_detail
+    assert result.kid == get_keyring().active_kid
+    assert result.jti == "jti-verify-001"
+
+def test_verify_accepts_issued_token(verifier):
+    assert verifier.verify(_sign(), audience=AUDIENCE).valid
+
+def test_verify_rejects_tampered_signature(verifier):
+    header, payload, signature = _encode(_claims()).split(".")
+    flipped = bytearray(base64.urlsafe_b64decode(signature + "=="))
+    flipped[0] ^= 0x01
+    result = verifier.verify(f"{header}.{payload}.{_b64url(bytes(flipped))}", now=NOW)
+    assert result.error == ERROR_INVALID_SIGNATURE
+
+def test_verify_rejects_tampered_payload(verifier):
+    header, _, signature = _encode(_claims()).split(".")
+    payload = _b64url(json.dumps(_claims(aud="https://attacker.example.com")).encode())
+    assert verifier.verify(f"{header}.{payload}.{signature}", now=NOW).error == ERROR_INVALID_SIGNATURE
+
+def test_verify_rejects_unknown_kid(verifier):
+    assert verifier.verify(_encode(_claims(), kid="not-published"), now=NOW).error == ERROR_UNKNOWN_KID
+
+def test_verify_rejects_signature_from_another_published_kid(keys_dir, verifier):
+    key_rotation.init_manifest()
+    key_rotation.add_next_key("k2")
+    key_rotation.reload_signing_keys()
+    keyring = get_keyring()
+
+    # Signed by the active key but claiming to be k2
+    token = _encode(_claims(), kid="k2", private_key=keyring.active.private_key)
+    assert verifier.verify(token, now=NOW).error == ERROR_INVALID_SIGNATURE
+    assert verifier.verify(_encode(_claims(), kid="k2", private_key=keyring.keys["k2"].private_key), now=NOW).valid
+
+def test_verify_rejects_token_of_retired_key_even_when_cached(keys_dir):
+    verifier = ATKVerifier(leeway_seconds=LEEWAY, cache=VerifiedTokenCache(max_entries=10, ttl_seconds=60))
+    now = time.time()
+    old_token = _encode(_claims(iat=int(now), exp=int(now) + 3600))
+    assert verifier.verify(old_token).valid  # Now cached
+
+    key_rotation.init_manifest()
+    key_rotation.add_next_key("k2")
+    key_rotation.promote_key("k2")
+    key_rotation.retire_key(KEY_ID)
+    key_rotation.reload_signing_keys()
+
+    assert verifier.verify(old_token).error == ERROR_UNKNOWN_KID
+
+@pytest.mark.parametrize("exp, error", [
+    (NOW - LEEWAY, ERROR_EXPIRED),
+    (NOW - LEEWAY + 1, None),
+])
+def test_verify_exp_leeway_edge(verifier, exp, error):
+    result = verifier.verify(_encode(_claims(iat=NOW - 3600, exp=exp)), now=NOW)
+    assert result.error == error
+
+@pytest.mark.parametrize("claim", ["iat", "nbf"])
+@pytest.mark.parametrize("offset, error", [
+    (LEEWAY, None),
+    (LEEWAY + 1, ERROR_NOT_YET_VALID),
+])
+def test_verify_iat_and_nbf_leeway_edge(verifier, claim, offset, error):
+    result = verifier.verify(_encode(_claims(**{claim: NOW + offset})), now=NOW)
+    assert result.error == error
+
+def test_verify_rejects_wrong_issuer(verifier):
+    result = verifier.verify(_encode(_claims(iss="aif://attacker.example.com")), now=NOW)
+    assert result.error == ERROR_INVALID_ISSUER
+
+def test_verify_rejects_wrong_audience(verifier):
+    token = _encode(_claims())
+    assert verifier.verify(token, audience="https://other-sp.example.com", now=NOW).error == ERROR_INVALID_AUDIENCE
+    assert verifier.verify(token, audience=["https://other-sp.example.com", AUDIENCE], now=NOW).valid
+
+def test_verify_rejects_alg_none(verifier):
+    token = _forge({"alg": "none", "kid": get_keyring().active_kid}, _claims())
+    assert verifier.verify(token, now=NOW).error == ERROR_UNSUPPORTED_ALGORITHM
+
+def test_verify_rejects_hs256_keyed_with_public_key(verifier):
+    # Algorithm confusion: an HMAC over the token keyed with the published public key
+    active = get_keyring().active
+    header, claims = {"alg": "HS256", "kid": active.kid, "typ": "JWT"}, _claims()
+    signing_input = _forge(header, claims).rsplit(".", 1)[0]
+    signature = hmac.new(active.public_key_pem.encode(), signing_input.encode(), hashlib.sha256).digest()
+    assert verifier.verify(_forge(header, claims, signature), now=NOW).error == ERROR_UNSUPPORTED_ALGORITHM
+
+# --- Verified-token cache ---
+
+@pytest.fixture
+def token_cache(database, monkeypatch):
+    """A fresh process-wide verified-token cache, so revocations in this process evict from it."""
+    cache = VerifiedTokenCache(max_entries=100, ttl_seconds=60)
+    monkeypatch.setattr(verified_token_cache, "_verified_token_cache", cache)
+    return cache
+
+def _cache_claims(jti: str, exp: float = None):
+    return {"jti": jti, "exp": exp if exp is not None else time.time() + 3600}
+
+def test_revoked_token_is_evicted_and_rejected(token_cache):
+    verifier = ATKVerifier(cache=token_cache)
+    token = _sign()
+    assert asyncio.run(verifier.verify_async(token)).valid
+    assert token_cache.get(token) is not None
+
+    assert add_jti_to_revocation_list(jti_of(token))
+
+    assert token_cache.get(token) is None
+    assert token_cache.invalidations == 1
+    assert asyncio.run(verifier.verify_async(token)).error == ERROR_REVOKED
+
+def test_bulk_revoked_tokens_are_evicted_and_rejected(token_cache, client, builder):
+    verifier = ATKVerifier(cache=token_cache)
+    tokens = [issue_atk(client, builder) for _ in range(2)]
+    assert all(result.valid for result in asyncio.run(verifier.verify_many_async(tokens)))
+
+    response = client.post("/reg/revoke-atk/bulk", headers=builder["headers"], json={"selector": {"all": True}})
+    assert response.json()["revoked_count"] == 2
+
+    assert all(token_cache.get(token) is None for token in tokens)
+    assert token_cache.invalidations == 2
+    assert [result.error for result in asyncio.run(verifier.verify_many_async(tokens))] == [ERROR_REVOKED] * 2
+
+def test_invalidate_jti_leaves_no_index_entry():
+    cache = VerifiedTokenCache(max_entries=10, ttl_seconds=60)
+    cache.put("token-a", KEY_ID, _cache_claims("jti-a"))
+    cache.put("token-b", KEY_ID, _cache_claims("jti-b"))
+
+    cache.invalidate_jti("jti-a")
+    cache.invalidate_jti("jti-a")  # Already gone: no second invalidation
+    cache.invalidate_jti("never-cached")
+
+    assert cache.get("token-a") is None and cache.get("token-b") is not None
+    assert set(cache._keys_by_jti) == {"jti-b"}
+    assert cache.invalidations == 1
+
+def test_jti_index_is_pruned_after_size_eviction():
+    cache = VerifiedTokenCache(max_entries=2, ttl_seconds=60)
+    for index in range(5):
+        cache.put(f"token-{index}", KEY_ID, _cache_claims(f"jti-{index}"))
+
+    # The fifth put pushed the index past 2 x max_entries; only JTIs still cached remain
+    assert set(cache._keys_by_jti) == {"jti-3", "jti-4"}
+    cache.invalidate_jti("jti-0")
+    assert cache.invalidations == 0
+
+def test_jti_index_is_pruned_after_ttl_expiry():
+    cache = VerifiedTokenCache(max_entries=3, ttl_seconds=60)
+    for index in range(4):
+        cache.put(f"token-{index}", KEY_ID, _cache_claims(f"jti-{index}"))
+    cache.put("token-short", KEY_ID, _cache_claims("jti-short", exp=time.time() + 0.05))
+    cache.put("token-4", KEY_ID, _cache_claims("jti-4"))
+    time.sleep(0.1)
+
+    cache.put("token-5", KEY_ID, _cache_claims("jti-5"))
+
+    # jti-short was never evicted, only expired, and is pruned all the same
+    assert len(cache._cache) == 3
+    assert set(cache._keys_by_jti) == {"jti-4", "jti-5"}